@@ -0,0 +1,7 @@
+# Micro-benchmarks for the Python <-> JavaScript bridge.
+#
+# cefpython3 is only needed to actually open a window, so the benchmarks run
+# the real preload scripts in a Node.js process instead (see `cef_stub.py`).
+# Run them from `src/py`, for example:
+#
+#     python -m benchmarks.bench_js_object_call
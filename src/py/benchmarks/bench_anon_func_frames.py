@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+# rexec() calls/sec when called from shallow and deep call stacks. The previous
+# implementation built the whole stack with inspect.stack() on every call, so it
+# got slower the deeper it was called from. It's kept here for comparison only.
+
+import inspect
+import time
+
+from util import anon_func as af
+
+CALLS = 2000
+DEPTHS = (1, 50, 200)
+
+CODE = "total = a + b"
+
+
+def inspect_stack_rexec(p_code: str, p_return: str, __prefix: str = "anon_func.rexec"):
+    # The previous implementation, kept here for comparison only.
+    frame_info = inspect.stack()[1]
+    __globals = frame_info.frame.f_globals
+    __locals = frame_info.frame.f_locals
+
+    exec(
+        af.code_cache.compile(p_code, af._get_exec_name(frame_info.frame, __prefix), "exec"),
+        __globals,
+        __locals,
+    )
+    return eval(
+        af.code_cache.compile(p_return, af._get_r_eval_name(frame_info.frame, __prefix), "eval"),
+        __globals,
+        __locals,
+    )
+
+
+def at_depth(depth: int, fn):
+    if depth > 1:
+        return at_depth(depth - 1, fn)
+    return fn()
+
+
+def measure(rexec, depth: int, calls: int = CALLS) -> float:
+    def loop():
+        a, b = 1, 2
+        start = time.perf_counter()
+        for _ in range(calls):
+            assert rexec(CODE, "total") == a + b
+        return time.perf_counter() - start
+
+    return at_depth(depth, loop)
+
+
+def run():
+    af.code_cache.clear()
+    for depth in DEPTHS:
+        for label, rexec in (("inspect.stack", inspect_stack_rexec), ("caller frame", af.rexec)):
+            elapsed = measure(rexec, depth)
+            print(f"depth {depth:>4}, {label:<14} {CALLS / elapsed:10.0f} calls/sec")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+# Making and calling an anon_func.func() with collect_locals from callers with
+# more and more local variables. The previous implementation wrote a line per
+# caller local into the function's source, so each caller namespace size (and
+# each change to it) needed its own compile. It's kept here for comparison only.
+
+import sys
+import time
+
+from util import anon_func as af
+
+CALLS = 1000
+LOCAL_COUNTS = (10, 100, 1000)
+
+CODE = """
+total = 0
+for row in rows:
+    total += row * scale
+return total
+"""
+
+
+def regenerating_func(f_args: tuple, f_code: str, name: str = "anonymous_function"):
+    # The previous implementation, kept here for comparison only.
+    f_args = ", ".join(f_args) + ", __update_locals, __secret_frame"
+    secret_frame = sys._getframe(1)
+
+    func_text = f"def {name}({f_args}):\n"
+    func_text += "    if __update_locals is not None:\n"
+    func_text += "        __secret_frame.f_locals.update(__update_locals)\n"
+    for i in secret_frame.f_locals.keys():
+        func_text += f"    {i} = __secret_frame.f_locals['{i}']\n"
+    func_text += af._adjust_func_string_indentation(f_code)
+
+    out_func = af.rexec(
+        func_text,
+        name,
+        __prefix=f"{name} from anon_func.func",
+        __globals=secret_frame.f_globals,
+        __locals=secret_frame.f_locals.copy(),
+    )
+    out_func.__defaults__ = (None, secret_frame)
+    return out_func
+
+
+def make_caller(local_count: int):
+    # A caller with 'local_count' locals, a couple of which the function uses:
+    lines = [f"    v{i} = {i}" for i in range(local_count)]
+    source = "def caller(make, calls):\n    rows = list(range(20))\n"
+    source += "\n".join(lines)
+    source += """
+    start = time.perf_counter()
+    for scale in range(calls):
+        assert make(("offset",), CODE)(0) == 190 * scale
+    return time.perf_counter() - start
+"""
+    namespace = {"time": time, "CODE": CODE}
+    exec(source, namespace)
+    return namespace["caller"]
+
+
+def run():
+    for local_count in LOCAL_COUNTS:
+        caller = make_caller(local_count)
+        for label, make in (("regenerated", regenerating_func), ("bound names", af.func)):
+            af.code_cache.clear()
+            elapsed = caller(make, CALLS)
+            stats = af.code_cache.stats()
+            print(
+                f"{local_count:>5} caller locals, {label:<12} {elapsed / CALLS * 1e6:9.1f}us per func() + call"
+                f"   ({stats['misses']} compiles)"
+            )
+
+
+if __name__ == "__main__":
+    run()
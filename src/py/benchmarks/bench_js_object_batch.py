@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+# Builds a small tree of objects the way UI construction code does, one
+# JsObject operation at a time, and then again through JsObjectManager.batch().
+
+import time
+
+from .page import open_js_object_page
+
+ROWS = 200
+
+DOCUMENT_CODE = """
+return {
+    createElement: (tag) => ({tag: tag, children: [], append(child) { this.children.push(child); }}),
+};
+"""
+
+
+def build_unbatched(document, root):
+    for i in range(ROWS):
+        row = document.call_method("createElement", "tr")
+        row["className"] = "row"
+        row["textContent"] = f"Row {i}"
+        root.call_method("append", row)
+
+
+def build_batched(manager, document, root):
+    with manager.batch() as batch:
+        for i in range(ROWS):
+            row = batch.call_method(document, "createElement", "tr")
+            row["className"] = "row"
+            row["textContent"] = f"Row {i}"
+            batch.call_method(root, "append", row)
+
+
+def run(label: str, build):
+    manager, browser = open_js_object_page()
+    document = manager.from_func(DOCUMENT_CODE)
+    root = document.call_method("createElement", "table")
+
+    browser.renderer.reset_counters()
+    start = time.perf_counter()
+    build(manager, document, root)
+    elapsed = time.perf_counter() - start
+    crossings = browser.renderer.to_js + browser.renderer.to_py
+
+    print(
+        f"{label:<12} {ROWS} rows: {elapsed * 1e3:8.1f}ms, {crossings} bridge messages"
+        f" ({crossings / ROWS:.2f} per row)"
+    )
+    browser.CloseBrowser()
+
+
+if __name__ == "__main__":
+    run("unbatched", lambda manager, document, root: build_unbatched(document, root))
+    run("batched", build_batched)
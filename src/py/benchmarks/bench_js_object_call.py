@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+# Round-trip latency and CPU cost of a single JsObject call, comparing the
+# event-backed JsObjectManagerCall.wait() against the old busy-spin loop.
+
+import time
+
+from .page import open_js_object_page, summarize
+
+from tkcef import js_object
+from tkcef.js_object import JsObjectManagerCall
+
+CALLS = 2000
+
+
+class SpinWaitCall(JsObjectManagerCall):
+    # The previous implementation, kept here for comparison only.
+    def wait(self, timeout: float = None):
+        if timeout is not None:
+            self.timeout = timeout
+
+        self.start_time = time.monotonic()
+        while not self.completed:
+            self.wait_time = time.monotonic() - self.start_time
+            if self.timeout is not None and self.timeout > 0:
+                if self.wait_time > self.timeout:
+                    self.timed_out = True
+                    return
+
+
+def run(label: str, call_class: type[JsObjectManagerCall], calls: int = CALLS):
+    js_object.JsObjectManagerCall = call_class
+    try:
+        manager, browser = open_js_object_page()
+        obj = manager.from_func("return {count: 1};")
+
+        # Warm up the bridge and the preload's code paths:
+        for _ in range(100):
+            obj.get_js_type()
+
+        latencies = []
+        thread_cpu_start = time.thread_time()
+        process_cpu_start = time.process_time()
+        for _ in range(calls):
+            start = time.perf_counter()
+            obj.get_js_type()
+            latencies.append(time.perf_counter() - start)
+        thread_cpu = (time.thread_time() - thread_cpu_start) / calls
+        process_cpu = (time.process_time() - process_cpu_start) / calls
+
+        summarize(f"{label}: get_js_type() round trip", latencies)
+        print(
+            f"{'':<40} CPU/call: waiting thread {thread_cpu * 1e6:9.1f}us"
+            f"   whole process {process_cpu * 1e6:9.1f}us"
+        )
+
+        del obj
+        browser.CloseBrowser()
+    finally:
+        js_object.JsObjectManagerCall = JsObjectManagerCall
+
+
+if __name__ == "__main__":
+    run("busy-spin", SpinWaitCall)
+    run("event", JsObjectManagerCall)
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+# Repeatedly runs the same access code, with the preload's compiled-function
+# cache disabled, with it enabled, and through a JsObjectManager.compile() handle.
+
+import time
+
+from .page import open_js_object_page, summarize
+
+CALLS = 2000
+
+# A hot accessor with a realistic amount of code to parse:
+ACCESS_CODE = "\n".join(
+    ["let total = 0;"]
+    + [f"if (self.values[{i}] !== undefined) {{ total += self.values[{i}] * n; }}" for i in range(100)]
+    + ["return total;"]
+)
+
+
+def run(label: str, cache_size: int, use_handle: bool = False, calls: int = CALLS):
+    manager, browser = open_js_object_page()
+    browser.ExecuteJavascript(f"window._jsobjectman.compiled_cache_max_size = {cache_size};")
+
+    obj = manager.from_func("return {values: Array.from({length: 100}, (_, i) => i)};")
+    if use_handle:
+        accessor = manager.compile(ACCESS_CODE, ("self", "n"))
+        operation = lambda n: accessor(obj, n)
+    else:
+        operation = lambda n: obj.access(ACCESS_CODE, {"n": n})
+
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        operation(i)
+        latencies.append(time.perf_counter() - start)
+
+    summarize(f"{label}: access()", latencies)
+    stats = manager.compile_cache_stats()
+    print(f"{'':<40} cache hits {stats['hits']}, misses {stats['misses']}, size {stats['size']}")
+
+    del obj, operation
+    browser.CloseBrowser()
+
+
+if __name__ == "__main__":
+    run("no cache", 0)
+    run("cached", 512)
+    run("compile() handle", 512, use_handle=True)
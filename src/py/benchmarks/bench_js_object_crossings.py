@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+# Counts bridge messages (in both directions) per JsObject operation, including
+# the remove_fn traffic from JsObjects that get collected afterwards. Plain
+# values are passed inline; the "handle" rows store the value with from_py()
+# first, which is what every call used to do.
+
+import gc
+import time
+
+from .page import open_js_object_page
+
+CALLS = 200
+
+
+def measure(manager, browser, operation, calls: int = CALLS) -> tuple[float, float]:
+    browser.renderer.reset_counters()
+    start = time.perf_counter()
+    for _ in range(calls):
+        operation()
+    elapsed = time.perf_counter() - start
+
+    # Let the removal of collected JsObjects reach the renderer:
+    gc.collect()
+    manager.flush_releases()
+    time.sleep(0.2)
+
+    crossings = browser.renderer.to_js + browser.renderer.to_py
+    return crossings / calls, elapsed / calls
+
+
+def run():
+    manager, browser = open_js_object_page()
+    obj = manager.from_func("return {x: 0};")
+    fn = manager.from_func("return (...args) => args.length;")
+
+    operations = {
+        'set_attr("x", 5)': lambda: obj.set_attr("x", 5),
+        'set_attr("x", from_py(5))': lambda: obj.set_attr("x", manager.from_py(5)),
+        'call(1, "a", [1, 2])': lambda: fn.call(1, "a", [1, 2]),
+        'call(from_py(...) x3)': lambda: fn.call(
+            manager.from_py(1), manager.from_py("a"), manager.from_py([1, 2])
+        ),
+    }
+
+    for label, operation in operations.items():
+        per_call, latency = measure(manager, browser, operation)
+        print(f"{label:<28} {per_call:5.1f} bridge messages/call   {latency * 1e6:9.1f}us/call")
+
+    del obj, fn
+    browser.CloseBrowser()
+
+
+if __name__ == "__main__":
+    run()
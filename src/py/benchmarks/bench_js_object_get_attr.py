@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+# get_attr() round trip latency with result ids assigned by Python, compared
+# with the previous protocol, where the preload asked Python for a uuid
+# (window.with_uuid4) before it could store and answer with every result.
+
+import time
+
+from .page import open_js_object_page, summarize
+
+CALLS = 2000
+
+# Restores the with_uuid4 round trip in front of the current get_attr_fn, for comparison only:
+WITH_UUID4_GET_ATTR = """
+(() => {
+    const manager = window._jsobjectman;
+    window._py_jsobjectman.append_callback("get_attr_fn", (item_id, result_id, attr_name, callback) => {
+        window.with_uuid4((uuid) => manager._get_attr_fn(item_id, result_id, attr_name, callback));
+    });
+})();
+"""
+
+
+def run(label: str, setup_code: str = None, calls: int = CALLS):
+    manager, browser = open_js_object_page()
+    if setup_code is not None:
+        get_attr_fn = manager.get_attr_fn
+        browser.ExecuteJavascript(setup_code)
+        while manager.get_attr_fn is get_attr_fn:
+            time.sleep(0.01)
+
+    obj = manager.from_func("return {child: {count: 1}};")
+
+    # Warm up the bridge and the preload's code paths:
+    for _ in range(100):
+        obj.get_attr("child")
+
+    browser.renderer.reset_counters()
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        obj.get_attr("child")
+        latencies.append(time.perf_counter() - start)
+    crossings = browser.renderer.to_js + browser.renderer.to_py
+
+    summarize(f"{label}: get_attr()", latencies)
+    print(f"{'':<40} {crossings / calls:.2f} bridge messages/call")
+
+    del obj
+    browser.CloseBrowser()
+
+
+if __name__ == "__main__":
+    run("with_uuid4", WITH_UUID4_GET_ATTR)
+    run("python ids")
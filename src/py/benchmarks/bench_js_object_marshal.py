@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+# Bridge messages and time taken by JsObjectManager.from_py() for nested
+# structures: a table of rows holding JsObject references, at a few sizes.
+# The old container-by-container conversion is kept here for comparison.
+
+import gc
+import time
+from typing import Any
+
+from .page import open_js_object_page
+
+from tkcef.js_object import JsObject, JsObjectManager
+
+SIZES = (10, 100, 1000)
+
+
+def recursive_from_py(manager: JsObjectManager, obj: Any, store_cef_converts: bool = True) -> Any:
+    # The previous implementation, kept here for comparison only. One fadd per container.
+    if manager.can_cef_convert(obj):
+        if store_cef_converts:
+            return manager.from_func("return new_item;", {"new_item": obj}, False)
+        return obj
+
+    if isinstance(obj, JsObject):
+        return obj
+
+    if isinstance(obj, (list, tuple)):
+        pairs = [recursive_from_py(manager, i, False) for i in obj]
+        converts = [i for i in range(0, len(pairs)) if isinstance(pairs[i], JsObject)]
+        return manager.from_func(
+            "return this.convert_list_items_in_place(new_item_ids, converts);",
+            {"new_item_ids": pairs, "converts": converts},
+            False,
+        )
+
+    if isinstance(obj, dict):
+        keys = [recursive_from_py(manager, i, False) for i in obj.keys()]
+        values = [recursive_from_py(manager, i, False) for i in obj.values()]
+        return manager.from_func(
+            "return this.convert_in_place_and_make_pairs_from_lists(keys, convert_keys, values, convert_values);",
+            {
+                "keys": keys,
+                "convert_keys": [i for i in range(0, len(keys)) if isinstance(keys[i], JsObject)],
+                "values": values,
+                "convert_values": [
+                    i for i in range(0, len(values)) if isinstance(values[i], JsObject)
+                ],
+            },
+            False,
+        )
+
+    return manager.from_func("return undefined;", {}, False)
+
+
+def make_table(rows: int, ref: JsObject) -> list:
+    return [{"id": i, "label": f"Row {i}", "cells": [i, ref, (ref, "x")]} for i in range(rows)]
+
+
+def run():
+    manager, browser = open_js_object_page()
+    ref = manager.from_func("return {selected: false};")
+
+    for rows in SIZES:
+        table = make_table(rows, ref)
+        for label, from_py in (
+            ("per container", lambda: recursive_from_py(manager, table)),
+            ("single pass", lambda: manager.from_py(table)),
+        ):
+            gc.collect()
+            time.sleep(0.2)
+            browser.renderer.reset_counters()
+
+            start = time.perf_counter()
+            obj = from_py()
+            elapsed = time.perf_counter() - start
+            crossings = browser.renderer.to_js + browser.renderer.to_py
+
+            assert obj.access("return self.length").py() == rows
+            print(f"{rows:>5} rows, {label:<14} {crossings:6} bridge messages   {elapsed * 1e3:9.1f}ms")
+            del obj
+
+    browser.CloseBrowser()
+
+
+if __name__ == "__main__":
+    run()
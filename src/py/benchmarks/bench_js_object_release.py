@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+# Read-heavy DOM-style code, where every get_attr() makes a temporary JsObject.
+# Compares removing each collected JsObject from the browser right away
+# (release_threshold=1) with queueing them up and flushing once per mainloop step.
+
+import gc
+import time
+
+from .page import open_js_object_page
+
+STEPS = 20
+READS_PER_STEP = 50
+
+DOCUMENT_CODE = """
+return {body: {style: {color: "red", width: "10px"}, dataset: {id: "main"}}};
+"""
+
+
+def run(label: str, release_threshold: int):
+    manager, browser = open_js_object_page()
+    manager.release_threshold = release_threshold
+    document = manager.from_func(DOCUMENT_CODE)
+
+    gc.collect()
+    manager.flush_releases()
+    time.sleep(0.2)
+    browser.renderer.reset_counters()
+
+    start = time.perf_counter()
+    for _ in range(STEPS):
+        for _ in range(READS_PER_STEP):
+            document["body"]["style"]["color"].py()
+        # What WebApp._run_step does at the end of every mainloop step:
+        manager.flush_releases()
+    elapsed = time.perf_counter() - start
+
+    time.sleep(0.2)
+    reads = STEPS * READS_PER_STEP
+    crossings = browser.renderer.to_js + browser.renderer.to_py
+    stats = manager.release_stats()
+    print(
+        f"{label:<10} {crossings / reads:5.2f} bridge messages/read   {elapsed / reads * 1e6:8.1f}us/read"
+        f"   released {stats['released']} in {stats['flushes']} flushes, {stats['pending']} pending"
+    )
+    browser.CloseBrowser()
+
+
+if __name__ == "__main__":
+    run("immediate", 1)
+    run("queued", 256)
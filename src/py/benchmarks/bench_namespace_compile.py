@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+# What a page calling `py.exec(sameCode)` / `py.do_func(sameCode, params)` in a
+# loop costs on the Python side, with anon_func's code cache off and on.
+
+import time
+
+from . import cef_stub
+
+cef_stub.install()
+
+from tkcef.browser_namespace import BrowserNamespaceWrapper
+from util import anon_func as af
+
+SCOPE_KEY = "SCOPE_BENCHMARK"
+CALLS = 2000
+
+EXEC_CODE = """
+total = 0
+for row in rows:
+    if row % 3 == 0:
+        total += row * scale
+    elif row % 3 == 1:
+        total -= row
+    else:
+        total += 1
+label = f"{len(rows)} rows, total {total}"
+"""
+
+FUNC_CODE = """
+total = 0
+for row in range(count):
+    total += row * scale if row % 2 else -row
+return total
+"""
+
+
+def run(label: str, cache_size: int, calls: int = CALLS):
+    af.code_cache.max_size = cache_size
+    af.code_cache.clear()
+
+    BrowserNamespaceWrapper.create_namespace_if_dne(SCOPE_KEY)
+    ns = BrowserNamespaceWrapper.namespaces[SCOPE_KEY]
+    ns.set_var("rows", list(range(20)))
+    ns.set_var("scale", 2)
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        ns.exec(EXEC_CODE, "label")
+    exec_time = (time.perf_counter() - start) / calls
+
+    start = time.perf_counter()
+    for i in range(calls):
+        ns.do_func(FUNC_CODE, {"count": 20, "scale": i})
+    func_time = (time.perf_counter() - start) / calls
+
+    # The compiling alone, without the rest of what exec() does per call:
+    start = time.perf_counter()
+    for _ in range(calls):
+        af.code_cache.compile(EXEC_CODE, "<benchmark>", "exec", True)
+    compile_time = (time.perf_counter() - start) / calls
+
+    stats = BrowserNamespaceWrapper.code_cache_stats()
+    print(
+        f"{label:<10} exec {exec_time * 1e6:8.1f}us/call   do_func {func_time * 1e6:8.1f}us/call"
+        f"   compiling alone {compile_time * 1e6:6.1f}us/call"
+        f"   hit rate {stats['hit_rate']:.1%} ({stats['hits']} hits, {stats['misses']} misses)"
+    )
+
+
+if __name__ == "__main__":
+    run("no cache", 0)
+    run("cached", 512)
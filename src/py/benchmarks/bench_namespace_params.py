@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+# Namespace size and memory over many `py.exec(code, params)` calls. Each call
+# passes a value under its own name (like JS code building param names), plus
+# a handle object standing in for a wrapped JsObject. The previous
+# implementation, which copied params into the namespace, is kept here for
+# comparison only.
+
+import gc
+import time
+import tracemalloc
+import weakref
+
+from . import cef_stub
+
+cef_stub.install()
+
+from tkcef.browser_namespace import BrowserNamespaceWrapper
+from util import anon_func as af
+
+CALLS = 100000
+REPORT_EVERY = 25000
+
+CODE = "count = count + len(row)"
+
+
+class Handle:
+    # Stands in for a JsObject param; while one is alive, so is its JS storage entry.
+    pass
+
+
+def update_exec(ns: BrowserNamespaceWrapper, p_code, p_return=None, params: dict = None):
+    # The previous implementation, kept here for comparison only.
+    ns.locals.update(params)
+    return af.rexec(p_code, p_return, ns.globals, ns.locals, f"{__name__}.{ns.name}")
+
+
+def check_scoping(exec_fn):
+    # Names the code declares `global` belong to the namespace, like any other assignment,
+    # and functions it defines keep using the namespace's copy after the call:
+    BrowserNamespaceWrapper.create_namespace_if_dne("SCOPE_BENCHMARK_scoping")
+    ns = BrowserNamespaceWrapper.namespaces["SCOPE_BENCHMARK_scoping"]
+    exec_fn(ns, "counter = 0\ndef inc():\n    global counter\n    counter += 1", None, {"p": 1})
+    exec_fn(ns, "inc()\ninc()", None, {"p": 2})
+    assert ns.exec("r = counter", "r") == 2
+
+    # Comprehensions and functions the code defines see the params while it runs:
+    assert exec_fn(ns, "r = [x * factor for x in items]", "r", {"items": [1, 2], "factor": 3}) == [3, 6]
+    assert exec_fn(ns, "def scale(x):\n    return x * factor\nr = scale(2)", "r", {"factor": 4}) == 8
+
+    # But never stay in the namespace, and don't replace what they hid:
+    ns.set_var("factor", "kept")
+    exec_fn(ns, "r = factor", "r", {"factor": 5})
+    assert ns.get_var("factor") == "kept"
+    assert not ns.has_var("p") and not ns.has_var("items")
+
+
+def run(label: str, exec_fn, calls: int = CALLS):
+    scope_key = f"SCOPE_BENCHMARK_{label}"
+    BrowserNamespaceWrapper.create_namespace_if_dne(scope_key)
+    ns = BrowserNamespaceWrapper.namespaces[scope_key]
+    ns.set_var("count", 0)
+
+    handles = weakref.WeakSet()
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    for i in range(1, calls + 1):
+        handle = Handle()
+        handles.add(handle)
+        exec_fn(ns, CODE, None, {"row": [i, i], "handle": handle, f"arg{i}": i})
+        del handle
+
+        if i % REPORT_EVERY == 0:
+            gc.collect()
+            current, peak = tracemalloc.get_traced_memory()
+            print(
+                f"{label:<12} {i:>7} calls: {len(ns.globals):>7} namespace names,"
+                f" {len(handles):>7} live handles, {current / 1024:9.1f}KiB traced"
+                f"   ({(time.perf_counter() - start) / i * 1e6:.1f}us/call)"
+            )
+
+    tracemalloc.stop()
+    assert ns.get_var("count") == calls * 2
+
+
+if __name__ == "__main__":
+    run("update", update_exec)
+    check_scoping(BrowserNamespaceWrapper.exec)
+    run("bound params", BrowserNamespaceWrapper.exec)
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+# Time to allocate a namespace id as the registry fills up, and the registry's
+# stats after a run with eviction on. The previous random-probing allocator is
+# kept here for comparison only (without its per-attempt print()).
+
+import random
+import time
+
+from . import cef_stub
+
+cef_stub.install()
+
+from tkcef.browser_namespace import BrowserNamespaceWrapper
+
+MAX_NAMESPACES = 20000
+FILL_LEVELS = (0.1, 0.5, 0.9, 0.99)
+ALLOCATIONS = 200
+
+
+def random_namespace_id(namespaces: dict, max_namespaces: int) -> str:
+    # The previous implementation, kept here for comparison only.
+    new_id = "ns-py0"
+    while new_id in namespaces:
+        new_id = f"n-py{random.randint(1, max_namespaces)}"
+    return new_id
+
+
+def fill(count: int):
+    BrowserNamespaceWrapper.global_reset()
+    BrowserNamespaceWrapper.max_namespaces = MAX_NAMESPACES
+    for i in range(count):
+        # Named the way the random allocator names them, so both have to probe past them:
+        BrowserNamespaceWrapper.create_namespace_if_dne(f"n-py{i + 1}" if i > 0 else "ns-py0")
+
+
+def run():
+    for level in FILL_LEVELS:
+        fill(int(MAX_NAMESPACES * level))
+        namespaces = BrowserNamespaceWrapper.namespaces
+
+        start = time.perf_counter()
+        for _ in range(ALLOCATIONS):
+            random_namespace_id(namespaces, MAX_NAMESPACES)
+        random_time = (time.perf_counter() - start) / ALLOCATIONS
+
+        start = time.perf_counter()
+        for _ in range(ALLOCATIONS):
+            BrowserNamespaceWrapper.get_new_namespace_id()
+        counter_time = (time.perf_counter() - start) / ALLOCATIONS
+
+        print(
+            f"{level:>4.0%} full: random probing {random_time * 1e6:8.2f}us/id"
+            f"   counter {counter_time * 1e6:6.2f}us/id"
+        )
+
+    # Pages creating scopes, half of them unloading without destroying theirs:
+    BrowserNamespaceWrapper.global_reset()
+    BrowserNamespaceWrapper.max_namespaces = 1000
+    for page in range(50):
+        for _ in range(100):
+            BrowserNamespaceWrapper.get_namespace(
+                BrowserNamespaceWrapper.create_new_namespace(owner=f"page{page}")
+            ).set_var("rows", list(range(100)))
+        if page % 2 == 0:
+            BrowserNamespaceWrapper.evict_owner(f"page{page}")
+    print(f"after 5000 scopes from 50 pages: {BrowserNamespaceWrapper.stats()}")
+
+if __name__ == "__main__":
+    run()
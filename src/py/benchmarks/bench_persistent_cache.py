@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+# Time from app start until a page has all 200 of its derived values (50ms of work each), on a
+# first launch and a second one. Each launch is its own process. With @tkcef.memoize alone, every
+# launch starts cold; with persist=True, the second launch is served from the file the first wrote.
+
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from . import cef_stub
+
+cef_stub.install()
+
+import tkcef
+from tkcef.browser_namespace import BrowserNamespaceWrapper
+from tkcef.persistent_cache import PersistentCache, function_identity
+from tkcef.pyscope import PyScopeManager
+
+from .bench_pyscope_workers import CompletionCounter
+
+SCOPE_KEY = "SCOPE_BENCHMARK"
+VALUES = 200
+WORK = 0.05
+
+
+def derive(i: int) -> dict:
+    time.sleep(WORK)
+    return {"id": i, "rows": list(range(i % 50))}
+
+
+@tkcef.memoize(maxsize=1024)
+@tkcef.run_concurrently
+def derive_memoized(i: int) -> dict:
+    return derive(i)
+
+
+@tkcef.memoize(maxsize=1024, persist=True)
+@tkcef.run_concurrently
+def derive_persisted(i: int) -> dict:
+    return derive(i)
+
+
+def check_identity(path: str):
+    # Editing only a comprehension's body changes the function's identity, so the edited
+    # function misses the results its old version left in the file:
+    versions = []
+    for body in ("[x * 2 for x in xs]", "[x * 3 for x in xs]"):
+        scope = {}
+        exec(f"def scaled(xs):\n    return {body}", scope)
+        versions.append(function_identity(scope["scaled"]))
+
+    cache = PersistentCache(path)
+    cache.open()
+    cache.put(cache.key_for(versions[0], [[1, 2]]), versions[0], [2, 4])
+    assert cache.get(cache.key_for(versions[0], [[1, 2]])) == (True, [2, 4])
+    assert cache.get(cache.key_for(versions[1], [[1, 2]])) == (False, None)
+    cache.close()
+
+
+def launch(path: str, name: str):
+    start = time.perf_counter()
+    cache = PersistentCache(path)
+    cache.open()
+    cache.loaded.wait()
+    loaded = len(cache.entries)
+
+    BrowserNamespaceWrapper.create_namespace_if_dne(SCOPE_KEY)
+    ns = BrowserNamespaceWrapper.namespaces[SCOPE_KEY]
+    ns.set_var("derive_memoized", derive_memoized)
+    ns.set_var("derive_persisted", derive_persisted)
+
+    manager = PyScopeManager(max_workers=8, max_queue_depth=None)
+    counter = CompletionCounter(VALUES)
+    for i in range(VALUES):
+        manager.dispatch(str(i), counter, "call", {"id": SCOPE_KEY, "name": name, "args": [i], "kwargs": {}})
+    counter.done.wait(120)
+    elapsed = time.perf_counter() - start
+
+    manager.shutdown(wait=True)
+    cache.close()
+    stats = cache.stats()
+    print(
+        f"{elapsed * 1e3:8.1f}ms   loaded {loaded:4} entries"
+        f" in {stats['load_time'] * 1e3:5.1f}ms   wrote {stats['writes']:4}   errors {counter.errors}"
+    )
+
+
+def run(label: str, name: str):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = str(Path(temp_dir).joinpath("cache.sqlite3"))
+        for attempt in ("first launch", "second launch"):
+            print(f"{label + ', ' + attempt:<38}", end=" ", flush=True)
+            subprocess.run([sys.executable, "-m", __spec__.name, path, name], check=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        launch(sys.argv[1], sys.argv[2])
+    else:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            check_identity(str(Path(temp_dir).joinpath("cache.sqlite3")))
+        run("@memoize", "derive_memoized")
+        run("@memoize(persist=True)", "derive_persisted")
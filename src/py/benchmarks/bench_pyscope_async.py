@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+# A burst of I/O-bound `py.call()`s, each waiting 50ms, like a file read or a
+# local socket request. A plain function ties up a pool worker for the whole
+# wait; an `async def` one waits on the async loop instead.
+
+import asyncio
+import threading
+import time
+
+from . import cef_stub
+
+cef_stub.install()
+
+import tkcef
+from tkcef.browser_namespace import BrowserNamespaceWrapper
+from tkcef.pyscope import PyScopeManager
+
+from .bench_pyscope_workers import CompletionCounter
+
+SCOPE_KEY = "SCOPE_BENCHMARK"
+CALLS = 1000
+WAIT = 0.05
+
+
+@tkcef.run_concurrently
+def blocking_read(row: int):
+    time.sleep(WAIT)
+    return row
+
+
+async def async_read(row: int):
+    await asyncio.sleep(WAIT)
+    return row
+
+
+def run(label: str, manager: PyScopeManager, name: str, calls: int = CALLS):
+    BrowserNamespaceWrapper.create_namespace_if_dne(SCOPE_KEY)
+    ns = BrowserNamespaceWrapper.namespaces[SCOPE_KEY]
+    ns.set_var("blocking_read", blocking_read)
+    ns.set_var("async_read", async_read)
+
+    counter = CompletionCounter(calls)
+    peak_threads = threading.active_count()
+
+    start = time.perf_counter()
+    for i in range(calls):
+        manager.dispatch(
+            str(i), counter, "call", {"id": SCOPE_KEY, "name": name, "args": [i], "kwargs": {}}
+        )
+        peak_threads = max(peak_threads, threading.active_count())
+    counter.done.wait(120)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{label:<28} {elapsed * 1e3:8.1f}ms   peak threads {peak_threads:5}"
+        f"   completed {counter.results:5}   errors {counter.errors:5}"
+    )
+    manager.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    run("blocking, 8 workers", PyScopeManager(max_workers=8, max_queue_depth=4096), "blocking_read")
+    run("blocking, 32 workers", PyScopeManager(max_workers=32, max_queue_depth=4096), "blocking_read")
+    run("async def, 8 workers", PyScopeManager(max_workers=8, max_queue_depth=4096), "async_read")
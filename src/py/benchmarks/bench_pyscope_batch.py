@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+# A page initialising itself with a few dozen get_var/call ops: one awaited op
+# at a time, all at once with Promise.all, and as one py.batch(). Counts the
+# bridge messages each way and times it on the JavaScript side.
+
+import threading
+
+from .page import open_pyscope_page, summarize
+
+from tkcef.browser_namespace import BrowserNamespaceWrapper
+
+SCOPE_KEY = "SCOPE_BENCHMARK"
+OPS = 40
+RUNS = 20
+
+MEASURE = """
+(async () => {
+    const scope = new PyScope(window.app_scope_key, false, false, false);
+    await scope.create(false);
+
+    const ops = [];
+    for (let i = 0; i < %(ops)d; i++) {
+        ops.push(i %% 2 ? ["get_var", {name: "setting"}] : ["call", {name: "lookup", args: [i], kwargs: {}}]);
+    }
+    const modes = {
+        sequential: async () => {
+            const results = [];
+            for (const [op, kwargs] of ops) {
+                results.push(await scope.op(op, kwargs));
+            }
+            return results;
+        },
+        all: () => Promise.all(ops.map(([op, kwargs]) => scope.op(op, kwargs))),
+        batch: () => scope.batch(ops),
+    };
+
+    const samples = [];
+    for (let i = 0; i < %(runs)d; i++) {
+        start_counting();
+        const start = performance.now();
+        const results = await modes["%(mode)s"]();
+        samples.push((performance.now() - start) / 1000);
+        if (results.length !== ops.length) {
+            throw new Error("Missing results");
+        }
+    }
+    report_samples(samples);
+})();
+"""
+
+
+def run(mode: str, ops: int = OPS, runs: int = RUNS):
+    done = threading.Event()
+    results = []
+    crossings = []
+
+    BrowserNamespaceWrapper.create_namespace_if_dne(SCOPE_KEY)
+    ns = BrowserNamespaceWrapper.namespaces[SCOPE_KEY]
+    ns.set_var("setting", "dark")
+    ns.set_var("lookup", lambda i: i * 2)
+
+    def start_counting():
+        if browser is not None:
+            crossings.append(browser.renderer.to_js + browser.renderer.to_py)
+            browser.renderer.reset_counters()
+
+    def report_samples(samples):
+        start_counting()
+        results.extend(samples)
+        done.set()
+
+    browser = None
+    pyscopemanager, browser = open_pyscope_page(
+        SCOPE_KEY, {"report_samples": report_samples, "start_counting": start_counting}
+    )
+    browser.ExecuteJavascript(MEASURE % {"ops": ops, "runs": runs, "mode": mode})
+
+    if not done.wait(runs * ops * 0.1 + 10):
+        raise TimeoutError(f"{mode}: the page never reported its samples.")
+
+    # The first count covers the page's setup, not a run:
+    per_run = crossings[1:]
+    summarize(
+        f"{mode:<10} {ops} ops, {sum(per_run) / len(per_run):5.0f} messages/run", results, 1e3, "ms"
+    )
+    pyscopemanager.shutdown()
+    browser.CloseBrowser()
+
+
+if __name__ == "__main__":
+    run("sequential")
+    run("all")
+    run("batch")
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+# Round trip latency of a trivial `py.call("test_func")` from the page, timed
+# on the JavaScript side. Compares promises settled directly by
+# _complete_callback with the previous 100ms setInterval polling.
+
+import threading
+
+from .page import open_pyscope_page, summarize
+
+from tkcef.browser_namespace import BrowserNamespaceWrapper
+
+CALLS = 50
+SCOPE_KEY = "SCOPE_BENCHMARK"
+
+# The previous implementation, kept here for comparison only:
+POLLING_SCOPE_MANAGER = """
+window._scopeman = {
+    retVals: {},
+    scope_call(op, kwargs = {}) {
+        let call_id = Math.random().toString();
+        this.retVals[call_id] = {completed: false, outcome: null};
+        window._py_scopeman.dispatch(call_id, this._complete_callback.bind(this), op, kwargs);
+        return new Promise((resolve, reject) => this._checkValue(call_id, resolve, reject));
+    },
+    _checkValue(call_id, resolve, reject) {
+        let return_interval_id = setInterval(() => {
+            let call = this.retVals[call_id];
+            if (call.completed) {
+                delete this.retVals[call_id];
+                clearInterval(return_interval_id);
+                resolve(call.outcome['result']);
+            }
+        }, 100);
+    },
+    _complete_callback(call_id, result) {
+        this.retVals[call_id].outcome = result;
+        this.retVals[call_id].completed = true;
+    },
+};
+"""
+
+MEASURE = """
+(async () => {
+    const scope = new PyScope(window.app_scope_key, false, false, false);
+    await scope.create(false);
+
+    const samples = [];
+    for (let i = 0; i < %d; i++) {
+        const start = performance.now();
+        await scope.call("test_func");
+        samples.push((performance.now() - start) / 1000);
+    }
+    report_samples(samples);
+})();
+"""
+
+
+def run(label: str, setup_code: str = None, calls: int = CALLS):
+    done = threading.Event()
+    results = []
+
+    def report_samples(samples):
+        results.extend(samples)
+        done.set()
+
+    BrowserNamespaceWrapper.create_namespace_if_dne(SCOPE_KEY)
+    BrowserNamespaceWrapper.namespaces[SCOPE_KEY].set_var("test_func", lambda: None)
+
+    pyscopemanager, browser = open_pyscope_page(SCOPE_KEY, {"report_samples": report_samples})
+    if setup_code is not None:
+        browser.ExecuteJavascript(setup_code)
+    browser.ExecuteJavascript(MEASURE % calls)
+
+    if not done.wait(calls * 0.5 + 10):
+        raise TimeoutError(f"{label}: the page never reported its samples.")
+
+    summarize(f"{label}: py.call('test_func')", results, 1e3, "ms")
+    browser.CloseBrowser()
+
+
+if __name__ == "__main__":
+    run("setInterval polling", POLLING_SCOPE_MANAGER)
+    run("direct resolution")
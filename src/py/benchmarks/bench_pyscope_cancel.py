@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+# A search box firing a `py.call()` on every keystroke, with only the last one's
+# result wanted. Without cancellation, every stale search still runs to the end and
+# holds up the one that matters. With it, each keystroke aborts the previous call:
+# queued ones are dropped, and the running one stops at its next check.
+
+import threading
+import time
+
+from . import cef_stub
+
+cef_stub.install()
+
+import tkcef
+from tkcef.browser_namespace import BrowserNamespaceWrapper
+from tkcef.pyscope import PyScopeManager
+
+SCOPE_KEY = "SCOPE_BENCHMARK"
+KEYSTROKES = 20
+TYPING_DELAY = 0.002
+SEARCH_STEPS = 20
+STEP_TIME = 0.01
+
+
+class SearchStats:
+    def __init__(self):
+        self.steps = 0
+        self.started = 0
+        self._lock = threading.Lock()
+
+    @tkcef.run_concurrently
+    def search(self, query: str):
+        with self._lock:
+            self.started += 1
+        call = tkcef.current_call()
+        for _ in range(SEARCH_STEPS):
+            if call is not None and call.cancelled:
+                return None
+            time.sleep(STEP_TIME)
+            with self._lock:
+                self.steps += 1
+        return query
+
+
+class LastResult:
+    # Stands in for the page's _complete_callback, waiting on the last keystroke's result.
+    def __init__(self, last_id: str):
+        self.last_id = last_id
+        self.callbacks = 0
+        self.done = threading.Event()
+
+    def Call(self, call_id: str, outcome: dict):
+        self.callbacks += 1
+        if call_id == self.last_id:
+            self.done.set()
+
+
+def run(label: str, cancel_stale: bool):
+    manager = PyScopeManager(max_workers=2)
+    stats = SearchStats()
+
+    BrowserNamespaceWrapper.create_namespace_if_dne(SCOPE_KEY)
+    BrowserNamespaceWrapper.namespaces[SCOPE_KEY].set_var("search", stats.search)
+
+    callback = LastResult(str(KEYSTROKES - 1))
+    start = time.perf_counter()
+    for i in range(KEYSTROKES):
+        if cancel_stale and i > 0:
+            manager.cancel(str(i - 1))
+        manager.dispatch(
+            str(i), callback, "call", {"id": SCOPE_KEY, "name": "search", "args": ["q" * (i + 1)], "kwargs": {}}
+        )
+        time.sleep(TYPING_DELAY)
+    callback.done.wait(60)
+    elapsed = time.perf_counter() - start
+
+    manager.shutdown(wait=True)
+    print(
+        f"{label:<22} last result after {elapsed * 1e3:8.1f}ms   searches started {stats.started:3}"
+        f"   search steps run {stats.steps:4}   callbacks {callback.callbacks:3}"
+    )
+
+
+if __name__ == "__main__":
+    run("no cancellation", False)
+    run("abort previous call", True)
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+# How late a 10ms UI loop tick (like AppManager.mainloop()'s) runs while the page has
+# CPU-heavy `py.call()`s in flight. On the worker lane they hold the GIL away from the
+# loop; with @tkcef.cpu_bound, they run in worker processes instead.
+
+import sched
+import threading
+import time
+
+from . import cef_stub
+
+cef_stub.install()
+
+import tkcef
+from tkcef.browser_namespace import BrowserNamespaceWrapper
+from tkcef.pyscope import PyScopeManager
+from tkcef.process_pool import ProcessPool
+
+from .bench_pyscope_workers import CompletionCounter
+from .page import summarize
+
+SCOPE_KEY = "SCOPE_BENCHMARK"
+CALLS = 8
+WORK = 3_000_000
+TICK = 0.01
+
+
+def crunch(n: int) -> int:
+    total = 0
+    for i in range(n):
+        total += i * i % 7
+    return total
+
+
+@tkcef.cpu_bound
+def crunch_offloaded(n: int) -> int:
+    return crunch(n)
+
+
+def measure_ticks(until: threading.Event) -> list[float]:
+    # Same scheduling as AppManager.mainloop(). Records how late each tick ran:
+    scheduler = sched.scheduler()
+    lateness = []
+    while not until.is_set():
+        expected = time.perf_counter() + TICK
+        scheduler.enter(TICK, 0, lambda: None)
+        scheduler.run()
+        lateness.append(time.perf_counter() - expected)
+    return lateness
+
+
+def run(label: str, name: str, manager: PyScopeManager):
+    counter = CompletionCounter(CALLS)
+
+    def call_from_page():
+        for i in range(CALLS):
+            manager.dispatch(
+                str(i), counter, "call", {"id": SCOPE_KEY, "name": name, "args": [WORK], "kwargs": {}}
+            )
+
+    start = time.perf_counter()
+    threading.Thread(target=call_from_page).start()
+    lateness = measure_ticks(counter.done)
+    elapsed = time.perf_counter() - start
+
+    summarize(f"{label}: tick lateness", lateness, 1e3, "ms")
+    print(
+        f"{label}: worst tick {max(lateness) * 1e3:.1f}ms late, all {CALLS} calls done in"
+        f" {elapsed * 1e3:.0f}ms ({counter.results} ok, {counter.errors} errors)"
+    )
+    manager.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    BrowserNamespaceWrapper.create_namespace_if_dne(SCOPE_KEY)
+    ns = BrowserNamespaceWrapper.namespaces[SCOPE_KEY]
+    ns.set_var("crunch", crunch)
+    ns.set_var("crunch_offloaded", crunch_offloaded)
+
+    run("worker lane (threads)", "crunch", PyScopeManager(max_workers=4))
+
+    process_pool = ProcessPool(4)
+    for future in process_pool.warm_up():
+        future.result()
+    run("@cpu_bound (processes)", "crunch_offloaded", PyScopeManager(max_workers=4, process_pool=process_pool))
+    process_pool.shutdown()
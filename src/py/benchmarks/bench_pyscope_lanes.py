@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+# How long each dispatch holds up the CEF thread, for a page mixing slow `py.exec()`s
+# (20ms of work each) with quick `py.get_var()`s. Before lanes, exec ran on the CEF thread
+# itself; now it goes to the worker pool, and a namespace (or function) can ask for Tk's
+# main thread instead. Tk's thread is stood in for by a thread draining a queue, like
+# App._run_step() does.
+
+import queue
+import threading
+import time
+
+from . import cef_stub
+
+cef_stub.install()
+
+import tkcef
+from tkcef.browser_namespace import BrowserNamespaceWrapper
+from tkcef.pyscope import PyScopeManager
+
+from .bench_pyscope_workers import CompletionCounter
+from .page import summarize
+
+SCOPE_KEY = "SCOPE_BENCHMARK"
+TK_SCOPE_KEY = "SCOPE_BENCHMARK_TK"
+CALLS = 100
+SLOW_CODE = "time.sleep(0.02)"
+
+
+class CefThreadExecManager(PyScopeManager):
+    # The previous implementation, kept here for comparison only.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.register_op("exec", self.exec, tkcef.CEF_LANE)
+
+
+class TkThread:
+    # Stands in for App.queue_update_action() and the Tk main loop that drains it.
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def queue_update_action(self, fn, *args):
+        self.queue.put((fn, args))
+
+    def _run(self):
+        while True:
+            fn, args = self.queue.get()
+            if fn is None:
+                return
+            fn(*args)
+
+    def stop(self):
+        self.queue.put((None, ()))
+        self.thread.join()
+
+
+def run(label: str, manager: PyScopeManager, scope_key: str = SCOPE_KEY):
+    ns = BrowserNamespaceWrapper.namespaces[scope_key]
+    ns.set_var("time", time)
+    ns.set_var("value", 1)
+
+    tk_thread = TkThread()
+    manager.tk_queue = tk_thread.queue_update_action
+    counter = CompletionCounter(CALLS * 2)
+
+    blocked = []
+    for i in range(CALLS):
+        for op, kwargs in (
+            ("exec", {"id": scope_key, "code": SLOW_CODE, "ret_name": None, "params": {}}),
+            ("get_var", {"id": scope_key, "name": "value"}),
+        ):
+            start = time.perf_counter()
+            manager.dispatch(f"{op}{i}", counter, op, kwargs)
+            blocked.append(time.perf_counter() - start)
+    counter.done.wait(60)
+
+    summarize(f"{label}: CEF thread held per dispatch", blocked, 1e3, "ms")
+    for lane, stats in manager.stats()["lanes"].items():
+        if stats["calls"] > 0:
+            print(
+                f"    {lane:<7} {stats['calls']:4} calls   busy {stats['busy'] * 1e3:8.1f}ms"
+                f"   waited {stats['waited'] * 1e3:8.1f}ms   slowest {stats['slowest'] * 1e3:6.1f}ms"
+            )
+
+    manager.shutdown(wait=True)
+    tk_thread.stop()
+
+
+if __name__ == "__main__":
+    # The slow execs would log a warning each, on the CEF thread:
+    tkcef.logger.disabled = True
+
+    BrowserNamespaceWrapper.create_namespace_if_dne(SCOPE_KEY)
+    BrowserNamespaceWrapper.create_namespace_if_dne(TK_SCOPE_KEY, lane=tkcef.TK_LANE)
+
+    run("exec on the CEF thread", CefThreadExecManager(max_workers=8))
+    run("exec on the worker lane", PyScopeManager(max_workers=8))
+    run("namespace on the Tk lane", PyScopeManager(max_workers=8), TK_SCOPE_KEY)
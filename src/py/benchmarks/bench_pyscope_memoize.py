@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+# A page asking for the same few reports over and over (1000 `py.call()`s across 10
+# distinct arguments), where each report takes 20ms to build. Without @tkcef.memoize,
+# every call runs on a worker; with it, repeats are answered from the cache on the CEF
+# thread, and never reach the pool. Repeats made while the first is still running wait
+# on it, rather than running again.
+
+import threading
+import time
+
+from . import cef_stub
+
+cef_stub.install()
+
+import tkcef
+from tkcef.browser_namespace import BrowserNamespaceWrapper
+from tkcef.process_pool import ProcessPool
+from tkcef.pyscope import PyScopeManager
+
+from .page import summarize
+
+SCOPE_KEY = "SCOPE_BENCHMARK"
+CALLS = 1000
+DISTINCT = 10
+
+
+@tkcef.run_concurrently
+def build_report(month: int) -> dict:
+    time.sleep(0.02)
+    return {"month": month, "total": month * 1000}
+
+
+@tkcef.memoize(maxsize=64, ttl=60)
+@tkcef.run_concurrently
+def build_report_memoized(month: int) -> dict:
+    return build_report(month)
+
+
+@tkcef.memoize(maxsize=64)
+@tkcef.cpu_bound
+def crunch_memoized(month: int) -> int:
+    return sum(i * i % 7 for i in range(200_000)) + month
+
+
+class LatencyRecorder:
+    # Stands in for the page's _complete_callback, timing each call from dispatch to result.
+    def __init__(self, expected: int):
+        self.expected = expected
+        self.started = {}
+        self.latencies = []
+        self.errors = 0
+        self._lock = threading.Lock()
+        self.done = threading.Event()
+
+    def Call(self, call_id: str, outcome: dict):
+        with self._lock:
+            self.latencies.append(time.perf_counter() - self.started[call_id])
+            if outcome["error"] is not None:
+                self.errors += 1
+            if len(self.latencies) == self.expected:
+                self.done.set()
+
+
+def run(label: str, name: str, calls: int = CALLS, process_pool: ProcessPool = None):
+    manager = PyScopeManager(max_workers=8, max_queue_depth=None, process_pool=process_pool)
+    recorder = LatencyRecorder(calls)
+
+    start = time.perf_counter()
+    for i in range(calls):
+        recorder.started[str(i)] = time.perf_counter()
+        manager.dispatch(
+            str(i), recorder, "call", {"id": SCOPE_KEY, "name": name, "args": [i % DISTINCT], "kwargs": {}}
+        )
+    recorder.done.wait(120)
+    elapsed = time.perf_counter() - start
+
+    summarize(f"{label}: latency", recorder.latencies, 1e3, "ms")
+    print(
+        f"{label}: {calls} calls in {elapsed * 1e3:.0f}ms, {manager.worker_pool.stats()['completed']} reached"
+        f" the worker pool, {recorder.errors} errors"
+    )
+    manager.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    BrowserNamespaceWrapper.create_namespace_if_dne(SCOPE_KEY)
+    ns = BrowserNamespaceWrapper.namespaces[SCOPE_KEY]
+    ns.set_var("build_report", build_report)
+    ns.set_var("build_report_memoized", build_report_memoized)
+    ns.set_var("crunch_memoized", crunch_memoized)
+
+    run("plain", "build_report")
+    run("@memoize", "build_report_memoized")
+    run("@memoize, warm", "build_report_memoized")
+    print(f"    {build_report_memoized.cache_stats()}")
+
+    process_pool = ProcessPool(2)
+    run("@memoize @cpu_bound", "crunch_memoized", 200, process_pool)
+    print(f"    {crunch_memoized.cache_stats()}")
+    process_pool.shutdown()
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+# Reading a big listing (like a directory scan) from Python: as one list, as a
+# generator streamed to the page a chunk at a time, and as an async generator.
+# Timed on the JavaScript side, to the first item and to the last. Also checks
+# that breaking out of `for await` early closes the Python generator.
+
+import asyncio
+import threading
+
+from .page import open_pyscope_page, summarize
+
+from tkcef.browser_namespace import BrowserNamespaceWrapper
+
+SCOPE_KEY = "SCOPE_BENCHMARK"
+ROWS = 50000
+CHUNK_SIZE = 500
+RUNS = 5
+
+closed = []
+
+
+def make_row(i: int) -> dict:
+    return {"name": f"file_{i}.txt", "size": i * 17, "dir": i % 10 == 0}
+
+
+def list_rows(count: int) -> list:
+    return [make_row(i) for i in range(count)]
+
+
+def iter_rows(count: int):
+    try:
+        for i in range(count):
+            yield make_row(i)
+    finally:
+        closed.append(count)
+
+
+async def aiter_rows(count: int):
+    for i in range(count):
+        if i % CHUNK_SIZE == 0:
+            await asyncio.sleep(0)
+        yield make_row(i)
+
+
+MEASURE = """
+(async () => {
+    const scope = new PyScope(window.app_scope_key, false, false, false);
+    await scope.create(false);
+
+    const first = [];
+    const total = [];
+    for (let run = 0; run < %(runs)d; run++) {
+        const start = performance.now();
+        let count = 0;
+        const result = await scope.call("%(name)s", %(rows)d);
+        if (Array.isArray(result)) {
+            for (const row of result) {
+                if (count++ === 0) first.push((performance.now() - start) / 1000);
+            }
+        } else {
+            for await (const row of result) {
+                if (count++ === 0) first.push((performance.now() - start) / 1000);
+            }
+        }
+        if (count !== %(rows)d) throw new Error(`Got ${count} rows`);
+        total.push((performance.now() - start) / 1000);
+    }
+
+    // Stopping early:
+    for await (const row of await scope.call("%(name)s", %(rows)d)) {
+        break;
+    }
+    report_samples(first, total);
+})();
+"""
+
+
+def run(label: str, name: str, rows: int = ROWS, runs: int = RUNS):
+    done = threading.Event()
+    results = {}
+
+    def report_samples(first, total):
+        results["first"] = first
+        results["total"] = total
+        done.set()
+
+    BrowserNamespaceWrapper.create_namespace_if_dne(SCOPE_KEY)
+    ns = BrowserNamespaceWrapper.namespaces[SCOPE_KEY]
+    for fn in (list_rows, iter_rows, aiter_rows):
+        ns.set_var(fn.__name__, fn)
+
+    pyscopemanager, browser = open_pyscope_page(SCOPE_KEY, {"report_samples": report_samples})
+    pyscopemanager.stream_chunk_size = CHUNK_SIZE
+    closed.clear()
+    browser.ExecuteJavascript(MEASURE % {"name": name, "rows": rows, "runs": runs})
+
+    if not done.wait(120):
+        raise TimeoutError(f"{label}: the page never reported its samples.")
+
+    summarize(f"{label}: first row", results["first"], 1e3, "ms")
+    summarize(f"{label}: all {rows} rows", results["total"], 1e3, "ms")
+    if name == "iter_rows":
+        print(f"{label}: generators closed {len(closed)} of {runs + 1}, open streams {len(pyscopemanager.streams)}")
+    pyscopemanager.shutdown()
+    browser.CloseBrowser()
+
+
+if __name__ == "__main__":
+    run("list", "list_rows")
+    run("generator", "iter_rows")
+    run("async generator", "aiter_rows")
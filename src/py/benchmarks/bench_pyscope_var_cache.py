@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+# A page polling a few settings (like a render loop reading the theme), 2000 `py.get_var()`s
+# across 4 variables. Without caching, every read crosses to Python and back. With
+# `get_var(name, true)`, only the first read of each does, and Python pushes changes to the
+# page as they're made: halfway through, the page calls a Python function that changes a
+# setting, and checks every read after it returns sees the new value.
+
+import threading
+
+from .page import open_pyscope_page, summarize
+
+from tkcef.browser_namespace import BrowserNamespaceWrapper
+
+SCOPE_KEY = "SCOPE_BENCHMARK"
+READS = 2000
+NAMES = ["theme", "font_size", "layout", "locale"]
+
+MEASURE = """
+(async () => {
+    const scope = new PyScope(window.app_scope_key, false, false, false);
+    await scope.create(false);
+    const names = %(names)s;
+    const cached = %(cached)s;
+
+    const samples = [];
+    let stale = 0;
+    start_counting();
+    for (let i = 0; i < %(reads)d; i++) {
+        if (i === %(reads)d / 2) {
+            await scope.call("change_setting");
+        }
+        const start = performance.now();
+        const value = await scope.get_var(names[i %% names.length], cached);
+        samples.push((performance.now() - start) / 1000);
+        if (i >= %(reads)d / 2 && names[i %% names.length] === "theme" && value !== "light") {
+            stale++;
+        }
+    }
+
+    // Deleted from Python, so a cached read has to say it's gone:
+    await scope.call("remove_setting");
+    const exists = await scope.has_var("locale", cached);
+    report_samples(samples, stale, exists);
+})();
+"""
+
+
+def run(label: str, cached: bool, reads: int = READS):
+    done = threading.Event()
+    results = {}
+    crossings = []
+
+    BrowserNamespaceWrapper.create_namespace_if_dne(SCOPE_KEY)
+    ns = BrowserNamespaceWrapper.namespaces[SCOPE_KEY]
+    ns.set_var("theme", "dark")
+    ns.set_var("font_size", 14)
+    ns.set_var("layout", {"columns": 3, "panels": ["tree", "editor", "console"]})
+    ns.set_var("locale", "en-GB")
+    ns.set_var("change_setting", lambda: ns.set_var("theme", "light"))
+    ns.set_var("remove_setting", lambda: ns.del_var("locale"))
+
+    def start_counting():
+        crossings.append(browser.renderer.to_js + browser.renderer.to_py)
+        browser.renderer.reset_counters()
+
+    def report_samples(samples, stale, exists):
+        start_counting()
+        results.update(samples=samples, stale=stale, exists=exists)
+        done.set()
+
+    browser = None
+    pyscopemanager, browser = open_pyscope_page(
+        SCOPE_KEY,
+        {
+            "report_samples": report_samples,
+            "start_counting": start_counting,
+        },
+    )
+    browser.ExecuteJavascript(
+        MEASURE % {"reads": reads, "names": repr(NAMES), "cached": "true" if cached else "false"}
+    )
+
+    if not done.wait(reads * 0.01 + 10):
+        raise TimeoutError(f"{label}: the page never reported its samples.")
+
+    summarize(f"{label}: get_var", results["samples"])
+    print(
+        f"{label}: {crossings[-1]} messages for {reads} reads, {results['stale']} stale reads after the"
+        f" change, 'locale' exists after del_var: {results['exists']}"
+    )
+    pyscopemanager.shutdown()
+    browser.CloseBrowser()
+
+
+if __name__ == "__main__":
+    run("uncached", False)
+    run("cached", True)
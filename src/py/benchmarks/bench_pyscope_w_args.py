@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+# `py.w_call("test_func", ...)` latency at a few argument counts, timed on the
+# JavaScript side. Compares registering every argument in one synchronous
+# add_many() step with the previous one-awaited-JsObject()-per-argument
+# registration, which is kept here for comparison only.
+
+import threading
+
+from .page import open_pyscope_page, summarize
+
+from tkcef.browser_namespace import BrowserNamespaceWrapper
+
+CALLS = 50
+ARG_COUNTS = (1, 10, 50)
+SCOPE_KEY = "SCOPE_BENCHMARK"
+
+# The previous implementation, kept here for comparison only:
+AWAIT_PER_ARGUMENT = """
+PyScope.prototype.make_w_arg = async function (item, auto_convert = false) {
+    let js_type = typeof item;
+    if (auto_convert && PyScope.inline_types.indexOf(js_type) !== -1) {
+        return [js_type, null, item];
+    }
+    return [js_type, await JsObject(item)];
+};
+PyScope.prototype.make_w_args = async function (args, auto_convert = false) {
+    let arg_ids = [];
+    for (let i = 0; i < args.length; i++) {
+        arg_ids.push(await this.make_w_arg(args[i], auto_convert));
+    }
+    return arg_ids;
+};
+PyScope.prototype.make_w_kwargs = async function (kwargs, auto_convert = false) {
+    let kwarg_ids = {};
+    for (const [key, value] of Object.entries(kwargs)) {
+        kwarg_ids[key] = await this.make_w_arg(value, auto_convert);
+    }
+    return kwarg_ids;
+};
+PyScope.prototype.w_call_kw = async function (name, args = [], kwargs = {}, auto_convert = false) {
+    return await window._scopeman.scope_call("w_call", {
+        "id": this.id,
+        "name": name,
+        "args": await this.make_w_args(args, auto_convert),
+        "kwargs": await this.make_w_kwargs(kwargs, auto_convert),
+        "auto_convert": auto_convert
+    });
+};
+"""
+
+MEASURE = """
+(async () => {
+    const scope = new PyScope(window.app_scope_key, false, false, false);
+    await scope.create(false);
+
+    const args = [];
+    for (let i = 0; i < %(args)d; i++) {
+        args.push({row: i});
+    }
+    const samples = [];
+    for (let i = 0; i < %(calls)d; i++) {
+        const start = performance.now();
+        await scope.w_call("test_func", ...args);
+        samples.push((performance.now() - start) / 1000);
+    }
+    report_samples(samples);
+})();
+"""
+
+
+def run(label: str, arg_count: int, setup_code: str = None, calls: int = CALLS):
+    done = threading.Event()
+    results = []
+
+    def report_samples(samples):
+        results.extend(samples)
+        done.set()
+
+    BrowserNamespaceWrapper.create_namespace_if_dne(SCOPE_KEY)
+    BrowserNamespaceWrapper.namespaces[SCOPE_KEY].set_var("test_func", lambda *args: len(args))
+
+    pyscopemanager, browser = open_pyscope_page(SCOPE_KEY, {"report_samples": report_samples})
+    if setup_code is not None:
+        browser.ExecuteJavascript(setup_code)
+    browser.ExecuteJavascript(MEASURE % {"args": arg_count, "calls": calls})
+
+    if not done.wait(calls * 0.5 + 10):
+        raise TimeoutError(f"{label}: the page never reported its samples.")
+
+    summarize(f"{label}, {arg_count:>2} args", results, 1e3, "ms")
+    pyscopemanager.shutdown()
+    browser.CloseBrowser()
+
+
+if __name__ == "__main__":
+    for arg_count in ARG_COUNTS:
+        run("await per argument", arg_count, AWAIT_PER_ARGUMENT)
+        run("add_many          ", arg_count)
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+# `py.aw_call("test_func", ...)` with 10 mixed arguments, timed on the
+# JavaScript side, with bridge messages counted. The previous argument format
+# (bare handle ids) is kept here for comparison only, with the type check it
+# needed to auto-convert anything: a get_js_type() and then a py() per argument.
+
+import threading
+
+from .page import open_pyscope_page, summarize
+
+from tkcef.browser_namespace import BrowserNamespaceWrapper
+from tkcef.pyscope import PyScopeManager
+
+CALLS = 50
+SCOPE_KEY = "SCOPE_BENCHMARK"
+
+HANDLE_IDS_ONLY = """
+PyScope.prototype.make_w_arg_list = function (items, auto_convert) {
+    return window._jsobjectman.add_many(items);
+};
+"""
+
+
+class TypeRoundTripScopeManager(PyScopeManager):
+    # The previous implementation, kept here for comparison only.
+    def make_w_arg(self, do_auto_convert: bool, arg: str):
+        new_obj = self.js_object_manager.from_id(arg)
+
+        if do_auto_convert and new_obj.get_js_type() in self.auto_convert_types:
+            return new_obj.py()
+        return new_obj
+
+
+MEASURE = """
+(async () => {
+    const scope = new PyScope(window.app_scope_key, false, false, false);
+    await scope.create(false);
+
+    const element = {tag: "div", children: []};
+    const samples = [];
+    for (let i = 0; i < %d; i++) {
+        start_counting();
+        const start = performance.now();
+        await scope.aw_call("test_func", i, "row", true, 2.5, element, [1, 2], "x", false, null, i * 2);
+        samples.push((performance.now() - start) / 1000);
+    }
+    report_samples(samples);
+})();
+"""
+
+
+def test_func(*args):
+    assert args[1] == "row" and args[2] is True and args[4].js_type == "object"
+    return len(args)
+
+
+def run(label: str, manager_type: type[PyScopeManager], setup_code: str = None, calls: int = CALLS):
+    done = threading.Event()
+    results = []
+    crossings = []
+
+    BrowserNamespaceWrapper.create_namespace_if_dne(SCOPE_KEY)
+    BrowserNamespaceWrapper.namespaces[SCOPE_KEY].set_var("test_func", test_func)
+
+    def start_counting():
+        if browser is not None:
+            crossings.append(browser.renderer.to_js + browser.renderer.to_py)
+            browser.renderer.reset_counters()
+
+    def report_samples(samples):
+        start_counting()
+        results.extend(samples)
+        done.set()
+
+    browser = None
+    pyscopemanager, browser = open_pyscope_page(
+        SCOPE_KEY,
+        {"report_samples": report_samples, "start_counting": start_counting},
+        manager_type=manager_type,
+    )
+    if setup_code is not None:
+        browser.ExecuteJavascript(setup_code)
+    browser.ExecuteJavascript(MEASURE % calls)
+
+    if not done.wait(calls * 0.5 + 10):
+        raise TimeoutError(f"{label}: the page never reported its samples.")
+
+    per_call = crossings[2:]
+    summarize(
+        f"{label:<20} {sum(per_call) / len(per_call):5.1f} messages/call", results, 1e3, "ms"
+    )
+    pyscopemanager.shutdown()
+    browser.CloseBrowser()
+
+
+if __name__ == "__main__":
+    run("type round trips", TypeRoundTripScopeManager, HANDLE_IDS_ONLY)
+    run("type tags", PyScopeManager)
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+# A burst of JS -> Python calls through PyScopeManager's "call" op, the way a
+# scroll handler or per-row render fires them. Compares a new thread per call
+# with the bounded worker pool, including what happens once the pool is full.
+# Calls into one namespace run one at a time by default, so the pool runs opt out
+# of that, like independent calls such as these can.
+
+import threading
+import time
+
+from . import cef_stub
+
+cef_stub.install()
+
+import tkcef
+from tkcef.browser_namespace import BrowserNamespaceWrapper
+from tkcef.pyscope import PyScopeManager
+
+SCOPE_KEY = "SCOPE_BENCHMARK"
+CALLS = 1000
+
+
+class ThreadPerCallScopeManager(PyScopeManager):
+    # The previous implementation, kept here for comparison only.
+    def run_in_pool(self, *args):
+        thread = threading.Thread(None, self.complete_op, args=args)
+        thread.start()
+
+
+class CompletionCounter:
+    # Stands in for the page's _complete_callback.
+    def __init__(self, expected: int):
+        self.expected = expected
+        self.results = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self.done = threading.Event()
+
+    def Call(self, call_id: str, outcome: dict):
+        with self._lock:
+            if outcome["error"] is None:
+                self.results += 1
+            else:
+                self.errors += 1
+            if self.results + self.errors == self.expected:
+                self.done.set()
+
+
+def work(row: int):
+    # Some I/O-like waiting, and a little work:
+    time.sleep(0.01)
+    return sum(range(200)) + row
+
+
+@tkcef.run_concurrently
+def test_func(row: int):
+    return work(row)
+
+
+def serial_func(row: int):
+    return work(row)
+
+
+def check_ordering():
+    # Un-awaited calls into one namespace still run in the order the page made them:
+    BrowserNamespaceWrapper.create_namespace_if_dne("SCOPE_BENCHMARK_ordering")
+    manager = PyScopeManager(max_workers=8)
+    counter = CompletionCounter(2)
+    for i, code in enumerate(("import time\ntime.sleep(.05)\nx = 1", "y = x + 1")):
+        manager.dispatch(
+            str(i), counter, "exec", {"id": "SCOPE_BENCHMARK_ordering", "code": code, "ret_name": None, "params": {}}
+        )
+    counter.done.wait(10)
+    manager.shutdown(wait=True)
+    assert counter.errors == 0 and BrowserNamespaceWrapper.namespaces["SCOPE_BENCHMARK_ordering"].get_var("y") == 2
+
+
+def run(label: str, manager: PyScopeManager, calls: int = CALLS, name: str = "test_func"):
+    BrowserNamespaceWrapper.create_namespace_if_dne(SCOPE_KEY)
+    BrowserNamespaceWrapper.namespaces[SCOPE_KEY].set_var("test_func", test_func)
+    BrowserNamespaceWrapper.namespaces[SCOPE_KEY].set_var("serial_func", serial_func)
+
+    counter = CompletionCounter(calls)
+    peak_threads = threading.active_count()
+
+    start = time.perf_counter()
+    for i in range(calls):
+        manager.dispatch(
+            str(i), counter, "call", {"id": SCOPE_KEY, "name": name, "args": [i], "kwargs": {}}
+        )
+        peak_threads = max(peak_threads, threading.active_count())
+    counter.done.wait(60)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{label:<32} {elapsed * 1e3:8.1f}ms   peak threads {peak_threads:5}"
+        f"   completed {counter.results:5}   rejected {counter.errors:5}"
+    )
+    manager.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    check_ordering()
+    run("thread per call", ThreadPerCallScopeManager())
+    run("pool (8 workers)", PyScopeManager(max_workers=8, max_queue_depth=4096))
+    run("pool (32 workers)", PyScopeManager(max_workers=32, max_queue_depth=4096))
+    run("pool (32 workers, depth 256)", PyScopeManager(max_workers=32, max_queue_depth=256))
+    run("pool, serialized namespace", PyScopeManager(max_workers=32, max_queue_depth=4096), 100, "serial_func")
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+# A stand-in for the parts of `cefpython3` that tkcef talks to. Instead of a
+# browser, the preload scripts are run inside a Node.js process (`renderer.js`)
+# and every value crossing the bridge is sent as a line of JSON, so each
+# `JavascriptCallback.Call` and each JS -> Python call is a real, countable
+# round trip between two processes, much like the renderer <-> browser IPC
+# in CEF. Python functions called from JavaScript run on a single reader
+# thread, just as CEF runs them on its UI thread.
+
+import itertools
+import json
+import subprocess
+import sys
+import threading
+import types
+from pathlib import Path
+from typing import Any, Callable
+
+RENDERER_PATH = Path(__file__).parent.joinpath("renderer.js")
+PRELOAD_DIR = Path(__file__).parents[1].joinpath("tkcef/js")
+
+# CEF only turns actual functions into JS functions, not arbitrary callables:
+PY_FUNCTION_TYPES = (
+    types.FunctionType,
+    types.MethodType,
+    types.BuiltinFunctionType,
+    types.BuiltinMethodType,
+)
+
+
+class JavascriptCallback:
+    def __init__(self, renderer: NodeRenderer, fn_id: int):
+        self._renderer = renderer
+        self._fn_id = fn_id
+
+    def Call(self, *args):
+        self._renderer.send({"op": "call", "fn": self._fn_id, "args": list(args)})
+
+    def GetName(self) -> str:
+        return f"jsfn:{self._fn_id}"
+
+
+class JavascriptBindings:
+    def __init__(self, bindToFrames: bool = False, bindToPopups: bool = False):
+        self.functions: dict[str, Callable] = {}
+        self.properties: dict[str, Any] = {}
+        self.objects: dict[str, Any] = {}
+
+    def SetFunction(self, name: str, fn: Callable):
+        self.functions[name] = fn
+
+    def SetProperty(self, name: str, value: Any):
+        self.properties[name] = value
+
+    def SetObject(self, name: str, obj: Any):
+        self.objects[name] = obj
+
+    def Rebind(self):
+        pass
+
+    def IsValueAllowedRecursively(self, value: Any) -> bool:
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return True
+        if isinstance(value, (list, tuple)):
+            return all(self.IsValueAllowedRecursively(i) for i in value)
+        if isinstance(value, dict):
+            return all(
+                isinstance(k, str) and self.IsValueAllowedRecursively(v)
+                for k, v in value.items()
+            )
+        return False
+
+
+class NodeRenderer:
+    process: subprocess.Popen
+    bindings: JavascriptBindings
+
+    # Bridge traffic, counted per message:
+    to_js: int
+    to_py: int
+
+    def __init__(self, bindings: JavascriptBindings):
+        self.bindings = bindings
+        self.to_js = 0
+        self.to_py = 0
+
+        self._py_fns: dict[int, Callable] = {}
+        self._py_fn_ids: dict[int, int] = {}
+        self._next_py_fn = itertools.count(1)
+        self._write_lock = threading.Lock()
+
+        self.process = subprocess.Popen(
+            ["node", str(RENDERER_PATH)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        self._reader = threading.Thread(
+            target=self._read_loop, name="CefStubUIThread", daemon=True
+        )
+        self._reader.start()
+
+        self.send(
+            {
+                "op": "init",
+                "functions": list(bindings.functions.keys()),
+                "objects": {
+                    name: [
+                        m
+                        for m in dir(type(obj))
+                        if not m.startswith("__") and callable(getattr(obj, m, None))
+                    ]
+                    for name, obj in bindings.objects.items()
+                },
+                "properties": bindings.properties,
+            },
+            count=False,
+        )
+
+    def reset_counters(self):
+        self.to_js = 0
+        self.to_py = 0
+
+    def send(self, message: dict, count: bool = True):
+        if count:
+            self.to_js += 1
+        line = json.dumps(self._encode(message)) + "\n"
+        with self._write_lock:
+            # Messages sent after the browser closed are dropped, as in CEF.
+            if self.process.stdin.closed:
+                return
+            self.process.stdin.write(line)
+            self.process.stdin.flush()
+
+    def execute(self, code: str, url: str = ""):
+        self.send({"op": "exec", "code": code, "url": url}, count=False)
+
+    def close(self):
+        with self._write_lock:
+            self.process.stdin.close()
+        self.process.wait()
+
+    def _encode(self, value: Any) -> Any:
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if isinstance(value, JavascriptCallback):
+            return {"$jsfn": value._fn_id}
+        if isinstance(value, (list, tuple)):
+            return [self._encode(i) for i in value]
+        if isinstance(value, dict):
+            return {str(k): self._encode(v) for k, v in value.items()}
+        if isinstance(value, PY_FUNCTION_TYPES):
+            key = id(value)
+            if key not in self._py_fn_ids:
+                fn_id = next(self._next_py_fn)
+                self._py_fn_ids[key] = fn_id
+                self._py_fns[fn_id] = value
+            return {"$pyfn": self._py_fn_ids[key]}
+        # Like CEF, anything else gets passed along as its string form.
+        return str(value)
+
+    def _decode(self, value: Any) -> Any:
+        if isinstance(value, list):
+            return [self._decode(i) for i in value]
+        if isinstance(value, dict):
+            if "$jsfn" in value:
+                return JavascriptCallback(self, value["$jsfn"])
+            if "$pyfn" in value:
+                return self._py_fns[value["$pyfn"]]
+            return {k: self._decode(v) for k, v in value.items()}
+        return value
+
+    def _resolve(self, target: str) -> Callable:
+        kind, _, name = target.partition(":")
+        if kind == "fn":
+            return self.bindings.functions[name]
+        if kind == "obj":
+            obj_name, _, method = name.partition(".")
+            return getattr(self.bindings.objects[obj_name], method)
+        return self._py_fns[int(name)]
+
+    def _read_loop(self):
+        for line in self.process.stdout:
+            message = json.loads(line)
+            if message["op"] != "call":
+                continue
+
+            self.to_py += 1
+            try:
+                self._resolve(message["target"])(*self._decode(message["args"]))
+            except Exception as e:
+                print(f"[cef_stub] {message['target']} raised {e!r}", file=sys.stderr)
+
+
+class PyBrowser:
+    renderer: NodeRenderer
+
+    def __init__(self, bindings: JavascriptBindings):
+        self.renderer = NodeRenderer(bindings)
+
+    def SetJavascriptBindings(self, bindings: JavascriptBindings):
+        pass
+
+    def ExecuteJavascript(self, code: str, url: str = "", line: int = 0):
+        self.renderer.execute(code, url)
+
+    def CloseBrowser(self, force: bool = False):
+        self.renderer.close()
+
+
+class WindowUtils:
+    pass
+
+
+def install():
+    """Registers the stub as `cefpython3.cefpython`. Must run before tkcef is imported."""
+    cefpython = types.ModuleType("cefpython3.cefpython")
+    cefpython.__version__ = "66.1"
+    cefpython.JavascriptCallback = JavascriptCallback
+    cefpython.JavascriptBindings = JavascriptBindings
+    cefpython.PyBrowser = PyBrowser
+    cefpython.PyFrame = object
+    cefpython.WindowInfo = object
+    cefpython.WindowUtils = WindowUtils
+    cefpython.TID_UI = 0
+    cefpython.PostTask = lambda thread, fn, *args: fn(*args)
+    cefpython.ExceptHook = sys.excepthook
+
+    package = types.ModuleType("cefpython3")
+    package.cefpython = cefpython
+    package.__path__ = []
+
+    sys.modules["cefpython3"] = package
+    sys.modules["cefpython3.cefpython"] = cefpython
+    sys.modules[f"cefpython3.cefpython_py{sys.version_info[0]}{sys.version_info[1]}"] = cefpython
+    sys.modules["cefpython3.cefpython_py39"] = cefpython
+
+    # Benchmarks are run from `src/py`, but make sure `util` and `tkcef` resolve anyway:
+    src_py = str(Path(__file__).parents[1])
+    if src_py not in sys.path:
+        sys.path.insert(0, src_py)
+
+
+def load_preload(browser: PyBrowser, name: str):
+    path = PRELOAD_DIR.joinpath(name)
+    browser.ExecuteJavascript(path.read_text(), path.as_uri(), 0)
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import statistics
+import time
+
+from . import cef_stub
+
+cef_stub.install()
+
+from cefpython3 import cefpython as cef
+
+import tkcef
+from tkcef.browser_namespace import BrowserNamespaceWrapper
+from tkcef.js_object import JsObjectManager
+from tkcef.pyscope import PyScopeManager
+
+
+def open_js_object_page(timeout: float = 10.0) -> tuple[JsObjectManager, cef.PyBrowser]:
+    # Mirrors WebApp._create_js_bindings / _on_page_loaded for a JsObjectManager-only page.
+    bindings = cef.JavascriptBindings()
+    manager = JsObjectManager(bindings)
+
+    bindings.SetFunction(tkcef.with_uuid4.__name__, tkcef.with_uuid4)
+    bindings.SetObject("_py_jsobjectman", manager)
+
+    browser = cef.PyBrowser(bindings)
+    manager.config_in_browser(browser)
+
+    deadline = time.monotonic() + timeout
+    while not manager.is_ready:
+        if time.monotonic() > deadline:
+            raise TimeoutError("The JsObjectManager preload never reported ready.")
+        time.sleep(0.01)
+
+    return manager, browser
+
+
+def open_pyscope_page(
+    scope_key: str = "SCOPE_BENCHMARK",
+    functions: dict = {},
+    timeout: float = 10.0,
+    manager_type: type[PyScopeManager] = PyScopeManager,
+) -> tuple[PyScopeManager, cef.PyBrowser]:
+    # Mirrors WebApp._construct_app_webview / _create_js_bindings / _on_page_loaded,
+    # without the Tk window. Extra 'functions' are bound for the benchmark's own use.
+    BrowserNamespaceWrapper.create_namespace_if_dne(scope_key)
+
+    bindings = cef.JavascriptBindings()
+    js_object_manager = JsObjectManager(bindings)
+    pyscopemanager = manager_type(js_object_manager)
+
+    bindings.SetProperty("app_scope_key", scope_key)
+    bindings.SetFunction("py_print", print)
+    bindings.SetFunction(tkcef.with_uuid4.__name__, tkcef.with_uuid4)
+    bindings.SetObject("_py_scopeman", pyscopemanager)
+    bindings.SetObject("_py_jsobjectman", js_object_manager)
+    for name, fn in functions.items():
+        bindings.SetFunction(name, fn)
+
+    browser = cef.PyBrowser(bindings)
+    js_object_manager.config_in_browser(browser)
+    pyscopemanager.config_in_browser(browser)
+
+    deadline = time.monotonic() + timeout
+    while not js_object_manager.is_ready:
+        if time.monotonic() > deadline:
+            raise TimeoutError("The JsObjectManager preload never reported ready.")
+        time.sleep(0.01)
+
+    return pyscopemanager, browser
+
+
+def summarize(label: str, samples: list[float], unit: float = 1e6, suffix: str = "us"):
+    samples = sorted(samples)
+    p50 = samples[len(samples) // 2] * unit
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))] * unit
+    mean = statistics.fmean(samples) * unit
+    print(
+        f"{label:<40} mean {mean:9.1f}{suffix}   p50 {p50:9.1f}{suffix}   p99 {p99:9.1f}{suffix}"
+    )
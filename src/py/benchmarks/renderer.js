@@ -0,0 +1,103 @@
+// Renderer half of benchmarks/cef_stub.py.
+//
+// Runs the tkcef preload scripts in a `vm` context whose global object plays
+// the part of `window`. Python bindings are exposed as functions that post a
+// JSON message to stdout; Python -> JS callback invocations arrive on stdin.
+// Like CEF, neither direction waits for a return value.
+"use strict";
+
+const vm = require("vm");
+const readline = require("readline");
+
+const js_fns = new Map();
+let next_js_fn = 1;
+
+function encode(value) {
+    if (typeof value === "function") {
+        if (value.__pyfn_id !== undefined) {
+            return { $pyfn: value.__pyfn_id };
+        }
+        const fn_id = next_js_fn++;
+        js_fns.set(fn_id, value);
+        return { $jsfn: fn_id };
+    }
+    if (Array.isArray(value)) {
+        return value.map(encode);
+    }
+    if (value !== null && typeof value === "object") {
+        const retVal = {};
+        for (const [key, item] of Object.entries(value)) {
+            retVal[key] = encode(item);
+        }
+        return retVal;
+    }
+    // undefined, like everything else JSON can't hold, becomes null.
+    return value === undefined ? null : value;
+}
+
+function decode(value) {
+    if (Array.isArray(value)) {
+        return value.map(decode);
+    }
+    if (value !== null && typeof value === "object") {
+        if (value.$jsfn !== undefined) {
+            return js_fns.get(value.$jsfn);
+        }
+        if (value.$pyfn !== undefined) {
+            return py_function(`py:${value.$pyfn}`, value.$pyfn);
+        }
+        const retVal = {};
+        for (const [key, item] of Object.entries(value)) {
+            retVal[key] = decode(item);
+        }
+        return retVal;
+    }
+    return value;
+}
+
+function py_function(target, pyfn_id) {
+    const fn = (...args) => {
+        process.stdout.write(JSON.stringify({ op: "call", target: target, args: encode(args) }) + "\n");
+    };
+    fn.__pyfn_id = pyfn_id;
+    return fn;
+}
+
+const log = (...args) => process.stderr.write(args.map(String).join(" ") + "\n");
+
+const context = vm.createContext({
+    console: { log: log, error: log, warn: log, debug: () => {} },
+    setTimeout, clearTimeout, setInterval, clearInterval, setImmediate, queueMicrotask,
+    performance, AbortController, AbortSignal, DOMException,
+    addEventListener: () => {},
+});
+context.window = context;
+
+function init(message) {
+    for (const name of message.functions) {
+        context[name] = py_function(`fn:${name}`);
+    }
+    for (const [name, methods] of Object.entries(message.objects)) {
+        const obj = {};
+        for (const method of methods) {
+            obj[method] = py_function(`obj:${name}.${method}`);
+        }
+        context[name] = obj;
+    }
+    Object.assign(context, message.properties);
+}
+
+readline.createInterface({ input: process.stdin }).on("line", (line) => {
+    const message = JSON.parse(line);
+    try {
+        if (message.op === "init") {
+            init(message);
+        } else if (message.op === "exec") {
+            vm.runInContext(message.code, context, { filename: message.url });
+        } else if (message.op === "call") {
+            js_fns.get(message.fn)(...decode(message.args));
+        }
+    } catch (error) {
+        log(error.stack);
+    }
+});
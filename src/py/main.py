@@ -1,3 +1,4 @@
+import multiprocessing
 import tkinter as tk
 from pathlib import Path
 
@@ -10,6 +11,10 @@ from test_app import TestApp
 import ui, test_scope
 
 if __name__ == "__main__":
+    # In a PyInstaller build, each @tkcef.cpu_bound worker process runs this exe again. This turns
+    # those runs into workers, instead of letting them start another copy of the app. Keep it first:
+    multiprocessing.freeze_support()
+
     settings.load_settings()
     settings.save_settings()
 
@@ -18,7 +23,7 @@ if __name__ == "__main__":
     doc_path = settings.webpack_dir.joinpath("index.html").absolute().as_uri()
     print(f"{doc_path=}")
 
-    app_man = AppManager()
+    app_man = AppManager(persistent_cache_path=settings.exec_dir.joinpath("tkcef_cache.sqlite3"))
     app1 = TestApp()
     app2 = App()
 
@@ -240,6 +240,13 @@ class AppManager:
 
     next_update_event: sched.Event
 
+    # Shared by every app, for coroutines called from their pages:
+    async_loop: AsyncLoopThread
+    # Shared by every app, for @cpu_bound functions called from their pages:
+    process_pool: ProcessPool
+    # Where @memoize(persist=True) results are kept between runs, if given a path:
+    persistent_cache: Union[PersistentCache, None]
+
     @property
     def should_run(self) -> bool:
         return len(self.apps) > 0 or len(self.keys_to_add) > 0
@@ -251,6 +258,8 @@ class AppManager:
         update_sched: sched.scheduler = sched.scheduler(),
         cef_config: dict = {},
         thread: threading.Thread = threading.current_thread(),
+        process_workers: int = None,
+        persistent_cache_path: Union[str, os.PathLike] = None,
     ):
         self.thread = thread
         self.update_sched = update_sched
@@ -283,12 +292,21 @@ class AppManager:
             # Helps prevent various GIL-related crashes:
             cef_config["multi_threaded_message_loop"] = True
 
+        # Loaded in the background while CEF and the first window start, so the first page can use it:
+        self.persistent_cache = None
+        if persistent_cache_path is not None:
+            self.persistent_cache = PersistentCache(persistent_cache_path)
+            self.persistent_cache.open()
+
         cef.Initialize(settings=cef_config, switches={"allow-file-access": ""})
 
         self.apps = {}
         self.keys_to_add = {}
         self.keys_to_remove = []
 
+        self.async_loop = AsyncLoopThread()
+        self.process_pool = ProcessPool(process_workers)
+
     def add(self, app: webapp.WebApp, key: str = None):
         if key is None:
             key = "APP_" + str(uuid.uuid4()).replace("-", "_")
@@ -305,6 +323,10 @@ class AppManager:
         time.sleep(self.update_interval)
 
     def mainloop(self):
+        # Start the worker processes while the first window opens, rather than on the first call:
+        if self.process_pool.has_work:
+            self.process_pool.warm_up()
+
         while self.should_run:
             # Using sched to control the timing of the mainloop is
             # a lot more consistent than using time.sleep() directly.
@@ -344,6 +366,11 @@ class AppManager:
             self.keys_to_remove.clear()
 
     def shutdown(self):
+        self.async_loop.stop()
+        self.process_pool.shutdown()
+        if self.persistent_cache is not None:
+            self.persistent_cache.close()
+
         logger.debug("CEF is shutting down now...")
         cef.Shutdown()
 
@@ -352,13 +379,19 @@ class AppManager:
         self.shutdown()
 
 
+from .async_loop import AsyncLoopThread
+from .py_call import PyCall, CallCancelledException, current_call
+from .lanes import CEF_LANE, TK_LANE, WORKER_LANE, run_on, run_concurrently
+from .process_pool import ProcessPool, cpu_bound
+from .memoize import MemoizedFunction, memoize
+from .persistent_cache import PersistentCache
 from .webapp import WebApp
 from .js_object import JsObject
 from .webframe import WebFrame
 from .browser_namespace import BrowserNamespaceWrapper
 
 
-def expose_namespace(module: ModuleType, name: str = None) -> str:
+def expose_namespace(module: ModuleType, name: str = None, lane: str = None, concurrent: bool = False) -> str:
     return BrowserNamespaceWrapper.create_namespace_if_dne(
-        module.__name__ if name is None else name, use_external=module
+        module.__name__ if name is None else name, use_external=module, lane=lane, concurrent=concurrent
     )
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Future
+import threading
+from typing import Any, Coroutine
+
+from . import logger
+
+
+class AsyncLoopThread:
+    # Runs an asyncio event loop on a thread of its own, for coroutines the page calls.
+    #
+    # Waiting coroutines only cost a task on the loop, rather than a thread each, so
+    # I/O-bound handlers (file reads, subprocesses, local sockets) can have thousands
+    # of calls in flight at once. The thread isn't started until something is submitted.
+    name: str
+    loop: asyncio.AbstractEventLoop
+    thread: threading.Thread
+
+    submitted_count: int
+    completed_count: int
+
+    _lock: threading.Lock
+
+    def __init__(self, name: str = "TkcefAsyncLoop"):
+        self.name = name
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+        self.submitted_count = 0
+        self.completed_count = 0
+
+        self._lock = threading.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self.thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if not self.thread.is_alive() and not self.loop.is_closed():
+                self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            # Anything still running is cancelled, so its callers hear back:
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+            self.loop.close()
+            logger.debug(f"{self.name} has stopped.")
+
+    def submit(self, coro: Coroutine) -> Future:
+        # Schedules 'coro' on the loop from any thread, and returns a Future for its result.
+        self.start()
+        if self.loop.is_closed():
+            coro.close()
+            raise RuntimeError(f"{self.name} has been stopped.")
+
+        with self._lock:
+            self.submitted_count += 1
+
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future: Future):
+        with self._lock:
+            self.completed_count += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self.is_running,
+                "submitted": self.submitted_count,
+                "completed": self.completed_count,
+                "pending": self.submitted_count - self.completed_count,
+            }
+
+    def stop(self, wait: bool = True):
+        if not self.thread.is_alive():
+            if not self.loop.is_closed():
+                self.loop.close()
+            return
+
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        if wait and threading.current_thread() is not self.thread:
+            self.thread.join()
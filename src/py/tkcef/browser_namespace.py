@@ -1,12 +1,38 @@
 from __future__ import annotations
 
+from collections import OrderedDict
+from contextlib import contextmanager
+import itertools
+import sys
+import threading
+import time
 from types import ModuleType
-import random
-from typing import Union
+from typing import Any, Callable, Hashable, Union
 
 from cefpython3 import cefpython as cef
 
 from util import anon_func as af
+from . import logger
+from .lanes import check_lane, is_concurrent, lane_of
+
+
+class NamespaceLimitException(Exception):
+    count: int
+    max_namespaces: int
+
+    def __init__(self, count: int, max_namespaces: int):
+        self.count = count
+        self.max_namespaces = max_namespaces
+
+    def __str__(self):
+        return (
+            f"There are already {self.count} namespaces (max_namespaces is {self.max_namespaces}),"
+            " and none of them can be evicted to make room for another."
+        )
+
+
+# Stands in for a missing variable, since None is a valid value:
+_UNSET = object()
 
 
 class BrowserNamespaceWrapper:
@@ -17,6 +43,24 @@ class BrowserNamespaceWrapper:
     _name: str
     _doc: str
 
+    # Whatever created this namespace on behalf of a page (see create_new_namespace()).
+    # Owned namespaces can be evicted once they're idle or their owner is gone;
+    # ones without an owner (the app scope, exposed modules) never are.
+    owner: Union[Hashable, None]
+    created: float
+    last_used: float
+
+    # Where the page's calls into this namespace run (see lanes.py), or None for each op's default.
+    # Functions decorated with tkcef.run_on() keep their own lane:
+    lane: Union[str, None]
+    # Whether the page's calls into this namespace can run side by side. By default they run
+    # one at a time, in order. Functions decorated with tkcef.run_concurrently always can:
+    concurrent: bool
+
+    # Called with (namespace, name) after set_var() or del_var() change a variable, and with
+    # (namespace, None) once the namespace is removed. Pages caching variables listen here:
+    watchers: list[Callable[[BrowserNamespaceWrapper, Union[str, None]], None]]
+
     def __init__(
         self,
         name,
@@ -24,8 +68,16 @@ class BrowserNamespaceWrapper:
         global_level=True,
         *,
         use_external: ModuleType = None,
+        owner: Hashable = None,
+        lane: str = None,
+        concurrent: bool = False,
     ):
         self._name = name
+        self.owner = owner
+        self.lane = check_lane(lane)
+        self.concurrent = concurrent
+        self.watchers = []
+        self.created = self.last_used = time.monotonic()
 
         if use_external is not None:
             self._mod = use_external
@@ -77,12 +129,44 @@ class BrowserNamespaceWrapper:
 
     def set_var(self, attr, val):
         setattr(self._mod, attr, val)
+        self.notify(attr)
 
     def has_var(self, attr):
         return hasattr(self._mod, attr)
 
     def del_var(self, attr):
-        return delattr(self._mod, attr)
+        retVal = delattr(self._mod, attr)
+        self.notify(attr)
+        return retVal
+
+    def watch(self, watcher: Callable[[BrowserNamespaceWrapper, Union[str, None]], None]):
+        if watcher not in self.watchers:
+            self.watchers.append(watcher)
+
+    def unwatch(self, watcher: Callable[[BrowserNamespaceWrapper, Union[str, None]], None]):
+        if watcher in self.watchers:
+            self.watchers.remove(watcher)
+
+    def notify(self, attr: Union[str, None]):
+        # set_var() and del_var() call this. Code that changes a variable some other way (like
+        # exec()'d code assigning to it) should call it too, or pages caching it won't know:
+        for watcher in list(self.watchers):
+            try:
+                watcher(self, attr)
+            except Exception as e:
+                logger.error(f"Namespace watcher failed for '{self.name}.{attr}': {e}")
+
+    def lane_for(self, attr: str = None) -> Union[str, None]:
+        if attr is not None:
+            lane = lane_of(getattr(self._mod, attr, None))
+            if lane is not None:
+                return lane
+        return self.lane
+
+    def concurrent_for(self, attr: str = None) -> bool:
+        if attr is not None and is_concurrent(getattr(self._mod, attr, None)):
+            return True
+        return self.concurrent
 
     def call(self, attr, args=(), kwargs=None, no_return=False):
         if kwargs is None:
@@ -98,16 +182,15 @@ class BrowserNamespaceWrapper:
 
         if isinstance(params, dict):
             # This should allow us to pass JS variables into the python code, without cluttering up the global namespace.
-
-            self.locals.update(params)
-            retVal = af.rexec(
-                p_code,
-                p_return,
-                self.globals,
-                self.locals,
-                f"{__name__}.{self.name}",
-            )
-            return retVal
+            # The params are only in the globals while the code runs, so comprehensions and functions it defines see them too:
+            with self.bound_params(params):
+                return af.rexec(
+                    p_code,
+                    p_return,
+                    self.globals,
+                    self.locals,
+                    f"{__name__}.{self.name}",
+                )
 
         else:
             return af.rexec(
@@ -118,22 +201,47 @@ class BrowserNamespaceWrapper:
                 f"{__name__}.{self.name}",
             )
 
+    @contextmanager
+    def bound_params(self, params: dict):
+        # Puts 'params' in the globals, and takes them out again afterwards, putting back whatever
+        # they hid. A param the code assigned something else to is kept, like any other variable.
+        # Calls from the page into one namespace run one at a time (see PyScopeManager), so
+        # they don't see each other's params.
+        scope = self.globals
+        hidden = {key: scope.get(key, _UNSET) for key in params}
+        scope.update(params)
+        try:
+            yield
+        finally:
+            for key, value in params.items():
+                if scope.get(key, _UNSET) is not value:
+                    continue
+                if hidden[key] is _UNSET:
+                    del scope[key]
+                else:
+                    scope[key] = hidden[key]
+
     def do_func(self, code: str, args: dict = None, main_globals=True):
         if args is None:
             args = {}
 
+        # Naming the namespace in the prefix keeps its compiled code apart from other namespaces':
         if main_globals:
             return af.func(
                 tuple(args.keys()),
                 code,
+                __prefix=f"{__name__}.{self.name}",
                 __globals=self.globals,
                 __locals=self.locals,
                 collect_locals=False,
             )(*tuple(args.values()))
         else:
-            return af.func(tuple(args.keys()), code, collect_locals=False)(
-                *tuple(args.values())
-            )
+            return af.func(
+                tuple(args.keys()),
+                code,
+                __prefix=f"{__name__}.{self.name}",
+                collect_locals=False,
+            )(*tuple(args.values()))
 
     def make_func(self, name: str, code: str, args: list = None, main_globals=True):
         if args is None:
@@ -145,73 +253,221 @@ class BrowserNamespaceWrapper:
                 args,
                 code,
                 name=name,
+                __prefix=f"{__name__}.{self.name}",
                 __globals=self.globals,
                 __locals=self.locals,
                 collect_locals=False,
             )
         else:
-            fn = af.func(args, code, name=name, collect_locals=False)
+            fn = af.func(
+                args, code, name=name, __prefix=f"{__name__}.{self.name}", collect_locals=False
+            )
 
         if name is not None:
             self.set_var(name, fn)
         return fn
 
+    def approx_size(self) -> int:
+        # A rough figure: the namespace dicts and the shallow size of each value in them.
+        size = 0
+        for i in {id(self.globals): self.globals, id(self._mod_locals): self._mod_locals}.values():
+            size += sys.getsizeof(i)
+            for value in list(i.values()):
+                size += sys.getsizeof(value)
+        return size
+
     # Static Info:
+    # At most this many namespaces exist at once. Past that, the least recently used owned
+    # namespace is evicted to make room for a new one.
     max_namespaces = 100000
+    # Owned namespaces unused for this many seconds are evicted. None keeps them until their owner is gone.
+    idle_timeout: Union[float, None] = None
+    # evict_idle() does nothing if it already ran less than this many seconds ago:
+    eviction_interval: float = 5.0
     namespaces: dict[str, BrowserNamespaceWrapper] = {}
 
+    # Owned namespaces, least recently used first:
+    _owned: OrderedDict[str, None]
+    _id_counter: itertools.count
+    _lock: threading.RLock = threading.RLock()
+    _last_eviction: float
+    evictions: int
+
     @classmethod
     def get_new_namespace_id(cls):
-        new_id = "ns-py0"
-        print(new_id)
-        while new_id in cls.namespaces:
-            new_id = f"n-py{random.randint(1, cls.max_namespaces)}"
-            print(new_id)
+        with cls._lock:
+            new_id = f"ns-py{next(cls._id_counter)}"
+            # Names can also be chosen by the page, so one may already be taken:
+            while new_id in cls.namespaces:
+                new_id = f"ns-py{next(cls._id_counter)}"
 
-        return new_id
+            return new_id
+
+    @classmethod
+    def _add_namespace(
+        cls,
+        name: str,
+        global_level=True,
+        *,
+        use_external: ModuleType = None,
+        owner: Hashable = None,
+        lane: str = None,
+        concurrent: bool = False,
+    ):
+        with cls._lock:
+            if len(cls.namespaces) >= cls.max_namespaces:
+                cls._evict_for_space()
+
+            cls.namespaces[name] = BrowserNamespaceWrapper(
+                name,
+                f"A unique namespace for running In-Browser Python code. Namespace: {name}",
+                global_level,
+                use_external=use_external,
+                owner=owner,
+                lane=lane,
+                concurrent=concurrent,
+            )
+            if owner is not None:
+                cls._owned[name] = None
+            return name
 
     @classmethod
     def create_new_namespace(
-        cls, name: str = "", global_level=True, *, use_external: ModuleType = None
+        cls,
+        name: str = "",
+        global_level=True,
+        *,
+        use_external: ModuleType = None,
+        owner: Hashable = None,
+        lane: str = None,
+        concurrent: bool = False,
     ):
-        if name == "" or name is None:
-            name = cls.get_new_namespace_id()
-
-        cls.namespaces[name] = BrowserNamespaceWrapper(
-            name,
-            f"A unique namespace for running In-Browser Python code. Namespace: {name}",
-            global_level,
-            use_external=use_external,
-        )
-        return name
+        with cls._lock:
+            if name == "" or name is None:
+                name = cls.get_new_namespace_id()
+
+            return cls._add_namespace(
+                name, global_level, use_external=use_external, owner=owner, lane=lane, concurrent=concurrent
+            )
 
     @classmethod
     def create_namespace_if_dne(
-        cls, name: str, global_level=True, *, use_external: ModuleType = None
+        cls,
+        name: str,
+        global_level=True,
+        *,
+        use_external: ModuleType = None,
+        owner: Hashable = None,
+        lane: str = None,
+        concurrent: bool = False,
     ):
-        if name in cls.namespaces:
-            return name
+        with cls._lock:
+            if name in cls.namespaces:
+                return name
 
-        cls.namespaces[name] = BrowserNamespaceWrapper(
-            name,
-            f"A unique namespace for running In-Browser Python code. Namespace: {name}",
-            global_level,
-            use_external=use_external,
-        )
-        return name
+            return cls._add_namespace(
+                name, global_level, use_external=use_external, owner=owner, lane=lane, concurrent=concurrent
+            )
+
+    @classmethod
+    def get_namespace(cls, name: str) -> BrowserNamespaceWrapper:
+        # Like `namespaces[name]`, but counts as a use of the namespace:
+        with cls._lock:
+            ns = cls.namespaces[name]
+            ns.last_used = time.monotonic()
+            if name in cls._owned:
+                cls._owned.move_to_end(name)
+            return ns
 
     @classmethod
     def remove_namespace(cls, name: str):
-        del cls.namespaces[name]
-        print(f"Destroyed namespace '{name}'.")
+        with cls._lock:
+            ns = cls.namespaces.pop(name)
+            cls._owned.pop(name, None)
+        ns.notify(None)
+        logger.debug(f"Destroyed namespace '{name}'.")
 
     @classmethod
     def namespace_exists(cls, name: str = ""):
         return name in cls.namespaces
 
+    @classmethod
+    def _evict(cls, name: str, reason: str):
+        cls.namespaces.pop(name).notify(None)
+        cls._owned.pop(name, None)
+        cls.evictions += 1
+        logger.debug(f"Evicted namespace '{name}' ({reason}).")
+
+    @classmethod
+    def _evict_for_space(cls):
+        if len(cls._owned) == 0:
+            raise NamespaceLimitException(len(cls.namespaces), cls.max_namespaces)
+
+        cls._evict(next(iter(cls._owned)), f"over max_namespaces ({cls.max_namespaces})")
+
+    @classmethod
+    def evict_idle(cls, force: bool = False) -> int:
+        # Evicts owned namespaces that have been unused for longer than 'idle_timeout'.
+        # Cheap enough to call every update step, since it only looks at the least
+        # recently used namespaces, at most once per 'eviction_interval'.
+        if cls.idle_timeout is None:
+            return 0
+
+        now = time.monotonic()
+        if not force and now - cls._last_eviction < cls.eviction_interval:
+            return 0
+
+        evicted = 0
+        with cls._lock:
+            cls._last_eviction = now
+            while len(cls._owned) > 0:
+                name = next(iter(cls._owned))
+                if now - cls.namespaces[name].last_used < cls.idle_timeout:
+                    break
+                cls._evict(name, "idle")
+                evicted += 1
+
+        return evicted
+
+    @classmethod
+    def evict_owner(cls, owner: Hashable) -> int:
+        # Evicts every namespace created for 'owner', for once it's gone (I.E, its page was
+        # unloaded or its browser closed) without destroying them itself.
+        with cls._lock:
+            names = [i for i in cls._owned if cls.namespaces[i].owner == owner]
+            for i in names:
+                cls._evict(i, "orphaned")
+
+        return len(names)
+
+    @classmethod
+    def stats(cls) -> dict[str, Any]:
+        with cls._lock:
+            namespaces = list(cls.namespaces.values())
+            stats = {
+                "count": len(namespaces),
+                "owned": len(cls._owned),
+                "max_namespaces": cls.max_namespaces,
+                "evictions": cls.evictions,
+            }
+
+        # Sizing every namespace can take a while, so it's done outside the lock:
+        stats["bytes"] = sum(i.approx_size() for i in namespaces)
+        return stats
+
+    @classmethod
+    def code_cache_stats(cls) -> dict:
+        # exec, do_func and make_func share anon_func's cache of compiled code.
+        return af.code_cache.stats()
+
     @classmethod
     def global_reset(cls):
-        cls.namespaces = {}
+        with cls._lock:
+            cls.namespaces = {}
+            cls._owned = OrderedDict()
+            cls._id_counter = itertools.count()
+            cls._last_eviction = time.monotonic()
+            cls.evictions = 0
         # cls.namespaces = {
         #     "main": BrowserNamespaceWrapper(
         #         "main", "Primary namespace for running In-Browser Python code", False
@@ -2,10 +2,16 @@
 class JsObjectManager {
     constructor() {
         this.storage = {};
+        this.next_id = 1;
+        this.compiled_cache = new Map();
+        this.compiled_cache_max_size = 512;
+        this.compiled_cache_hits = 0;
+        this.compiled_cache_misses = 0;
         this.callback_errors = true;
         window._py_jsobjectman.append_callback("fadd_fn", this._fadd_fn.bind(this));
         window._py_jsobjectman.append_callback("add_fn", this._add_fn.bind(this));
         window._py_jsobjectman.append_callback("remove_fn", this._remove_fn.bind(this));
+        window._py_jsobjectman.append_callback("remove_many_fn", this._remove_many_fn.bind(this));
         window._py_jsobjectman.append_callback("access_fn", this._access_fn.bind(this));
         window._py_jsobjectman.append_callback("py_fn", this._py_fn.bind(this));
         window._py_jsobjectman.append_callback("get_type_fn", this._get_type_fn.bind(this));
@@ -15,18 +21,29 @@ class JsObjectManager {
         window._py_jsobjectman.append_callback("del_attr_fn", this._del_attr_fn.bind(this));
         window._py_jsobjectman.append_callback("call_fn", this._call_fn.bind(this));
         window._py_jsobjectman.append_callback("call_method_fn", this._call_method_fn.bind(this));
+        window._py_jsobjectman.append_callback("batch_fn", this._batch_fn.bind(this));
+    }
+    new_id() {
+        return `js${this.next_id++}`;
     }
     _make_js_object(item) {
-        return new Promise((resolve, reject) => {
-            window.with_uuid4((uuid) => {
-                this.add(uuid, item);
-                resolve(uuid);
-            });
-        });
+        let item_id = this.new_id();
+        this.add(item_id, item);
+        return Promise.resolve(item_id);
     }
     add(item_id, item) {
         this.storage[item_id] = item;
     }
+    // Stores several items in one synchronous step, and returns their new ids in order.
+    add_many(items) {
+        let item_ids = [];
+        for (let i = 0; i < items.length; i++) {
+            let item_id = this.new_id();
+            this.storage[item_id] = items[i];
+            item_ids.push(item_id);
+        }
+        return item_ids;
+    }
     remove(item_id) {
         delete this.storage[item_id];
     }
@@ -71,6 +88,33 @@ class JsObjectManager {
     convert_in_place_and_make_pairs_from_lists(keys, convert_keys, values, convert_values) {
         return this.make_pairs_from_lists(this.convert_list_items_in_place(keys, convert_keys), this.convert_list_items_in_place(values, convert_values));
     }
+    // Rebuilds a structure marshalled by JsObjectManager.marshal() in Python.
+    unmarshal(node) {
+        switch (node[0]) {
+            case "v":
+                return node[1];
+            case "r":
+                return this.get(node[1]);
+            case "l":
+                return node[1].map((item) => this.unmarshal(item));
+            case "d":
+                let retVal = {};
+                for (let i = 0; i < node[1].length; i++) {
+                    retVal[this.unmarshal(node[1][i])] = this.unmarshal(node[2][i]);
+                }
+                return retVal;
+            case "u":
+                return undefined;
+        }
+        throw new Error(`Unknown marshalled node '${node[0]}'.`);
+    }
+    // 'items' can be a list or an object. 'marshalled' lists the indexes/keys to unmarshal.
+    unmarshal_items_in_place(items, marshalled) {
+        for (let i = 0; i < marshalled.length; i++) {
+            items[marshalled[i]] = this.unmarshal(items[marshalled[i]]);
+        }
+        return items;
+    }
     get_pairs(item_ids) {
         let retVal = {};
         for (const [key, value] of Object.entries(item_ids)) {
@@ -79,6 +123,36 @@ class JsObjectManager {
         }
         return retVal;
     }
+    compiled(arg_keys, code) {
+        let key = `${arg_keys.join(",")}\0${code}`;
+        let fn = this.compiled_cache.get(key);
+        if (fn !== undefined) {
+            this.compiled_cache_hits++;
+            this.compiled_cache.delete(key);
+            this.compiled_cache.set(key, fn);
+            return fn;
+        }
+        this.compiled_cache_misses++;
+        fn = Function(...arg_keys, code);
+        this.compiled_cache.set(key, fn);
+        while (this.compiled_cache.size > this.compiled_cache_max_size) {
+            this.compiled_cache.delete(this.compiled_cache.keys().next().value);
+        }
+        return fn;
+    }
+    // A function taking 'params' positionally, for Python to store and call repeatedly.
+    // Like access code, it gets 'id' and 'this'.
+    compile(code, params = []) {
+        return this.compiled(["id", ...params], code).bind(this, this.get.bind(this));
+    }
+    compile_cache_stats() {
+        return {
+            size: this.compiled_cache.size,
+            max_size: this.compiled_cache_max_size,
+            hits: this.compiled_cache_hits,
+            misses: this.compiled_cache_misses,
+        };
+    }
     access(item_id, access_code, args = {}, obj_param = "self") {
         if ((typeof args) === "string") {
             // Assume Python gave us a JsObject instead of a dict.
@@ -92,14 +166,28 @@ class JsObjectManager {
             arg_keys.push(key);
             arg_values.push(value);
         }
-        arg_keys.push(access_code);
-        return Function(...arg_keys).bind(this)(...arg_values);
+        return this.compiled(arg_keys, access_code).apply(this, arg_values);
+    }
+    collect(collect_code, args = {}) {
+        if ((typeof args) === "string") {
+            // Assume Python gave us a JsObject instead of a dict.
+            // In which case, look of the JsObject
+            args = this.get(args);
+        }
+        let arg_keys = ["id"];
+        let arg_values = [this.get.bind(this)];
+        for (const [key, value] of Object.entries(args)) {
+            // console.log(`${key}: ${value}`);
+            arg_keys.push(key);
+            arg_values.push(value);
+        }
+        return this.compiled(arg_keys, collect_code).apply(this, arg_values);
     }
     get_attr(item_id, attr_name) {
         return this.storage[item_id][attr_name];
     }
-    set_attr(item_id, attr_name, value) {
-        this.storage[item_id][attr_name] = this.get(value);
+    set_attr(item_id, attr_name, value, is_marshalled = false) {
+        this.storage[item_id][attr_name] = is_marshalled ? this.unmarshal(value) : value;
     }
     has_attr(item_id, attr_name) {
         return attr_name in this.storage[item_id];
@@ -107,14 +195,40 @@ class JsObjectManager {
     del_attr(item_id, attr_name) {
         delete this.storage[item_id][attr_name];
     }
-    call(item_id, args) {
-        return this.storage[item_id](...this.get(args));
+    call(item_id, args, marshalled) {
+        return this.storage[item_id](...this.unmarshal_items_in_place(args, marshalled));
     }
-    call_method(item_id, method_name, args) {
-        return this.storage[item_id][method_name].bind(this.storage[item_id])(...this.get(args));
+    call_method(item_id, method_name, args, marshalled) {
+        return this.storage[item_id][method_name].bind(this.storage[item_id])(...this.unmarshal_items_in_place(args, marshalled));
         // console.log();
         // return this.access(item_id, `return self.${method_name}(..._args)`, {_args: args});
     }
+    run_batch_op(op) {
+        // Marshalled arguments have their keys/indexes listed in 'marshalled':
+        switch (op.op) {
+            case "fadd":
+                return this.collect(op.code, this.unmarshal_items_in_place(op.args, op.marshalled));
+            case "access":
+                return this.access(op.target, op.code, this.unmarshal_items_in_place(op.args, op.marshalled), op.obj_param);
+            case "get_attr":
+                return this.get_attr(op.target, op.name);
+            case "set_attr":
+                return this.set_attr(op.target, op.name, op.value, op.is_marshalled);
+            case "has_attr":
+                return this.has_attr(op.target, op.name);
+            case "del_attr":
+                return this.del_attr(op.target, op.name);
+            case "call":
+                return this.call(op.target, op.args, op.marshalled);
+            case "call_method":
+                return this.call_method(op.target, op.name, op.args, op.marshalled);
+            case "py":
+                return this.get(op.target);
+            case "get_type":
+                return this.get_type(op.target);
+        }
+        throw new Error(`Unknown batch operation '${op.op}'.`);
+    }
     _JsCall_error(callback, error, code = "") {
         if (this.callback_errors) {
             callback(null, {
@@ -131,21 +245,8 @@ class JsObjectManager {
         }
     }
     // Callbacks to pass to Python:
-    _fadd_fn(item_id, collect_code, args, callback) {
-        if ((typeof args) === "string") {
-            // Assume Python gave us a JsObject instead of a dict.
-            // In which case, look of the JsObject
-            args = this.get(args);
-        }
-        let arg_keys = ["id"];
-        let arg_values = [this.get.bind(this)];
-        for (const [key, value] of Object.entries(args)) {
-            // console.log(`${key}: ${value}`);
-            arg_keys.push(key);
-            arg_values.push(value);
-        }
-        arg_keys.push(collect_code);
-        let item = Function(...arg_keys).bind(this)(...arg_values);
+    _fadd_fn(item_id, collect_code, args, marshalled, callback) {
+        let item = this.collect(collect_code, this.unmarshal_items_in_place(args, marshalled));
         this._add_fn(item_id, item, callback);
     }
     _add_fn(item_id, item, callback) {
@@ -156,13 +257,20 @@ class JsObjectManager {
         this.remove(item_id);
         callback();
     }
-    _access_fn(item_id, access_code, args, obj_param, callback) {
+    _remove_many_fn(item_ids, callback) {
+        for (let i = 0; i < item_ids.length; i++) {
+            this.remove(item_ids[i]);
+        }
+        // Python only passes a callback when it wants to log the removal:
+        if (callback) {
+            callback();
+        }
+    }
+    _access_fn(item_id, result_id, access_code, args, marshalled, obj_param, callback) {
         try {
-            let result = this.access(item_id, access_code, args, obj_param);
-            window.with_uuid4((uuid) => {
-                this.add(uuid, result);
-                callback(uuid, null);
-            });
+            let result = this.access(item_id, access_code, this.unmarshal_items_in_place(args, marshalled), obj_param);
+            this.add(result_id, result);
+            callback(result_id, null);
         }
         catch (error) {
             this._JsCall_error(callback, error, access_code);
@@ -184,21 +292,19 @@ class JsObjectManager {
             this._JsCall_error(callback, error);
         }
     }
-    _get_attr_fn(item_id, attr_name, callback) {
+    _get_attr_fn(item_id, result_id, attr_name, callback) {
         try {
             let result = this.get_attr(item_id, attr_name);
-            window.with_uuid4((uuid) => {
-                this.add(uuid, result);
-                callback(uuid, null);
-            });
+            this.add(result_id, result);
+            callback(result_id, null);
         }
         catch (error) {
             this._JsCall_error(callback, error);
         }
     }
-    _set_attr_fn(item_id, attr_name, value, callback) {
+    _set_attr_fn(item_id, attr_name, value, is_marshalled, callback) {
         try {
-            this.set_attr(item_id, attr_name, value);
+            this.set_attr(item_id, attr_name, value, is_marshalled);
             callback(null, null);
         }
         catch (error) {
@@ -223,31 +329,53 @@ class JsObjectManager {
             this._JsCall_error(callback, error);
         }
     }
-    _call_fn(item_id, args, callback) {
+    _call_fn(item_id, result_id, args, marshalled, callback) {
         try {
             // console.log(args);
-            let result = this.call(item_id, args);
-            window.with_uuid4((uuid) => {
-                this.add(uuid, result);
-                callback(uuid, null);
-            });
+            let result = this.call(item_id, args, marshalled);
+            this.add(result_id, result);
+            callback(result_id, null);
         }
         catch (error) {
             this._JsCall_error(callback, error);
         }
     }
-    _call_method_fn(item_id, method_name, args, callback) {
+    _call_method_fn(item_id, result_id, method_name, args, marshalled, callback) {
         try {
-            let result = this.call_method(item_id, method_name, args);
-            window.with_uuid4((uuid) => {
-                this.add(uuid, result);
-                callback(uuid, null);
-            });
+            let result = this.call_method(item_id, method_name, args, marshalled);
+            this.add(result_id, result);
+            callback(result_id, null);
         }
         catch (error) {
             this._JsCall_error(callback, error);
         }
     }
+    _batch_fn(ops, callback) {
+        let results = [];
+        let stored = [];
+        let i = 0;
+        try {
+            for (; i < ops.length; i++) {
+                let op = ops[i];
+                let result = this.run_batch_op(op);
+                if (op.result_id !== null) {
+                    this.add(op.result_id, result);
+                    stored.push(op.result_id);
+                    results.push(null);
+                }
+                else {
+                    results.push(result);
+                }
+            }
+        }
+        catch (error) {
+            // Python only takes ownership of stored results if the whole batch succeeds:
+            stored.forEach((item_id) => this.remove(item_id));
+            this._JsCall_error(callback, error, `(batch operation ${i}: '${ops[i].op}')\n${ops[i].code || ""}`);
+            return;
+        }
+        callback(results, null);
+    }
 }
 window._jsobjectman = new JsObjectManager();
 function JsObject(item) {
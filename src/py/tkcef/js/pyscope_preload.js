@@ -9,49 +9,243 @@ var __awaiter = (this && this.__awaiter) || function (thisArg, _arguments, P, ge
     });
 };
 class _PyCall {
-    constructor() {
-        this.completed = false;
-        this.outcome = null;
+    constructor(resolve, reject) {
+        this.resolve = resolve;
+        this.reject = reject;
+        this.timer = null;
+        this.signal = null;
+        this.on_abort = null;
+    }
+    cleanup() {
+        if (this.timer !== null) {
+            clearTimeout(this.timer);
+        }
+        if (this.signal !== null) {
+            this.signal.removeEventListener("abort", this.on_abort);
+        }
+    }
+}
+// A Python generator returned from a call. Read it with `for await (const item of stream)`;
+// breaking out early closes the generator in Python.
+class PyStream {
+    constructor(id, chunk_size) {
+        this.id = id;
+        this.chunk_size = chunk_size;
+        this.buffer = [];
+        this.buffer_index = 0;
+        this.done = false;
+        this.ahead = null;
+    }
+    _fetch() {
+        return window._scopeman.scope_call("stream_next", { "stream": this.id, "count": this.chunk_size });
+    }
+    next() {
+        return __awaiter(this, void 0, void 0, function* () {
+            while (this.buffer_index >= this.buffer.length) {
+                if (this.done && this.ahead === null) {
+                    return { value: undefined, done: true };
+                }
+                if (this.ahead === null) {
+                    this.ahead = this._fetch();
+                }
+                let chunk;
+                try {
+                    chunk = yield this.ahead;
+                }
+                finally {
+                    this.ahead = null;
+                }
+                this.buffer = chunk.items;
+                this.buffer_index = 0;
+                this.done = chunk.done;
+                if (!this.done) {
+                    this.ahead = this._fetch();
+                }
+            }
+            return { value: this.buffer[this.buffer_index++], done: false };
+        });
+    }
+    return(value = undefined) {
+        return __awaiter(this, void 0, void 0, function* () {
+            let was_done = this.done && this.ahead === null;
+            this.done = true;
+            this.buffer = [];
+            this.buffer_index = 0;
+            if (this.ahead !== null) {
+                // Python can't close a generator while it's still producing the next chunk:
+                yield this.ahead.catch(() => null);
+                this.ahead = null;
+            }
+            if (!was_done) {
+                yield window._scopeman.scope_call("stream_close", { "stream": this.id });
+            }
+            return { value: value, done: true };
+        });
+    }
+    // Reads everything that's left into an array.
+    to_array() {
+        return __awaiter(this, void 0, void 0, function* () {
+            let items = [];
+            for (let result = yield this.next(); !result.done; result = yield this.next()) {
+                items.push(result.value);
+            }
+            return items;
+        });
+    }
+    [Symbol.asyncIterator]() {
+        return this;
     }
 }
 class _PyScopeManager {
     constructor() {
-        this.retVals = {};
+        this.pending_calls = {};
+        this.next_call_id = 1;
+        this.var_cache = {};
+        this.watching = {};
+        window._py_scopeman.append_callback("var_changed_fn", this._var_changed_fn.bind(this));
     }
-    scope_call(scope_fn, kwargs = {}) {
-        let call_id = Math.random().toString();
-        this.retVals[call_id] = new _PyCall();
-        scope_fn(call_id, this._complete_callback.bind(this), kwargs);
+    // Every op goes through the same entry point, picked out by name:
+    scope_call(op, kwargs = {}, options = null) {
         return new Promise((resolve, reject) => {
-            this._checkValue(call_id, resolve, reject);
-        });
-    }
-    _checkValue(call_id, resolve, reject) {
-        let return_interval_id = setInterval(() => {
-            let call = this.retVals[call_id];
-            if (call.completed) {
-                let outcome = call.outcome;
-                delete this.retVals[call_id];
-                clearInterval(return_interval_id);
-                if (outcome['error'] !== null) {
-                    let error = new Error(outcome['error'].message);
-                    error.name = outcome['error'].name;
-                    error.stack = outcome['error'].stack;
-                    reject(error);
+            var _a;
+            let call_id = (this.next_call_id++).toString();
+            let call = new _PyCall(resolve, reject);
+            if (options !== null) {
+                if (options.signal && options.signal.aborted) {
+                    reject(this.make_cancel_error("AbortError", `'${op}' was aborted before it started.`));
+                    return;
                 }
-                resolve(outcome['result']);
+                let deadline = (_a = options.deadline) !== null && _a !== void 0 ? _a : (options.timeout != null ? Date.now() + options.timeout : null);
+                if (deadline !== null) {
+                    kwargs = Object.assign(Object.assign({}, kwargs), { "__deadline__": deadline / 1000 });
+                    call.timer = setTimeout(() => {
+                        this.cancel(call_id, this.make_cancel_error("TimeoutError", `'${op}' passed its deadline.`));
+                    }, Math.max(0, deadline - Date.now()));
+                }
+                if (options.signal) {
+                    call.signal = options.signal;
+                    call.on_abort = () => this.cancel(call_id, this.make_cancel_error("AbortError", `'${op}' was aborted.`));
+                    call.signal.addEventListener("abort", call.on_abort);
+                }
+            }
+            this.pending_calls[call_id] = call;
+            window._py_scopeman.dispatch(call_id, this._complete_callback.bind(this), op, kwargs);
+        });
+    }
+    // Rejects the call right away, and tells Python. Python drops it if it hasn't started yet;
+    // otherwise, the code running it can check `tkcef.current_call().cancelled`.
+    cancel(call_id, error) {
+        let call = this.pending_calls[call_id];
+        if (call === undefined) {
+            return;
+        }
+        delete this.pending_calls[call_id];
+        call.cleanup();
+        window._py_scopeman.cancel(call_id);
+        call.reject(error);
+    }
+    // The cached entry for a variable, asking Python for it (and to keep it current) on the first read.
+    // Resolves to null if it can't be cached.
+    cached_var(scope, name) {
+        return __awaiter(this, void 0, void 0, function* () {
+            var _a, _b;
+            var _c;
+            let cached = (_a = this.var_cache[scope]) === null || _a === void 0 ? void 0 : _a[name];
+            if (cached !== undefined) {
+                return cached.valid ? cached : null;
+            }
+            let scope_watching = (_b = (_c = this.watching)[scope]) !== null && _b !== void 0 ? _b : (_c[scope] = {});
+            let watch = scope_watching[name];
+            if (watch === undefined) {
+                watch = scope_watching[name] = (() => __awaiter(this, void 0, void 0, function* () {
+                    var _a, _b;
+                    try {
+                        let info = yield this.scope_call("watch_var", { "id": scope, "name": name });
+                        this.store_var(scope, name, info["exists"], info["value"], info["version"], info["cacheable"]);
+                    }
+                    finally {
+                        if (((_a = this.watching[scope]) === null || _a === void 0 ? void 0 : _a[name]) === watch) {
+                            delete this.watching[scope][name];
+                        }
+                    }
+                    let stored = (_b = this.var_cache[scope]) === null || _b === void 0 ? void 0 : _b[name];
+                    return stored !== undefined && stored.valid ? stored : null;
+                }))();
+            }
+            return yield watch;
+        });
+    }
+    // Keeps whichever is newer, so a value read before a change never replaces the change:
+    store_var(scope, name, exists, value, version, valid) {
+        var _a;
+        var _b;
+        let scope_cache = (_a = (_b = this.var_cache)[scope]) !== null && _a !== void 0 ? _a : (_b[scope] = {});
+        let cached = scope_cache[name];
+        if (cached !== undefined && cached.version > version) {
+            return;
+        }
+        scope_cache[name] = { exists: exists, value: value, version: version, valid: valid };
+    }
+    uncache_var(scope, name) {
+        return __awaiter(this, void 0, void 0, function* () {
+            if (this.var_cache[scope] !== undefined) {
+                delete this.var_cache[scope][name];
             }
-        }, 100);
+            yield this.scope_call("unwatch_var", { "id": scope, "name": name });
+        });
+    }
+    // Python calls this when a cached variable changes. 'change' is null if the new value can't be
+    // cached, and 'name' is null if the whole scope is gone.
+    _var_changed_fn(scope, name, change, version) {
+        if (name === null) {
+            delete this.var_cache[scope];
+            delete this.watching[scope];
+            return;
+        }
+        if (change === null) {
+            this.store_var(scope, name, false, null, version, false);
+            return;
+        }
+        this.store_var(scope, name, change["exists"], change["value"], version, true);
+    }
+    make_cancel_error(name, message) {
+        let error = new Error(message);
+        error.name = name;
+        return error;
     }
-    _complete_callback(call_id, result) {
-        this.retVals[call_id].outcome = result;
-        this.retVals[call_id].completed = true;
+    // Turns stream handles in a result into PyStreams:
+    from_result(result) {
+        if (result !== null && typeof result === "object" && typeof result["__py_stream__"] === "string") {
+            return new PyStream(result["__py_stream__"], result["chunk_size"]);
+        }
+        return result;
+    }
+    make_error(info) {
+        let error = new Error(info.message);
+        error.name = info.name;
+        error.stack = info.stack;
+        return error;
+    }
+    // Python calls this once the call is done, which settles its promise right away.
+    _complete_callback(call_id, outcome) {
+        let call = this.pending_calls[call_id];
+        if (call === undefined) {
+            return;
+        }
+        delete this.pending_calls[call_id];
+        call.cleanup();
+        if (outcome['error'] !== null) {
+            call.reject(this.make_error(outcome['error']));
+            return;
+        }
+        call.resolve(this.from_result(outcome['result']));
     }
 }
 console.log("Loading scope manager...");
 window._scopeman = new _PyScopeManager();
 class PyScope {
     constructor(p_id = null, p_allow_new = false, responsible_to_destroy_if_new = true, p_auto_create = true) {
+        this.call_options = null;
         this.id = p_id;
         this.allow_new = p_allow_new;
         this.is_new = null;
@@ -59,9 +253,19 @@ class PyScope {
             this.create(responsible_to_destroy_if_new);
         }
     }
+    // Returns this scope, with every call made through it using 'options'. For example:
+    // `await py.with_options({signal: controller.signal, timeout: 500}).call("search", text)`
+    with_options(options) {
+        let scope = Object.create(this);
+        scope.call_options = options;
+        return scope;
+    }
+    _scope_call(op, kwargs) {
+        return window._scopeman.scope_call(op, kwargs, this.call_options);
+    }
     create(responsible_to_destroy_if_new = true) {
         return __awaiter(this, void 0, void 0, function* () {
-            let info = (yield window._scopeman.scope_call(window._py_scopeman.create, { id: this.id, allow_new: this.allow_new }));
+            let info = (yield this._scope_call("create", { id: this.id, allow_new: this.allow_new }));
             this.is_new = info.is_new;
             if (info.is_new) {
                 this.id = info.name;
@@ -83,31 +287,48 @@ class PyScope {
     }
     destroy() {
         return __awaiter(this, void 0, void 0, function* () {
-            this.id = (yield window._scopeman.scope_call(window._py_scopeman.destroy, { id: this.id }));
+            this.id = (yield this._scope_call("destroy", { id: this.id }));
         });
     }
-    make_w_args(args) {
-        return __awaiter(this, void 0, void 0, function* () {
-            let arg_ids = [];
-            for (let i = 0; i < args.length; i++) {
-                arg_ids.push(yield JsObject(args[i]));
+    // Builds the payload for all the arguments at once. Anything that needs storing is
+    // registered with the JsObjectManager in one synchronous step, so the call itself can be
+    // sent right away, however many arguments there are.
+    make_w_arg_list(items, auto_convert = false) {
+        let retVal = [];
+        let stored = [];
+        let stored_at = [];
+        for (let i = 0; i < items.length; i++) {
+            let js_type = typeof items[i];
+            if (auto_convert && PyScope.inline_types.indexOf(js_type) !== -1) {
+                retVal.push([js_type, null, items[i]]);
             }
-            return arg_ids;
-        });
-    }
-    make_w_kwargs(kwargs) {
-        return __awaiter(this, void 0, void 0, function* () {
-            let kwarg_ids = {};
-            for (const [key, value] of Object.entries(kwargs)) {
-                // Looking up both keys AND values from stored objects:
-                kwarg_ids[key] = yield JsObject(value);
+            else {
+                retVal.push([js_type]);
+                stored.push(items[i]);
+                stored_at.push(i);
             }
-            return kwarg_ids;
-        });
+        }
+        let ids = window._jsobjectman.add_many(stored);
+        for (let i = 0; i < ids.length; i++) {
+            retVal[stored_at[i]].push(ids[i]);
+        }
+        return retVal;
+    }
+    make_w_args(args, auto_convert = false) {
+        return this.make_w_arg_list(args, auto_convert);
+    }
+    make_w_kwargs(kwargs, auto_convert = false) {
+        let keys = Object.keys(kwargs);
+        let values = this.make_w_arg_list(keys.map((key) => kwargs[key]), auto_convert);
+        let kwarg_ids = {};
+        for (let i = 0; i < keys.length; i++) {
+            kwarg_ids[keys[i]] = values[i];
+        }
+        return kwarg_ids;
     }
     exec(code, params = {}, ret_name = null) {
         return __awaiter(this, void 0, void 0, function* () {
-            return yield window._scopeman.scope_call(window._py_scopeman.exec, {
+            return yield this._scope_call("exec", {
                 "id": this.id,
                 "code": code,
                 "ret_name": ret_name,
@@ -122,18 +343,18 @@ class PyScope {
     }
     w_exec(code, params = {}, ret_name = null, do_auto_convert = false) {
         return __awaiter(this, void 0, void 0, function* () {
-            return yield window._scopeman.scope_call(window._py_scopeman.w_exec_runner, {
+            return yield this._scope_call("w_exec", {
                 "id": this.id,
                 "code": code,
                 "ret_name": ret_name,
-                "params": yield this.make_w_kwargs(params),
+                "params": this.make_w_kwargs(params, do_auto_convert),
                 "do_auto_convert": do_auto_convert
             });
         });
     }
     do_func(code, params = {}) {
         return __awaiter(this, void 0, void 0, function* () {
-            return yield window._scopeman.scope_call(window._py_scopeman.do_func, {
+            return yield this._scope_call("do_func", {
                 "id": this.id,
                 "code": code,
                 "params": params
@@ -147,17 +368,17 @@ class PyScope {
     }
     w_do_func(code, params = {}, do_auto_convert = false) {
         return __awaiter(this, void 0, void 0, function* () {
-            return yield window._scopeman.scope_call(window._py_scopeman.w_do_func_runner, {
+            return yield this._scope_call("w_do_func", {
                 "id": this.id,
                 "code": code,
-                "params": yield this.make_w_kwargs(params),
+                "params": this.make_w_kwargs(params, do_auto_convert),
                 "do_auto_convert": do_auto_convert
             });
         });
     }
     make_func(name, code, params = []) {
         return __awaiter(this, void 0, void 0, function* () {
-            let fn = yield window._scopeman.scope_call(window._py_scopeman.make_func, {
+            let fn = yield this._scope_call("make_func", {
                 "id": this.id,
                 "name": name,
                 "code": code,
@@ -166,25 +387,54 @@ class PyScope {
             return fn;
         });
     }
-    get_var(name) {
+    // With 'cached', the value is kept on the page, and later reads don't cross to Python at all.
+    // Python sends the new value whenever set_var() or del_var() change it. Code that changes it
+    // another way (like exec()) has to call the namespace's notify(), or the page won't know.
+    // Only values the page gets a copy of (JSON-like ones) are cached. Anything else is read as usual.
+    get_var(name, cached = false) {
         return __awaiter(this, void 0, void 0, function* () {
-            return yield window._scopeman.scope_call(window._py_scopeman.get_var, {
+            if (cached) {
+                let entry = yield window._scopeman.cached_var(this.id, name);
+                if (entry !== null) {
+                    if (!entry.exists) {
+                        throw window._scopeman.make_error({
+                            "name": "AttributeError",
+                            "message": `'${this.id}' has no variable '${name}'.`,
+                            "stack": ""
+                        });
+                    }
+                    return entry.value;
+                }
+            }
+            return yield this._scope_call("get_var", {
                 "id": this.id,
                 "name": name
             });
         });
     }
-    has_var(name) {
+    has_var(name, cached = false) {
         return __awaiter(this, void 0, void 0, function* () {
-            return yield window._scopeman.scope_call(window._py_scopeman.has_var, {
+            if (cached) {
+                let entry = yield window._scopeman.cached_var(this.id, name);
+                if (entry !== null) {
+                    return entry.exists;
+                }
+            }
+            return yield this._scope_call("has_var", {
                 "id": this.id,
                 "name": name
             });
         });
     }
+    // Stops caching the variable (see get_var()):
+    uncache_var(name) {
+        return __awaiter(this, void 0, void 0, function* () {
+            return yield window._scopeman.uncache_var(this.id, name);
+        });
+    }
     del_var(name) {
         return __awaiter(this, void 0, void 0, function* () {
-            return yield window._scopeman.scope_call(window._py_scopeman.del_var, {
+            return yield this._scope_call("del_var", {
                 "id": this.id,
                 "name": name
             });
@@ -192,7 +442,7 @@ class PyScope {
     }
     set_var(name, value) {
         return __awaiter(this, void 0, void 0, function* () {
-            return yield window._scopeman.scope_call(window._py_scopeman.set_var, {
+            return yield this._scope_call("set_var", {
                 "id": this.id,
                 "name": name,
                 "value": value
@@ -206,7 +456,7 @@ class PyScope {
     }
     call_kw(name, args = [], kwargs = {}) {
         return __awaiter(this, void 0, void 0, function* () {
-            return yield window._scopeman.scope_call(window._py_scopeman.raw_call_runner, {
+            return yield this._scope_call("call", {
                 "id": this.id,
                 "name": name,
                 "args": args,
@@ -231,16 +481,66 @@ class PyScope {
     }
     w_call_kw(name, args = [], kwargs = {}, auto_convert = false) {
         return __awaiter(this, void 0, void 0, function* () {
-            // return await window._scopeman.scope_call(window._py_scopeman.w_call_runner, {
-            return yield window._scopeman.scope_call(window._py_scopeman.w_call_runner, {
+            return yield this._scope_call("w_call", {
                 "id": this.id,
                 "name": name,
-                "args": yield this.make_w_args(args),
-                "kwargs": yield this.make_w_kwargs(kwargs),
+                "args": this.make_w_args(args, auto_convert),
+                "kwargs": this.make_w_kwargs(kwargs, auto_convert),
                 "auto_convert": auto_convert
             });
         });
     }
+    // Runs an op registered with PyScopeManager.register_op() in this scope.
+    op(name, kwargs = {}) {
+        return __awaiter(this, void 0, void 0, function* () {
+            return yield this._scope_call(name, Object.assign({ "id": this.id }, kwargs));
+        });
+    }
+    // Runs a list of [op, kwargs] pairs in this scope, in order, with one call into Python.
+    // Resolves with every op's result, or rejects with the first error (its 'batch_index' says which op failed).
+    // For example: `await py.batch([["get_var", {name: "a"}], ["call", {name: "f", args: [1], kwargs: {}}]])`
+    batch(ops) {
+        return __awaiter(this, void 0, void 0, function* () {
+            var _a;
+            let batch_ops = [];
+            for (const [op, kwargs] of ops) {
+                // Anything left out gets the same default as the op's own method (like w_exec()) gives it:
+                let op_kwargs = Object.assign(Object.assign({ "id": this.id }, ((_a = PyScope.batch_defaults[op]) !== null && _a !== void 0 ? _a : {})), kwargs);
+                if (op === "w_exec" || op === "w_do_func") {
+                    op_kwargs["params"] = this.make_w_kwargs(op_kwargs["params"], op_kwargs["do_auto_convert"]);
+                }
+                else if (op === "w_call") {
+                    op_kwargs["args"] = this.make_w_args(op_kwargs["args"], op_kwargs["auto_convert"]);
+                    op_kwargs["kwargs"] = this.make_w_kwargs(op_kwargs["kwargs"], op_kwargs["auto_convert"]);
+                }
+                batch_ops.push([op, op_kwargs]);
+            }
+            let outcomes = (yield this._scope_call("batch", { "ops": batch_ops }));
+            let results = [];
+            for (let i = 0; i < outcomes.length; i++) {
+                if (outcomes[i]['error'] !== null) {
+                    let error = window._scopeman.make_error(outcomes[i]['error']);
+                    error.batch_index = i;
+                    throw error;
+                }
+                results.push(window._scopeman.from_result(outcomes[i]['result']));
+            }
+            return results;
+        });
+    }
 }
+// Wrapped arguments are sent tagged with their type, so Python never has to ask for it:
+// [typeof, id] for stored objects, or [typeof, null, value] for primitives that
+// auto-convert would only turn straight back into Python values (see PyScopeManager.auto_convert_types).
+PyScope.inline_types = ["boolean", "number", "string"];
+PyScope.batch_defaults = {
+    "exec": { "params": {}, "ret_name": null },
+    "w_exec": { "params": {}, "ret_name": null, "do_auto_convert": false },
+    "do_func": { "params": {} },
+    "w_do_func": { "params": {}, "do_auto_convert": false },
+    "make_func": { "params": [] },
+    "call": { "args": [], "kwargs": {} },
+    "w_call": { "args": [], "kwargs": {}, "auto_convert": false },
+};
 const py = new PyScope(window.app_scope_key);
 //# sourceMappingURL=pyscope_preload.js.map
\ No newline at end of file
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
+from collections import deque
+import itertools
 from pathlib import Path
 import traceback
 from typing import Any, Callable, Union, get_type_hints
-import uuid
 import threading
 import time
 import textwrap
@@ -66,6 +67,16 @@ class JsObjectManagerCallDestroyedException(Exception):
         return f"The JsObject for '{self.call.label}' was destroyed, but you're still trying to access it."
 
 
+class JsObjectBatchPendingException(Exception):
+    result: JsObjectBatchResult
+
+    def __init__(self, result: JsObjectBatchResult):
+        self.result = result
+
+    def __str__(self):
+        return f"The '{self.result.op}' operation hasn't run yet. Submit its JsObjectBatch before reading its value."
+
+
 # ==== Class definitions: ====
 class JsObjectManager:
     is_ready: bool
@@ -76,6 +87,7 @@ class JsObjectManager:
     fadd_fn: cef.JavascriptCallback
     add_fn: cef.JavascriptCallback
     remove_fn: cef.JavascriptCallback
+    remove_many_fn: cef.JavascriptCallback
     access_fn: cef.JavascriptCallback
     py_fn: cef.JavascriptCallback
     auto_convert_fn: cef.JavascriptCallback
@@ -86,14 +98,31 @@ class JsObjectManager:
     del_attr_fn: cef.JavascriptCallback
     call_fn: cef.JavascriptCallback
     call_method_fn: cef.JavascriptCallback
-
-    def __init__(self, js_bindings: cef.JavascriptBindings):
+    batch_fn: cef.JavascriptCallback
+
+    # Ids of collected JsObjects, waiting to be removed from the browser in bulk. Queued
+    # ids are flushed once 'release_threshold' of them have piled up, and once per
+    # AppManager.mainloop_step() (see WebApp._run_step). A deque, since JsObjects can be
+    # collected on any thread, and even in the middle of a flush.
+    release_queue: deque[str]
+    release_threshold: int
+    released_count: int
+    flush_count: int
+
+    def __init__(self, js_bindings: cef.JavascriptBindings, *, release_threshold: int = 256):
         self.js_bindings = js_bindings
         self.is_ready = False
         self.js_preload = JsPreloadScript.new_from_file_path(
             Path(__file__).parent.joinpath("js/jsobject_preload.js")
         )
 
+        self.release_queue = deque()
+        self.release_threshold = release_threshold
+        self.released_count = 0
+        self.flush_count = 0
+
+        self._id_counter = itertools.count(1)
+
     def config_in_browser(self, browser: cef.PyBrowser):
         self.js_preload.run(browser)
 
@@ -119,6 +148,53 @@ class JsObjectManager:
     def ready(self):
         self.is_ready = True
 
+    # Ids for stored objects are assigned here, and sent along with the call that stores them,
+    # instead of the browser asking Python for one. Ids assigned by the preload itself start
+    # with 'js' instead, so the two never collide.
+    def new_id(self) -> str:
+        return f"py{next(self._id_counter)}"
+
+    def release(self, object_id: str):
+        self.release_queue.append(object_id)
+
+        if len(self.release_queue) >= self.release_threshold:
+            self.flush_releases()
+
+    def flush_releases(self) -> int:
+        # Until the preload is ready, there's nothing to send the ids to. They'll go with the next flush.
+        if not self.is_ready:
+            return 0
+
+        object_ids = []
+        while True:
+            try:
+                object_ids.append(self.release_queue.popleft())
+            except IndexError:
+                break
+
+        if len(object_ids) == 0:
+            return 0
+
+        self.released_count += len(object_ids)
+        self.flush_count += 1
+        # A callback costs a crossing back, so one's only passed when it's going to log:
+        self.remove_many_fn.Call(
+            object_ids,
+            (
+                (lambda: logger.debug(f"Destroyed {len(object_ids)} JsObjects"))
+                if JsObject._log_destructions
+                else None
+            ),
+        )
+        return len(object_ids)
+
+    def release_stats(self) -> dict[str, int]:
+        return {
+            "pending": len(self.release_queue),
+            "released": self.released_count,
+            "flushes": self.flush_count,
+        }
+
     def get_js_type(self, item) -> str:
         return self.from_py(item).get_js_type()
 
@@ -127,11 +203,42 @@ class JsObjectManager:
             manager=self, fn_code=fn_code, args=params, convert_args=convert_args
         )
 
-    def from_id(self, uuid: str, new_type: type[JsObject] = None):
+    def compile(self, fn_code: str, params: Union[list[str], tuple[str, ...]] = ()) -> JsObject:
+        # The browser caches the functions it builds for from_func and access code, but lookups
+        # still hash the code each time. For hot code, this parses it once into a JS function
+        # taking 'params' positionally, which can then be called like any other JsObject:
+        #
+        #     add = manager.compile("return a + b;", ("a", "b"))
+        #     add(1, 2).py()  # -> 3
+        return self.from_func(
+            "return this.compile(code, params);",
+            {"code": fn_code, "params": list(params)},
+            False,
+        )
+
+    def compile_cache_stats(self) -> dict[str, int]:
+        # The browser's cache of compiled code: size, max_size, hits and misses.
+        return self.from_func("return this.compile_cache_stats();", {}, False).py()
+
+    def batch(self, timeout: float = 5.0) -> JsObjectBatch:
+        # Use as a context manager to have the recorded operations submitted on exit:
+        #
+        #     with manager.batch() as batch:
+        #         template = batch.access(document, "return self.createElement('template')")
+        #         template["innerHTML"] = html
+        #         element = template["content"]["firstChild"]
+        #     element.value  # -> JsObject
+        return JsObjectBatch(self, timeout=timeout)
+
+    def from_id(self, uuid: str, new_type: type[JsObject] = None, js_type: str = None):
         if new_type is None:
             new_type = JsObject
 
-        return new_type(manager=self, object_id=uuid)
+        retVal = new_type(manager=self, object_id=uuid)
+        # If the caller already knows the type, js_type has it without asking the browser:
+        if js_type is not None:
+            retVal._js_type = js_type
+        return retVal
 
     # The 'skip_cef_converts' param results in remarkably fewer calls between Python and JS.
     # Hopefully, it will result in considerably improved performance.
@@ -152,92 +259,120 @@ class JsObjectManager:
 
         if log: logger.debug(f" --> Tkcef will convert {repr(obj)}. ")
 
-        if isinstance(obj, cef.JavascriptCallback):
-            return self.from_py(obj.Call, skip_cef_converts, store_cef_converts)
+        if isinstance(obj, JsObject) and obj.manager is self:
+            return obj
 
-        elif isinstance(obj, JsObject):
-            if obj.manager == self:
-                return obj
-            else:
-                return self.from_py(obj.py(), skip_cef_converts, store_cef_converts)
-
-        elif isinstance(obj, list) or isinstance(obj, tuple):
-            pairs = [self.from_py(i, skip_cef_converts, False) for i in obj]
-
-            retVal = None
-            if skip_cef_converts:
-                converts = [
-                    i
-                    for i in range(0, len(pairs))
-                    if issubclass(type(pairs[i]), JsObject)
-                ]
-
-                retVal = self.from_func(
-                    "return this.convert_list_items_in_place(new_item_ids, converts);",
-                    {"new_item_ids": pairs, "converts": converts},
-                    False,
-                )
-            else:
-                retVal = self.from_func(
-                    "return this.get_list(new_item_ids)", {"new_item_ids": pairs}, False
-                )
-            # del items
-            return retVal
+        # However deeply nested, the whole structure is rebuilt in the browser with a single call:
+        return self.from_func(
+            "return this.unmarshal(node);",
+            {"node": self.marshal(obj, skip_cef_converts)},
+            False,
+        )
 
-        elif isinstance(obj, dict):
-
-            retVal = None
-            # if False: pass
-            if skip_cef_converts:
-                # This should ensure the keys and values stay in the same order:
-                items = obj.items()
-                keys = [self.from_py(i[0], skip_cef_converts, False) for i in items]
-                values = [self.from_py(i[1], skip_cef_converts, False) for i in items]
-
-                # I suppose I could have converted the key and value lists by running them  each through
-                # from_py again. But, I'm trying to reduce the number of js exchanges per method call.
-                # In simpler cases, that strategy would result in MORE js calls, not fewer.
-                convert_keys = [
-                    i
-                    for i in range(0, len(keys))
-                    if issubclass(type(keys[i]), JsObject)
-                ]
-                convert_values = [
-                    i
-                    for i in range(0, len(values))
-                    if issubclass(type(values[i]), JsObject)
-                ]
-
-                retVal = self.from_func(
-                    "return this.convert_in_place_and_make_pairs_from_lists(keys, convert_keys, values, convert_values);",
-                    {
-                        "keys": keys,
-                        "convert_keys": convert_keys,
-                        "values": values,
-                        "convert_values": convert_values,
-                    },
-                    False,
-                )
+    def get_ref(self, obj: Any) -> Union[str, None]:
+        # The id to pass 'obj' by, if it's already stored in the browser.
+        if isinstance(obj, JsObject) and obj.manager is self:
+            return obj._object_id
+        return None
+
+    # Python structures are sent to the browser as a tree of tagged nodes, which the preload
+    # rebuilds with JsObjectManager.unmarshal(). Each node is a list, starting with its tag:
+    #   ["v", value]                        A value CEF can convert on its own, passed as-is.
+    #   ["r", object_id]                    A stored JsObject.
+    #   ["l", [nodes]]                      A list or tuple.
+    #   ["d", [key nodes], [value nodes]]   A dict.
+    #   ["u"]                               Anything else, which becomes undefined.
+    # Containers whose contents are all plain values (once converted) collapse into a single
+    # "v" node, so the structure only gets walked once. With skip_cef_converts=False, they never collapse.
+    def marshal(
+        self,
+        obj: Any,
+        skip_cef_converts: bool = True,
+        get_ref: Callable[[Any], Union[str, None]] = None,
+    ) -> list:
+        if get_ref is None:
+            get_ref = self.get_ref
+
+        object_id = get_ref(obj)
+        if object_id is not None:
+            return ["r", object_id]
+
+        if isinstance(obj, (list, tuple)):
+            nodes = [self.marshal(i, skip_cef_converts, get_ref) for i in obj]
+
+            if skip_cef_converts and all(node[0] == "v" for node in nodes):
+                # Built from the nodes, since some of the values may have been converted on the way
+                # (like callbacks, and JsObjects from other managers):
+                return ["v", [node[1] for node in nodes]]
+            return ["l", nodes]
+
+        if isinstance(obj, dict):
+            keys = [self.marshal(i, skip_cef_converts, get_ref) for i in obj.keys()]
+            values = [self.marshal(i, skip_cef_converts, get_ref) for i in obj.values()]
+
+            if (
+                skip_cef_converts
+                and all(isinstance(key, str) for key in obj.keys())
+                and all(node[0] == "v" for node in values)
+            ):
+                return ["v", {key: node[1] for key, node in zip(obj.keys(), values)}]
+            return ["d", keys, values]
+
+        if isinstance(obj, cef.JavascriptCallback):
+            return self.marshal(obj.Call, skip_cef_converts, get_ref)
+
+        if isinstance(obj, JsObject):
+            # It belongs to a different manager:
+            return self.marshal(obj.py(), skip_cef_converts, get_ref)
+
+        if self.can_cef_convert(obj):
+            return ["v", obj]
+
+        # If something can't be converted, just make it undefined.
+        # Having this as a failsafe oughta improve stability somewhat.
+        return ["u"]
+
+    # Values CEF can convert on its own travel inline with the call that uses them. Anything
+    # else is marshalled into the call's payload as well, and the keys/indexes of those items
+    # are listed alongside, so that the preload knows which ones to unmarshal. Either way,
+    # passing arguments never costs a bridge crossing of its own.
+    def encode_value(
+        self, value: Any, get_ref: Callable[[Any], Union[str, None]] = None
+    ) -> tuple[Any, bool]:
+        # Returns the value to send, and whether it was marshalled.
+        node = self.marshal(value, get_ref=get_ref)
+        if node[0] == "v":
+            return node[1], False
+        return node, True
+
+    def encode_items(
+        self,
+        items: Union[dict, list, tuple],
+        get_ref: Callable[[Any], Union[str, None]] = None,
+    ) -> tuple[Union[dict, list], list]:
+        # Returns the encoded items, and the keys/indexes of the ones that were marshalled.
+        retVal = {} if isinstance(items, dict) else []
+        marshalled = []
+
+        for key, value in items.items() if isinstance(items, dict) else enumerate(items):
+            encoded, is_marshalled = self.encode_value(value, get_ref)
+            if isinstance(retVal, dict):
+                retVal[key] = encoded
             else:
-                pairs = {}
-                for key, value in obj.items():
-                    pairs[self.from_py(key)] = self.from_py(value)
-
-                retVal = self.from_func(
-                    "return this.get_pairs(new_item_ids)",
-                    {"new_item_ids": pairs},
-                    False,
-                )
-            return retVal
+                retVal.append(encoded)
 
-        # When using skip_cef_converts, if the item was convertable, it should have been added by now.
-        # But if not, check and handle that here.
-        elif (not skip_cef_converts) and self.can_cef_convert(obj):
-            return self.from_func("return new_item;", {"new_item": obj}, False)
-        else:
-            # If something can't be converted, just make it undefined.
-            # Having this as a failsafe oughta improve stability somewhat.
-            return self.from_func("return undefined;", {}, False)
+            if is_marshalled:
+                marshalled.append(key)
+
+        return retVal, marshalled
+
+    def encode_args(self, args: Union[dict, JsObject]) -> tuple[Any, list]:
+        # The arguments for fadd and access may also be a single JsObject holding a dict.
+        if isinstance(args, JsObject):
+            if args.manager is self:
+                return args._object_id, []
+            args = args.py()
+        return self.encode_items(args)
 
 
 class JsObjectManagerCall:
@@ -248,13 +383,16 @@ class JsObjectManagerCall:
     js_object_id: JsObject
 
     timeout: float
-    completed: bool
     timed_out: bool
     start_time: float
     wait_time: float
     result: Any
     error: Any
 
+    # Set by on_complete(). Waiting on this, rather than polling, lets the waiting
+    # thread sleep (and release the GIL) until CEF delivers the result.
+    _completed_event: threading.Event
+
     # We'll wait 5 seconds by default:
     def __init__(
         self, js_object: JsObject = None, label: str = None, *, timeout: float = 5.0
@@ -268,7 +406,7 @@ class JsObjectManagerCall:
         self.timeout = timeout
         self.label = label
 
-        self.completed = False
+        self._completed_event = threading.Event()
         self.timed_out = False
         self.start_time = None
         self.wait_time = 0
@@ -279,10 +417,14 @@ class JsObjectManagerCall:
     def value(self):
         return self.py()
 
+    @property
+    def completed(self) -> bool:
+        return self._completed_event.is_set()
+
     def on_complete(self, result=None, error=None):
         self.result = result
         self.error = error
-        self.completed = True
+        self._completed_event.set()
 
         # If start_time is None, we never started waiting:
         if self.log_completions and self.start_time is not None:
@@ -295,13 +437,12 @@ class JsObjectManagerCall:
             self.timeout = timeout
 
         self.start_time = time.monotonic()
-        while not self.completed:
-            self.wait_time = time.monotonic() - self.start_time
-            # Handle timing out:
-            if self.timeout is not None and self.timeout > 0:
-                if self.wait_time > self.timeout:
-                    self.timed_out = True
-                    return
+        if self.timeout is not None and self.timeout > 0:
+            self.timed_out = not self._completed_event.wait(self.timeout)
+        else:
+            self._completed_event.wait()
+
+        self.wait_time = time.monotonic() - self.start_time
 
     def __str__(self):
         return f"{self.js_object_id} -> {self.label}"
@@ -360,17 +501,18 @@ class JsObject(Callable):
             new_base._object_id = None
 
         else:
+            self.manager = manager
             self._object_id = object_id
             if self._object_id is None:
-                self._object_id = str(uuid.uuid4())
-            self.manager = manager
+                self._object_id = self.manager.new_id()
 
         if fn_code is not None:
+            marshalled = []
             if convert_args:
-                args = self.manager.from_py(args)
+                args, marshalled = self.manager.encode_args(args)
 
             call = JsObjectManagerCall(self, "fadd")
-            self.manager.fadd_fn.Call(self._object_id, fn_code, args, call.on_complete)
+            self.manager.fadd_fn.Call(self._object_id, fn_code, args, marshalled, call.on_complete)
             call.wait()
 
             # If there's an error during an object's __init__, its __del__ never be called.
@@ -464,8 +606,12 @@ class JsObject(Callable):
             raise JsObjectManagerCallDestroyedException(call)
 
     # Regular Methods:
-    def _wait_successful(self, call: JsObjectManagerCall):
+    def _wait_successful(self, call: JsObjectManagerCall, result_id: str = None):
         if call.timed_out:
+            # The browser may still store the result after we've stopped waiting for it:
+            if result_id is not None:
+                self.manager.release(result_id)
+
             if call.should_raise_timeout_error:
                 raise JsObjectManagerCallTimeoutException(call)
             else:
@@ -485,14 +631,8 @@ class JsObject(Callable):
         if self._object_id is None:
             return
 
-        self.manager.remove_fn.Call(
-            self._object_id,
-            lambda: (
-                logger.debug(f"Destroyed JsObject {self._object_id}")
-                if self._log_destructions
-                else None
-            ),
-        )
+        # Removed from the browser with the manager's next flush:
+        self.manager.release(self._object_id)
 
     def access(
         self,
@@ -507,19 +647,21 @@ class JsObject(Callable):
         # CEF know to replace those with their actual JavaScript counterparts.
         self.check_destroyed_error(call)
 
+        marshalled = []
         if convert_args:
-            args = self.manager.from_py(args, True, False)
+            args, marshalled = self.manager.encode_args(args)
 
+        result_id = self.manager.new_id()
         self.manager.access_fn.Call(
-            self._object_id, fn_code, args, obj_param, call.on_complete
+            self._object_id, result_id, fn_code, args, marshalled, obj_param, call.on_complete
         )
 
         call.wait()
 
-        if not self._wait_successful(call):
+        if not self._wait_successful(call, result_id):
             return None
 
-        return self.manager.from_id(call.result)
+        return self.manager.from_id(result_id)
 
     def as_type(self, new_type: type[JsObject]):
         # We need to make a new storage entry for the JS value, so that we don't render this JsObject instance useless.
@@ -568,22 +710,25 @@ class JsObject(Callable):
         call = JsObjectManagerCall(self, "get_attr")
         self.check_destroyed_error(call)
 
-        self.manager.get_attr_fn.Call(self._object_id, name, call.on_complete)
+        result_id = self.manager.new_id()
+        self.manager.get_attr_fn.Call(self._object_id, result_id, name, call.on_complete)
 
         call.wait()
 
-        if not self._wait_successful(call):
+        if not self._wait_successful(call, result_id):
             return None
 
-        return self.manager.from_id(call.result)
+        return self.manager.from_id(result_id)
 
     def set_attr(self, name: str, value: Any) -> JsObject:
 
         call = JsObjectManagerCall(self, "set_attr", timeout=None)
         self.check_destroyed_error(call)
 
+        value, is_marshalled = self.manager.encode_value(value)
+
         self.manager.set_attr_fn.Call(
-            self._object_id, name, self.manager.from_py(value), call.on_complete
+            self._object_id, name, value, is_marshalled, call.on_complete
         )
 
         call.wait()
@@ -620,35 +765,280 @@ class JsObject(Callable):
         return self.manager.from_id(call.result)
 
     def call(self, *args) -> JsObject:
-        pass_args = self.manager.from_py(args)
+        pass_args, marshalled = self.manager.encode_items(args)
 
         call = JsObjectManagerCall(self, "call")
         self.check_destroyed_error(call)
 
-        self.manager.call_fn.Call(self._object_id, pass_args, call.on_complete)
-
-        # del args_test
+        result_id = self.manager.new_id()
+        self.manager.call_fn.Call(
+            self._object_id, result_id, pass_args, marshalled, call.on_complete
+        )
 
         call.wait()
 
-        if not self._wait_successful(call):
+        if not self._wait_successful(call, result_id):
             return None
 
-        return self.manager.from_id(call.result)
+        return self.manager.from_id(result_id)
 
     def call_method(self, method_name: str, *args) -> JsObject:
-        pass_args = self.manager.from_py(args)
+        pass_args, marshalled = self.manager.encode_items(args)
 
         call = JsObjectManagerCall(self, "call_method")
         self.check_destroyed_error(call)
 
+        result_id = self.manager.new_id()
         self.manager.call_method_fn.Call(
-            self._object_id, method_name, pass_args, call.on_complete
+            self._object_id, result_id, method_name, pass_args, marshalled, call.on_complete
         )
 
         call.wait()
 
-        if not self._wait_successful(call):
+        if not self._wait_successful(call, result_id):
             return None
 
-        return self.manager.from_id(call.result)
+        return self.manager.from_id(result_id)
+
+
+class JsObjectBatchResult:
+    # Placeholder for the outcome of an operation recorded in a JsObjectBatch.
+    # Placeholders for operations that produce a JS object can be used as the
+    # target or as an argument of any later operation in the same batch.
+    batch: JsObjectBatch
+    op: str
+    resolved: bool
+
+    _object_id: Union[str, None]
+    _value: Any
+
+    def __init__(self, batch: JsObjectBatch, op: str, stores_result: bool):
+        self.batch = batch
+        self.op = op
+        self.resolved = False
+
+        self._object_id = batch.manager.new_id() if stores_result else None
+        self._value = None
+
+    @property
+    def stores_result(self) -> bool:
+        return self._object_id is not None
+
+    @property
+    def value(self) -> Any:
+        if not self.resolved:
+            raise JsObjectBatchPendingException(self)
+        return self._value
+
+    def resolve(self, value: Any = None):
+        if self.stores_result:
+            # The new JsObject takes ownership of the storage entry, so it's released
+            # when the JsObject is garbage collected, even if the value is never read.
+            self._value = self.batch.manager.from_id(self._object_id)
+        else:
+            self._value = value
+        self.resolved = True
+
+    def __str__(self):
+        return str(self._object_id)
+
+    def __repr__(self):
+        return f"{type(self).__name__} {self._object_id}: <{self.op}>"
+
+    # Shortcuts for recording operations on this result:
+    def __getitem__(self, key: str) -> JsObjectBatchResult:
+        return self.get_attr(key)
+
+    def __setitem__(self, key: str, value: Any):
+        self.set_attr(key, value)
+
+    def access(
+        self, fn_code: str, args: Union[dict, JsObject] = {}, *, obj_param="self"
+    ) -> JsObjectBatchResult:
+        return self.batch.access(self, fn_code, args, obj_param=obj_param)
+
+    def get_attr(self, name: str) -> JsObjectBatchResult:
+        return self.batch.get_attr(self, name)
+
+    def set_attr(self, name: str, value: Any) -> JsObjectBatchResult:
+        return self.batch.set_attr(self, name, value)
+
+    def call(self, *args) -> JsObjectBatchResult:
+        return self.batch.call(self, *args)
+
+    def call_method(self, method_name: str, *args) -> JsObjectBatchResult:
+        return self.batch.call_method(self, method_name, *args)
+
+    def py(self) -> JsObjectBatchResult:
+        return self.batch.py(self)
+
+
+class JsObjectBatch:
+    # Records JsObject operations and runs all of them in the browser with a
+    # single call to JsObjectManager.batch_fn, instead of one round trip each.
+    manager: JsObjectManager
+    timeout: float
+    submitted: bool
+
+    ops: list[dict]
+    results: list[JsObjectBatchResult]
+
+    def __init__(self, manager: JsObjectManager, *, timeout: float = 5.0):
+        self.manager = manager
+        self.timeout = timeout
+        self.submitted = False
+
+        self.ops = []
+        self.results = []
+
+    def __enter__(self) -> JsObjectBatch:
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        if exc_type is None:
+            self.submit()
+
+    def _ref(self, target: Union[JsObject, JsObjectBatchResult]) -> str:
+        if isinstance(target, JsObjectBatchResult):
+            if target.batch is not self:
+                raise ValueError(f"{target!r} belongs to a different JsObjectBatch.")
+            if not target.stores_result:
+                raise ValueError(
+                    f"The result of a '{target.op}' operation isn't a JS object, and can't be referenced."
+                )
+            return target._object_id
+
+        if isinstance(target, JsObject) and target.manager is self.manager:
+            return target._object_id
+
+        raise TypeError(f"Expected a JsObject or a JsObjectBatchResult, got {target!r}.")
+
+    def _get_ref(self, value: Any) -> Union[str, None]:
+        # Placeholders are passed by id, just like stored JsObjects, wherever they're nested.
+        if isinstance(value, JsObjectBatchResult):
+            return self._ref(value)
+        return self.manager.get_ref(value)
+
+    def _encode_value(self, value: Any) -> tuple[Any, bool]:
+        return self.manager.encode_value(value, self._get_ref)
+
+    def _encode_items(self, items: Union[dict, list, tuple]) -> tuple[Union[dict, list], list]:
+        return self.manager.encode_items(items, self._get_ref)
+
+    def _encode_args(self, args: Union[dict, JsObject, JsObjectBatchResult]) -> tuple[Any, list]:
+        # As with JsObject.access, the arguments may also be a single JsObject holding a dict.
+        if isinstance(args, (JsObject, JsObjectBatchResult)):
+            return self._ref(args), []
+        return self._encode_items(args)
+
+    def _record(self, op: str, stores_result: bool, **payload) -> JsObjectBatchResult:
+        if self.submitted:
+            raise RuntimeError("This JsObjectBatch has already been submitted.")
+
+        result = JsObjectBatchResult(self, op, stores_result)
+        payload["op"] = op
+        payload["result_id"] = result._object_id
+
+        self.ops.append(payload)
+        self.results.append(result)
+        return result
+
+    # Recorded operations:
+    def from_func(self, fn_code: str, params: dict = {}) -> JsObjectBatchResult:
+        args, marshalled = self._encode_args(params)
+        return self._record("fadd", True, code=fn_code, args=args, marshalled=marshalled)
+
+    def access(
+        self,
+        target: Union[JsObject, JsObjectBatchResult],
+        fn_code: str,
+        args: Union[dict, JsObject] = {},
+        *,
+        obj_param="self",
+    ) -> JsObjectBatchResult:
+        args, marshalled = self._encode_args(args)
+        return self._record(
+            "access",
+            True,
+            target=self._ref(target),
+            code=fn_code,
+            args=args,
+            marshalled=marshalled,
+            obj_param=obj_param,
+        )
+
+    def get_attr(self, target: Union[JsObject, JsObjectBatchResult], name: str) -> JsObjectBatchResult:
+        return self._record("get_attr", True, target=self._ref(target), name=name)
+
+    def set_attr(
+        self, target: Union[JsObject, JsObjectBatchResult], name: str, value: Any
+    ) -> JsObjectBatchResult:
+        value, is_marshalled = self._encode_value(value)
+        return self._record(
+            "set_attr",
+            False,
+            target=self._ref(target),
+            name=name,
+            value=value,
+            is_marshalled=is_marshalled,
+        )
+
+    def has_attr(self, target: Union[JsObject, JsObjectBatchResult], name: str) -> JsObjectBatchResult:
+        return self._record("has_attr", False, target=self._ref(target), name=name)
+
+    def del_attr(self, target: Union[JsObject, JsObjectBatchResult], name: str) -> JsObjectBatchResult:
+        return self._record("del_attr", False, target=self._ref(target), name=name)
+
+    def call(self, target: Union[JsObject, JsObjectBatchResult], *args) -> JsObjectBatchResult:
+        args, marshalled = self._encode_items(args)
+        return self._record("call", True, target=self._ref(target), args=args, marshalled=marshalled)
+
+    def call_method(
+        self, target: Union[JsObject, JsObjectBatchResult], method_name: str, *args
+    ) -> JsObjectBatchResult:
+        args, marshalled = self._encode_items(args)
+        return self._record(
+            "call_method",
+            True,
+            target=self._ref(target),
+            name=method_name,
+            args=args,
+            marshalled=marshalled,
+        )
+
+    def py(self, target: Union[JsObject, JsObjectBatchResult]) -> JsObjectBatchResult:
+        return self._record("py", False, target=self._ref(target))
+
+    def get_js_type(self, target: Union[JsObject, JsObjectBatchResult]) -> JsObjectBatchResult:
+        return self._record("get_type", False, target=self._ref(target))
+
+    def submit(self, timeout: float = None) -> list[JsObjectBatchResult]:
+        if self.submitted:
+            return self.results
+        self.submitted = True
+
+        if len(self.ops) == 0:
+            return self.results
+
+        call = JsObjectManagerCall(
+            None, "batch", timeout=self.timeout if timeout is None else timeout
+        )
+        self.manager.batch_fn.Call(self.ops, call.on_complete)
+        call.wait()
+
+        if call.timed_out:
+            # If the browser gets to the batch after all, nothing here will ever wrap what it stores.
+            # The ids were assigned here, so they're released, and go out after the batch itself:
+            for result in self.results:
+                if result.stores_result:
+                    self.manager.release(result._object_id)
+            raise JsObjectManagerCallTimeoutException(call)
+
+        # The browser discards everything the batch stored if any operation fails:
+        if call.error != None:
+            raise JSObjectException(**call.error)
+
+        for result, value in zip(self.results, call.result):
+            result.resolve(value)
+
+        return self.results
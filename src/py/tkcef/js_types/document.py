@@ -200,6 +200,9 @@ class JsDocument(JsObject):
         return retVal
 
     def htmlToElement(self, html: str):
-        template = self.access("return self.createElement('template')")
-        template["innerHTML"] = html.strip()
-        return template["content"]["firstChild"]
+        with self.manager.batch() as batch:
+            template = batch.access(self, "return self.createElement('template')")
+            template["innerHTML"] = html.strip()
+            element = template["content"]["firstChild"]
+
+        return element.value
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Union
+
+# Where a call from the page runs:
+# - CEF_LANE runs it right away, on the CEF thread the page called in on. Only for
+#   fast, non-blocking work; the browser can't do anything else until it returns.
+# - TK_LANE queues it for Tk's main thread (like App.queue_update_action()), for code
+#   that touches widgets.
+# - WORKER_LANE hands it to the worker pool, for anything that might block.
+CEF_LANE = "cef"
+TK_LANE = "tk"
+WORKER_LANE = "worker"
+LANES = (CEF_LANE, TK_LANE, WORKER_LANE)
+
+
+class UnknownLaneException(Exception):
+    lane: str
+
+    def __init__(self, lane: str):
+        self.lane = lane
+
+    def __str__(self):
+        return f"'{self.lane}' isn't a lane. Use one of: {', '.join(LANES)}."
+
+
+def check_lane(lane: Union[str, None]) -> Union[str, None]:
+    if lane is not None and lane not in LANES:
+        raise UnknownLaneException(lane)
+    return lane
+
+
+def run_on(lane: str) -> Callable[[Callable], Callable]:
+    # Decorator. Calls to the function from the page (`py.call()`, `py.w_call()`) run on 'lane',
+    # whatever its namespace's lane is:
+    #
+    #   @tkcef.run_on(tkcef.TK_LANE)
+    #   def resize(width, height): ...
+    check_lane(lane)
+
+    def decorator(fn: Callable) -> Callable:
+        fn.__tkcef_lane__ = lane
+        return fn
+
+    return decorator
+
+
+def lane_of(fn: Any) -> Union[str, None]:
+    return getattr(fn, "__tkcef_lane__", None)
+
+
+def run_concurrently(fn: Callable) -> Callable:
+    # Decorator. Page calls into one namespace run one at a time, in the order they were made,
+    # so a call can rely on what the ones before it did. Calls to this function don't wait
+    # their turn, and can run alongside the namespace's other calls:
+    #
+    #   @tkcef.run_concurrently
+    #   def search(query): ...
+    fn.__tkcef_concurrent__ = True
+    return fn
+
+
+def is_concurrent(fn: Any) -> bool:
+    return getattr(fn, "__tkcef_concurrent__", False)
+
+
+class LaneStats:
+    # Time spent running calls on a lane, and waiting to get onto it (in seconds).
+    lane: str
+    calls: int
+    busy: float
+    waited: float
+    slowest: float
+    # Calls that took longer than the lane's budget (see PyScopeManager.cef_lane_budget):
+    over_budget: int
+
+    _lock: threading.Lock
+
+    def __init__(self, lane: str):
+        self.lane = lane
+        self.calls = 0
+        self.busy = 0.0
+        self.waited = 0.0
+        self.slowest = 0.0
+        self.over_budget = 0
+
+        self._lock = threading.Lock()
+
+    def record(self, waited: float, busy: float, budget: float = None):
+        with self._lock:
+            self.calls += 1
+            self.busy += busy
+            self.waited += waited
+            self.slowest = max(self.slowest, busy)
+            if budget is not None and busy > budget:
+                self.over_budget += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "busy": self.busy,
+                "waited": self.waited,
+                "mean_busy": self.busy / self.calls if self.calls > 0 else 0.0,
+                "slowest": self.slowest,
+                "over_budget": self.over_budget,
+            }
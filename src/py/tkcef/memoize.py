@@ -0,0 +1,361 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from concurrent.futures import Future
+import functools
+import inspect
+import threading
+import time
+from typing import Any, Callable, Hashable, Union
+
+from .persistent_cache import PersistentCache, function_identity
+
+
+class UncacheableArgumentException(Exception):
+    value: Any
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __str__(self):
+        return f"Arguments of type '{type(self.value).__name__}' can't be part of a memo key."
+
+
+def freeze(value: Any) -> Hashable:
+    # Turns the JSON-like values pages send into something hashable. Anything else (JsObjects
+    # especially, which could have changed on the page since) makes the call uncacheable.
+    if value is None or isinstance(value, (str, int, float)):
+        # True == 1, but they shouldn't share a cache entry:
+        return ("b", value) if isinstance(value, bool) else value
+    if isinstance(value, (list, tuple)):
+        return ("l", tuple(freeze(i) for i in value))
+    if isinstance(value, dict):
+        return ("d", frozenset((key, freeze(i)) for key, i in value.items()))
+    raise UncacheableArgumentException(value)
+
+
+def make_key(args: Union[list, tuple], kwargs: dict = None) -> Union[Hashable, None]:
+    # None if the arguments can't be cached on:
+    try:
+        return (
+            tuple(freeze(i) for i in args),
+            frozenset((key, freeze(i)) for key, i in ({} if kwargs is None else kwargs).items()),
+        )
+    except UncacheableArgumentException:
+        return None
+
+
+class MemoCache:
+    # An LRU cache of results, where each entry is dropped after 'ttl' seconds (if set).
+    maxsize: Union[int, None]
+    ttl: Union[float, None]
+
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    invalidations: int
+    uncacheable: int
+    # Page calls that waited on a result already being worked out, instead of running again:
+    coalesced: int
+    # Hits that came from the persistent cache (see lookup()'s 'fallback'):
+    persisted_hits: int
+
+    # key -> (result, expires at)
+    _entries: OrderedDict[Hashable, tuple[Any, Union[float, None]]]
+    # Results being worked out right now, by key:
+    _pending: dict[Hashable, Future]
+    _lock: threading.Lock
+
+    def __init__(self, maxsize: Union[int, None] = 128, ttl: Union[float, None] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.uncacheable = 0
+        self.coalesced = 0
+        self.persisted_hits = 0
+
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def lookup(
+        self,
+        key: Union[Hashable, None],
+        count_miss: bool = True,
+        fallback: Callable[[], tuple[bool, Any]] = None,
+    ) -> tuple[bool, Any]:
+        # On a miss, 'fallback' gets a chance to find the result somewhere else. If it does,
+        # it's cached here too:
+        hit, value = self._lookup(key, count_miss and (fallback is None or key is None))
+        if hit or key is None or fallback is None:
+            return hit, value
+
+        hit, value = fallback()
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.persisted_hits += 1
+            elif count_miss:
+                self.misses += 1
+        if hit:
+            self.store(key, value)
+        return hit, value
+
+    def _lookup(self, key: Union[Hashable, None], count_miss: bool) -> tuple[bool, Any]:
+        with self._lock:
+            if key is None:
+                if count_miss:
+                    self.uncacheable += 1
+                return False, None
+
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+
+            if entry is None:
+                if count_miss:
+                    self.misses += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def claim(self, key: Hashable) -> tuple[Future, bool]:
+        # The Future for the result being worked out for 'key', and whether this made it. Whoever
+        # made it has to finish() it, even if they never get as far as working the result out.
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+
+            future = self._pending[key] = Future()
+            return future, True
+
+    def begin(self, key: Hashable) -> Future:
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = Future()
+            return future
+
+    def finish(self, key: Hashable, future: Future, value: Any = None, error: BaseException = None):
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+        if future.done():
+            return
+        if error is None:
+            future.set_result(value)
+        else:
+            future.set_exception(error)
+
+    def resolve(self, key: Hashable, value: Any):
+        # Hands a result found some other way (I.E, in the persistent cache) to the calls waiting on 'key':
+        with self._lock:
+            future = self._pending.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(value)
+
+    def store(self, key: Union[Hashable, None], value: Any):
+        if key is None:
+            return
+
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while self.maxsize is not None and len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        with self._lock:
+            if self._entries.pop(key, None) is None:
+                return False
+            self.invalidations += 1
+            return True
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "uncacheable": self.uncacheable,
+                "coalesced": self.coalesced,
+                "persisted_hits": self.persisted_hits,
+                "in_flight": len(self._pending),
+            }
+
+
+class MemoizedFunction:
+    # What @tkcef.memoize returns. Calling it from Python uses the cache too.
+    __wrapped__: Callable
+    cache: MemoCache
+    is_async: bool
+    # Results also go to the active PersistentCache, keyed on this (when 'persist' is set):
+    persist: bool
+    identity: str
+
+    def __init__(
+        self,
+        fn: Callable,
+        maxsize: Union[int, None] = 128,
+        ttl: Union[float, None] = None,
+        persist: bool = False,
+        version: str = None,
+    ):
+        if inspect.isgeneratorfunction(fn) or inspect.isasyncgenfunction(fn):
+            raise TypeError(f"'{fn.__name__}' is a generator function. Its results can't be replayed from a cache.")
+
+        # Copies over __name__, __doc__, and markers like @run_on's and @cpu_bound's:
+        functools.update_wrapper(self, fn)
+        self.cache = MemoCache(maxsize, ttl)
+        self.is_async = inspect.iscoroutinefunction(fn)
+        self.persist = persist
+        self.identity = function_identity(fn, version)
+
+    def __call__(self, *args, **kwargs):
+        return self.call_keyed(make_key(args, kwargs), self.__wrapped__, args, kwargs)
+
+    def lookup(
+        self,
+        key: Union[Hashable, None],
+        args: Union[list, tuple],
+        kwargs: dict,
+        count_miss: bool = True,
+        use_persistent: bool = True,
+    ) -> tuple[bool, Any]:
+        # Without 'use_persistent', only results already in memory are found. Reading the persistent
+        # cache can wait on it loading, and unpickles the result, so it's kept off the CEF thread:
+        persistent = PersistentCache.active if self.persist and use_persistent else None
+        if persistent is None:
+            return self.cache.lookup(key, count_miss)
+        return self.cache.lookup(key, count_miss, lambda: persistent.get(persistent.key_for(self.identity, args, kwargs)))
+
+    def store(self, key: Hashable, args: Union[list, tuple], kwargs: dict, value: Any):
+        self.cache.store(key, value)
+
+        persistent = PersistentCache.active if self.persist else None
+        if persistent is not None:
+            persistent.put(persistent.key_for(self.identity, args, kwargs), self.identity, value, self.cache.ttl)
+
+    def __reduce__(self):
+        # Pickles by name, like the function it wraps (I.E, to send it to the process pool):
+        return self.__qualname__
+
+    def call_keyed(self, key: Union[Hashable, None], run: Callable, args: Union[list, tuple], kwargs: dict):
+        # 'run' does the actual call on a miss. It's the wrapped function, unless the caller
+        # runs it somewhere else (I.E, the process pool for @cpu_bound functions).
+        hit, value = self.lookup(key, args, kwargs)
+        if hit:
+            if key is not None:
+                # Page calls may be waiting on this one (I.E, if it was only found in the persistent cache):
+                self.cache.resolve(key, value)
+            return self._resolved(value) if self.is_async else value
+
+        if key is None:
+            return run(*args, **kwargs)
+
+        # Page calls with the same arguments wait on this one (see PyScopeManager.cached_result()):
+        future = self.cache.begin(key)
+        try:
+            result = run(*args, **kwargs)
+        except BaseException as e:
+            self.cache.finish(key, future, error=e)
+            raise
+
+        if inspect.isawaitable(result):
+            return self._store_awaited(key, future, result, args, kwargs)
+
+        self.store(key, args, kwargs, result)
+        self.cache.finish(key, future, result)
+        return result
+
+    async def _resolved(self, value: Any) -> Any:
+        return value
+
+    async def _store_awaited(
+        self, key: Hashable, future: Future, awaitable, args: Union[list, tuple], kwargs: dict
+    ) -> Any:
+        try:
+            result = await awaitable
+        except BaseException as e:
+            self.cache.finish(key, future, error=e)
+            raise
+
+        self.store(key, args, kwargs, result)
+        self.cache.finish(key, future, result)
+        return result
+
+    def invalidate(self, *args, **kwargs) -> bool:
+        # Drops the result cached for these arguments, if there is one:
+        key = make_key(args, kwargs)
+        if key is None:
+            return False
+
+        invalidated = self.cache.invalidate(key)
+        persistent = PersistentCache.active if self.persist else None
+        if persistent is not None:
+            invalidated = persistent.invalidate(persistent.key_for(self.identity, args, kwargs)) or invalidated
+        return invalidated
+
+    def cache_clear(self):
+        self.cache.clear()
+        if self.persist and PersistentCache.active is not None:
+            PersistentCache.active.invalidate_function(self.identity)
+
+    def cache_stats(self) -> dict[str, Any]:
+        return self.cache.stats()
+
+
+def call_unmemoized(fn: MemoizedFunction, args: Union[list, tuple], kwargs: dict) -> Any:
+    # Runs in a worker process, for memoized @cpu_bound functions. The cache stays in this one:
+    return fn.__wrapped__(*args, **kwargs)
+
+
+def memoize(
+    fn: Callable = None,
+    *,
+    maxsize: Union[int, None] = 128,
+    ttl: Union[float, None] = None,
+    persist: bool = False,
+    version: str = None,
+):
+    # Decorator. Caches the function's results by argument, for calls from the page and from
+    # Python alike. Use it as `@tkcef.memoize` or `@tkcef.memoize(maxsize=..., ttl=...)`:
+    #
+    #   @tkcef.memoize(ttl=30)
+    #   def monthly_report(year, month): ...
+    #
+    #   monthly_report.invalidate(2024, 5)   # Or monthly_report.cache_clear().
+    #
+    # Page calls that hit the cache are answered on the CEF thread, without waiting on a lane.
+    # Only JSON-like arguments (what the page sends) can be keyed on. Calls with anything else
+    # (like JsObjects) always run.
+    #
+    # With 'persist', results are also kept in the AppManager's PersistentCache, and survive a restart.
+    # They're dropped when the function's code (or 'version') changes, and have to pickle.
+    if fn is None:
+        return lambda fn: MemoizedFunction(fn, maxsize, ttl, persist, version)
+    return MemoizedFunction(fn, maxsize, ttl, persist, version)
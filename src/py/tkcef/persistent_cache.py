@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+import hashlib
+import json
+from pathlib import Path
+import pickle
+import queue
+import sqlite3
+import threading
+import time
+from types import CodeType
+from typing import Any, Callable, Union
+
+from . import logger
+
+
+def function_identity(fn: Callable, version: str = None) -> str:
+    # Names the function, and changes when its code does, so results from an older
+    # version of it are never served:
+    code = getattr(fn, "__code__", None)
+    digest = hashlib.sha256()
+    if code is not None:
+        _hash_code(digest, code)
+    return f"{fn.__module__}.{fn.__qualname__}:{digest.hexdigest()[:16]}:{version}"
+
+
+def _hash_code(digest, code: CodeType):
+    # Comprehensions, lambdas and inner functions are code objects of their own, among the consts:
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    digest.update(repr([i for i in code.co_consts if not isinstance(i, CodeType)]).encode())
+    for i in code.co_consts:
+        if isinstance(i, CodeType):
+            _hash_code(digest, i)
+
+
+class PersistentCache:
+    # Results of @tkcef.memoize(persist=True) functions, kept in a sqlite file so they outlive the process.
+    #
+    # Every entry is loaded into memory when the cache opens (on a background thread, while the window
+    # starts), so lookups never touch the disk. Writes, and the evictions that keep the file under
+    # 'max_bytes', are queued for the same thread. Keys are hashes of the function's identity (see
+    # function_identity()) and its JSON-encoded arguments. Values are pickled.
+    #
+    # AppManager opens one if given a path. Memoized functions use whichever one is 'active'.
+    active: Union[PersistentCache, None] = None
+
+    path: Path
+    max_bytes: int
+    # How long a lookup waits for the initial load to finish, in seconds:
+    load_timeout: float
+
+    # key -> (pickled value, expires at (time.time()) or None, function identity)
+    entries: OrderedDict[str, tuple[bytes, Union[float, None], str]]
+    size: int
+    loaded: threading.Event
+
+    hits: int
+    misses: int
+    writes: int
+    evictions: int
+    errors: int
+    load_time: float
+
+    _queue: queue.Queue
+    _thread: Union[threading.Thread, None]
+    _lock: threading.Lock
+
+    def __init__(self, path: Union[str, Path], max_bytes: int = 64 * 1024 * 1024, load_timeout: float = 5.0):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.load_timeout = load_timeout
+
+        self.entries = OrderedDict()
+        self.size = 0
+        self.loaded = threading.Event()
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.errors = 0
+        self.load_time = 0.0
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def key_for(cls, identity: str, args: Union[list, tuple], kwargs: dict = None) -> Union[str, None]:
+        # None if the arguments aren't JSON-like:
+        try:
+            encoded = json.dumps([identity, list(args), {} if kwargs is None else kwargs], sort_keys=True)
+        except (TypeError, ValueError):
+            return None
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    def open(self):
+        # Starts loading the file in the background, and makes this the active cache:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="TkcefPersistentCache", daemon=True)
+            self._thread.start()
+        PersistentCache.active = self
+
+    def get(self, key: Union[str, None]) -> tuple[bool, Any]:
+        if key is None or not self.loaded.wait(self.load_timeout):
+            return False, None
+
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.time():
+                self._forget(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return False, None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+
+        self._queue.put(("touch", key))
+        try:
+            return True, pickle.loads(entry[0])
+        except Exception as e:
+            logger.warning(f"Dropping an unreadable persistent cache entry: {e}")
+            with self._lock:
+                self.errors += 1
+                if key in self.entries:
+                    self._forget(key)
+            return False, None
+
+    def put(self, key: Union[str, None], identity: str, value: Any, ttl: float = None):
+        if key is None:
+            return
+        try:
+            blob = pickle.dumps(value)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            return
+
+        expires = None if ttl is None else time.time() + ttl
+        with self._lock:
+            if key in self.entries:
+                self.size -= len(self.entries[key][0])
+            self.entries[key] = (blob, expires, identity)
+            self.entries.move_to_end(key)
+            self.size += len(blob)
+            self._evict_for_space()
+
+        self._queue.put(("put", key, identity, blob, expires))
+
+    def _forget(self, key: str):
+        # Needs '_lock':
+        blob = self.entries.pop(key)[0]
+        self.size -= len(blob)
+        self._queue.put(("delete", key))
+
+    def _evict_for_space(self):
+        # Needs '_lock'. Least recently used first:
+        while self.size > self.max_bytes and len(self.entries) > 0:
+            self._forget(next(iter(self.entries)))
+            self.evictions += 1
+
+    def _run(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path)
+        except Exception as e:
+            logger.error(f"Couldn't open the persistent cache at '{self.path}': {e}")
+            self.loaded.set()
+            return
+
+        try:
+            self._load(connection)
+        finally:
+            self.loaded.set()
+
+        while True:
+            items = [self._queue.get()]
+            # Everything queued since is written in the same transaction:
+            while not self._queue.empty():
+                items.append(self._queue.get())
+
+            stop = None in items
+            try:
+                self._write(connection, [i for i in items if i is not None])
+            except sqlite3.Error as e:
+                logger.error(f"Persistent cache write failed: {e}")
+                with self._lock:
+                    self.errors += 1
+
+            if stop:
+                connection.close()
+                return
+
+    def _load(self, connection: sqlite3.Connection):
+        start = time.perf_counter()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, identity TEXT, value BLOB, expires REAL, last_used REAL)"
+        )
+        connection.execute("DELETE FROM results WHERE expires IS NOT NULL AND expires <= ?", (time.time(),))
+        connection.commit()
+
+        with self._lock:
+            for key, identity, blob, expires in connection.execute(
+                "SELECT key, identity, value, expires FROM results ORDER BY last_used DESC"
+            ):
+                # Anything put() before the load finished is newer:
+                if key in self.entries:
+                    continue
+                self.entries[key] = (blob, expires, identity)
+                self.entries.move_to_end(key, last=False)
+                self.size += len(blob)
+            self._evict_for_space()
+            self.load_time = time.perf_counter() - start
+
+        logger.debug(f"Loaded {len(self.entries)} persistent cache entries in {self.load_time * 1e3:.0f}ms.")
+
+    def _write(self, connection: sqlite3.Connection, items: list[tuple]):
+        now = time.time()
+        writes = 0
+        with connection:
+            for item in items:
+                if item[0] == "put":
+                    _, key, identity, blob, expires = item
+                    connection.execute(
+                        "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)", (key, identity, blob, expires, now)
+                    )
+                    writes += 1
+                elif item[0] == "touch":
+                    connection.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, item[1]))
+                elif item[0] == "delete":
+                    connection.execute("DELETE FROM results WHERE key = ?", (item[1],))
+
+        with self._lock:
+            self.writes += writes
+
+    def invalidate(self, key: str) -> bool:
+        with self._lock:
+            if key not in self.entries:
+                return False
+            self._forget(key)
+            return True
+
+    def invalidate_function(self, identity: str) -> int:
+        # Drops every entry for one function:
+        with self._lock:
+            keys = [key for key, entry in self.entries.items() if entry[2] == identity]
+            for key in keys:
+                self._forget(key)
+            return len(keys)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "path": str(self.path),
+                "loaded": self.loaded.is_set(),
+                "load_time": self.load_time,
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "errors": self.errors,
+                "pending_writes": self._queue.qsize(),
+            }
+
+    def close(self, wait: bool = True):
+        # Finishes the queued writes:
+        if PersistentCache.active is self:
+            PersistentCache.active = None
+        if self._thread is None:
+            return
+
+        self._queue.put(None)
+        if wait:
+            self._thread.join()
+        self._thread = None
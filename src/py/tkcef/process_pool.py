@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Future, ProcessPoolExecutor
+import importlib
+import multiprocessing
+import os
+import threading
+from typing import Any, Callable, Coroutine, Union
+
+from . import logger
+from .lanes import CEF_LANE
+
+
+def cpu_bound(fn: Callable) -> Callable:
+    # Decorator. Calls to the function from the page (`py.call()`, `py.w_call()`) run in a
+    # worker process, instead of holding the GIL away from Tk and CEF's threads:
+    #
+    #   @tkcef.cpu_bound
+    #   def checksum(path): ...
+    #
+    # It has to be importable by name (a module-level function in an exposed module), and its
+    # arguments and return value have to pickle. Calling it from Python still runs it in-process.
+    fn.__tkcef_cpu_bound__ = True
+    # Handing the call off is quick, so it doesn't need to leave the CEF thread:
+    if getattr(fn, "__tkcef_lane__", None) is None:
+        fn.__tkcef_lane__ = CEF_LANE
+
+    ProcessPool.preload_modules.add(fn.__module__)
+    return fn
+
+
+def is_cpu_bound(fn: Any) -> bool:
+    return getattr(fn, "__tkcef_cpu_bound__", False)
+
+
+def _init_worker(modules: tuple[str, ...]):
+    # Runs once in each worker process, so the first call to each function doesn't pay for its import:
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            logger.warning(f"Worker process {os.getpid()} couldn't preload '{name}': {e}")
+
+
+def _warm_up() -> int:
+    return os.getpid()
+
+
+class ProcessPool:
+    # Runs @cpu_bound functions in worker processes, started the first time they're needed
+    # (or by warm_up()). Workers are spawned rather than forked, since forking a process
+    # that's running Tk and CEF threads isn't safe.
+    #
+    # Frozen apps (like main.spec's PyInstaller build) spawn workers by running the exe again,
+    # so the entry point has to call multiprocessing.freeze_support() before anything else
+    # under `if __name__ == "__main__":`, like main.py does. Otherwise every worker starts a
+    # whole new copy of the app.
+    max_workers: int
+    executor: Union[ProcessPoolExecutor, None]
+
+    submitted_count: int
+    completed_count: int
+
+    # Modules with @cpu_bound functions in them, for each worker to import as it starts:
+    preload_modules: set[str] = set()
+
+    _lock: threading.Lock
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers if max_workers is not None else max(1, (os.cpu_count() or 2) - 1)
+        self.executor = None
+
+        self.submitted_count = 0
+        self.completed_count = 0
+
+        self._lock = threading.Lock()
+
+    @property
+    def has_work(self) -> bool:
+        return len(self.preload_modules) > 0
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    self.max_workers,
+                    multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(tuple(sorted(self.preload_modules)),),
+                )
+            return self.executor
+
+    def warm_up(self) -> list[Future]:
+        # Starts every worker now, rather than on the first calls. Doesn't wait for them:
+        executor = self.get_executor()
+        return [executor.submit(_warm_up) for _ in range(self.max_workers)]
+
+    def submit(self, fn: Callable, args: tuple = (), kwargs: dict = None) -> Future:
+        future = self.get_executor().submit(fn, *args, **({} if kwargs is None else kwargs))
+
+        with self._lock:
+            self.submitted_count += 1
+        future.add_done_callback(self._on_done)
+        return future
+
+    def run(self, fn: Callable, args: tuple = (), kwargs: dict = None) -> Coroutine:
+        # Submits the call now, and returns a coroutine to await its result with:
+        return self._await(self.submit(fn, args, kwargs))
+
+    async def _await(self, future: Future) -> Any:
+        # Cancelling this (I.E, the page aborting the call) drops the call if it hasn't started yet:
+        return await asyncio.wrap_future(future)
+
+    def _on_done(self, future: Future):
+        with self._lock:
+            self.completed_count += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "started": self.executor is not None,
+                "submitted": self.submitted_count,
+                "completed": self.completed_count,
+                "pending": self.submitted_count - self.completed_count,
+            }
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from concurrent.futures import Future
+from contextvars import ContextVar
+import threading
+import time
+from typing import Union
+
+
+class CallCancelledException(Exception):
+    call: PyCall
+
+    def __init__(self, call: PyCall):
+        self.call = call
+
+    def __str__(self):
+        reason = "passed its deadline" if self.call.expired else "was cancelled"
+        return f"Call {self.call.call_id} ('{self.call.op}') {reason}."
+
+
+class PyCall:
+    # A call from the page that's queued or running, which the page can cancel.
+    #
+    # Cancelling is cooperative once the call has started: long-running code can check
+    # `tkcef.current_call().cancelled` (or call check()) and stop early. Calls cancelled
+    # (or past their deadline) before they start are dropped without running at all.
+    call_id: str
+    op: str
+    # In seconds since the epoch, like time.time():
+    deadline: Union[float, None]
+    # Where it runs (see lanes.py), and when it was handed to that lane (time.monotonic()):
+    lane: Union[str, None]
+    dispatched: float
+
+    # Whatever's running or queueing the call, to be cancelled along with it:
+    future: Union[Future, None]
+    # (MemoCache, key, Future) if the call is working out a @memoize'd result that other calls
+    # are waiting on (see PyScopeManager.cached_result()):
+    memo_claim: Union[tuple, None]
+
+    _cancelled: bool
+    _lock: threading.Lock
+
+    def __init__(self, call_id: str, op: str, deadline: float = None):
+        self.call_id = call_id
+        self.op = op
+        self.deadline = deadline
+        self.lane = None
+        self.dispatched = time.monotonic()
+        self.future = None
+        self.memo_claim = None
+
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.time() > self.deadline
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled or self.expired
+
+    def check(self):
+        # Raises a CallCancelledException if the call's been cancelled.
+        if self.cancelled:
+            raise CallCancelledException(self)
+
+    def set_future(self, future: Future):
+        with self._lock:
+            self.future = future
+            if self._cancelled:
+                future.cancel()
+
+    def cancel(self):
+        with self._lock:
+            self._cancelled = True
+            if self.future is not None:
+                self.future.cancel()
+
+
+_current_call: ContextVar[Union[PyCall, None]] = ContextVar("tkcef_current_call", default=None)
+
+
+def current_call() -> Union[PyCall, None]:
+    # The page call that the code calling this is running for, or None outside of one.
+    return _current_call.get()
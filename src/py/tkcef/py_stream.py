@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import inspect
+import threading
+from typing import Any, AsyncIterator, Iterator, Union
+
+
+class PyStreamClosedException(Exception):
+    stream_id: str
+
+    def __init__(self, stream_id: str):
+        self.stream_id = stream_id
+
+    def __str__(self):
+        return f"Stream '{self.stream_id}' is closed, or never existed."
+
+
+class PyStream:
+    # A generator (or async generator) returned to the page, which reads it a chunk at a time.
+    #
+    # The generator only advances when the page asks for the next chunk, so a slow reader
+    # holds the producer back instead of letting results pile up. The page reads at most one
+    # chunk ahead of what it's consumed (see PyStream in pyscope_preload.ts).
+    stream_id: str
+    source: Union[Iterator, AsyncIterator]
+    is_async: bool
+    done: bool
+
+    # Sync generators are advanced on worker threads, one request at a time:
+    _lock: threading.Lock
+
+    def __init__(self, stream_id: str, source: Union[Iterator, AsyncIterator]):
+        self.stream_id = stream_id
+        self.source = source
+        self.is_async = inspect.isasyncgen(source)
+        self.done = False
+
+        self._lock = threading.Lock()
+
+    @classmethod
+    def is_stream_source(cls, obj: Any) -> bool:
+        return inspect.isgenerator(obj) or inspect.isasyncgen(obj)
+
+    def handle(self, chunk_size: int) -> dict:
+        # What the page gets in place of the generator:
+        return {"__py_stream__": self.stream_id, "chunk_size": chunk_size}
+
+    def next_chunk(self, count: int) -> dict:
+        items = []
+        with self._lock:
+            if not self.done:
+                for item in self.source:
+                    items.append(item)
+                    if len(items) >= count:
+                        break
+                else:
+                    self.done = True
+
+        return {"items": items, "done": self.done}
+
+    async def anext_chunk(self, count: int) -> dict:
+        items = []
+        if not self.done:
+            async for item in self.source:
+                items.append(item)
+                if len(items) >= count:
+                    break
+            else:
+                self.done = True
+
+        return {"items": items, "done": self.done}
+
+    def close(self):
+        # Sync generators are closed here. Async ones return the coroutine that closes them,
+        # to be run on the async loop:
+        self.done = True
+        if self.is_async:
+            return self.source.aclose()
+
+        with self._lock:
+            self.source.close()
+        return None
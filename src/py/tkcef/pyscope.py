@@ -1,15 +1,53 @@
 from __future__ import annotations
 
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import Future
+import inspect
+import itertools
 from pathlib import Path
-import traceback
 import threading
+import time
+import traceback
+from typing import Any, Callable, Union
 
 from cefpython3 import cefpython as cef
 
 from util import anon_func as af
+from . import logger
 from .js_preload import JsPreloadScript
 from .browser_namespace import BrowserNamespaceWrapper
 from .js_object import JsObjectManager, JsObject
+from .worker_pool import WorkerPool, WorkerPoolFullException
+from .async_loop import AsyncLoopThread
+from .py_stream import PyStream, PyStreamClosedException
+from .py_call import PyCall, CallCancelledException, _current_call
+from .process_pool import ProcessPool, is_cpu_bound
+from .memoize import MemoizedFunction, call_unmemoized, make_key
+from .lanes import CEF_LANE, TK_LANE, WORKER_LANE, LANES, LaneStats, check_lane
+
+
+class UnknownOpException(Exception):
+    op: str
+
+    def __init__(self, op: str):
+        self.op = op
+
+    def __str__(self):
+        return f"There is no PyScope op named '{self.op}'. Did you forget to register_op() it?"
+
+
+class PyScopeOp:
+    fn: Callable[[dict], Any]
+    lane: str
+    # Ops that run the namespace's code take the lane of the function they call,
+    # or the namespace's lane, before their own:
+    uses_namespace_lane: bool
+
+    def __init__(self, fn: Callable[[dict], Any], lane: str = CEF_LANE, uses_namespace_lane: bool = False):
+        self.fn = fn
+        self.lane = check_lane(lane)
+        self.uses_namespace_lane = uses_namespace_lane
 
 
 class PyScopeManager:
@@ -20,321 +58,790 @@ class PyScopeManager:
     js_preload: JsPreloadScript
     js_object_manager: JsObjectManager
 
-    def __init__(self, js_object_manager: JsObjectManager = None):
+    # What the page can ask for, by name. Each op runs on a lane (see lanes.py): the CEF thread
+    # the page called in on, Tk's main thread (through 'tk_queue'), or the worker pool:
+    ops: dict[str, PyScopeOp]
+    worker_pool: WorkerPool
+    # Like App.queue_update_action(). WebApp sets it to its own. Without one, Tk-lane calls run
+    # on the CEF thread instead:
+    tk_queue: Union[Callable, None]
+    # Time spent on each lane. CEF-lane calls slower than 'cef_lane_budget' (in seconds) are logged:
+    lanes: dict[str, LaneStats]
+    cef_lane_budget: float = 0.05
+    # Ops that return coroutines (like calls to `async def` functions) finish on this loop.
+    # WebApp shares its AppManager's. Without one, the manager starts its own when needed:
+    async_loop: AsyncLoopThread
+    _owns_async_loop: bool
+    # @cpu_bound functions the page calls run here. Like 'async_loop', WebApp shares its AppManager's:
+    process_pool: ProcessPool
+    _owns_process_pool: bool
+
+    # Generators returned to the page, by stream id. A page reads 'stream_chunk_size' items per
+    # crossing, and at most 'max_streams' can be open at once:
+    streams: OrderedDict[str, PyStream]
+    stream_chunk_size: int = 64
+    max_streams: int = 256
+    _stream_counter: itertools.count
+    _streams_lock: threading.Lock
+
+    # Calls from the page that are queued or running, by call id, so they can be cancelled:
+    calls: dict[str, PyCall]
+
+    # Variables the page caches (see `PyScope.get_var(name, true)`), as namespace name -> variable
+    # names. When set_var() or del_var() change one, its new value goes to 'var_changed_fn', so the
+    # page's copy never goes stale. Each change gets the next 'var_version', so the page can tell a
+    # push from a read it made before it. Set by the page, through append_callback():
+    watched: dict[str, set[str]]
+    var_version: int
+    var_changed_fn: Union[cef.JavascriptCallback, None] = None
+    _watch_lock: threading.Lock
+
+    # Owns the namespaces the current page creates. A new one is made for each page load,
+    # so a page's namespaces can be evicted once it's gone, even if it never destroyed them:
+    page_owner: str
+    _page_counter: itertools.count
+
+    def __init__(
+        self,
+        js_object_manager: JsObjectManager = None,
+        *,
+        max_workers: int = 8,
+        max_queue_depth: int = 256,
+        serialize_namespaces: bool = True,
+        async_loop: AsyncLoopThread = None,
+        process_pool: ProcessPool = None,
+    ):
         self.js_object_manager = js_object_manager
+        self.async_loop = async_loop
+        self._owns_async_loop = False
+        self.process_pool = process_pool
+        self._owns_process_pool = False
 
         self.js_preload = JsPreloadScript.new_from_file_path(
             Path(__file__).parent.joinpath("js/pyscope_preload.js")
         )
 
-    def config_in_browser(self, browser: cef.PyBrowser):
-        self.js_preload.run(browser)
-
-    def make_w_args(self, do_auto_convert: bool, args: list) -> list:
-        retVal = []
-
-        for i in args:
-            new_obj = self.js_object_manager.from_id(i)
-
-            if do_auto_convert and new_obj.js_type in self.auto_convert_types:
-                retVal.append(new_obj.py())
-            else:
-                retVal.append(new_obj)
-
-        return retVal
-
-    def make_w_kwargs(self, do_auto_convert: bool, kwargs: dict) -> dict:
-        retVal = {}
+        self.worker_pool = WorkerPool(
+            max_workers,
+            max_queue_depth,
+            serialize_namespaces=serialize_namespaces,
+            thread_name_prefix="PyScopeWorker",
+        )
 
-        for key, value in kwargs.items():
-            new_obj = self.js_object_manager.from_id(value)
+        self._page_counter = itertools.count()
+        self.page_owner = self._new_page_owner()
+
+        self.tk_queue = None
+        self.lanes = {lane: LaneStats(lane) for lane in LANES}
+
+        self.calls = {}
+        self.watched = {}
+        self.var_version = 0
+        self._watch_lock = threading.Lock()
+        self.streams = OrderedDict()
+        self._stream_counter = itertools.count()
+        self._streams_lock = threading.Lock()
+
+        self.ops = {}
+        for name, fn, lane, uses_namespace_lane in (
+            ("create", self.create, CEF_LANE, False),
+            ("destroy", self.destroy, CEF_LANE, False),
+            ("exec", self.exec, WORKER_LANE, True),
+            ("w_exec", self.w_exec, WORKER_LANE, True),
+            ("do_func", self.do_func, WORKER_LANE, True),
+            ("w_do_func", self.w_do_func, WORKER_LANE, True),
+            ("make_func", self.make_func, CEF_LANE, False),
+            ("get_var", self.get_var, CEF_LANE, False),
+            ("has_var", self.has_var, CEF_LANE, False),
+            ("del_var", self.del_var, CEF_LANE, False),
+            ("set_var", self.set_var, CEF_LANE, False),
+            ("watch_var", self.watch_var, CEF_LANE, False),
+            ("unwatch_var", self.unwatch_var, CEF_LANE, False),
+            ("call", self.raw_call, WORKER_LANE, True),
+            ("w_call", self.w_call, WORKER_LANE, True),
+            ("batch", self.batch, CEF_LANE, False),
+            ("stream_next", self.stream_next, WORKER_LANE, False),
+            ("stream_close", self.stream_close, WORKER_LANE, False),
+        ):
+            self.register_op(name, fn, lane, uses_namespace_lane)
+
+    def _new_page_owner(self) -> str:
+        return f"{type(self).__name__}-{id(self):x}-page{next(self._page_counter)}"
 
-            if do_auto_convert and new_obj.js_type in self.auto_convert_types:
-                retVal[key] = new_obj.py()
-            else:
-                retVal[key] = new_obj
+    def config_in_browser(self, browser: cef.PyBrowser):
+        # A new page has loaded. Anything the last one left behind is orphaned:
+        self.unwatch_vars()
+        BrowserNamespaceWrapper.evict_owner(self.page_owner)
+        self.page_owner = self._new_page_owner()
+        self.close_streams()
+        self.cancel_calls()
 
-        return retVal
+        self.js_preload.run(browser)
 
-    def create(
-        self, call_id: str, complete_callback: cef.JavascriptCallback, kwargs: dict
+    def append_callback(self, name: str, callback: cef.JavascriptCallback):
+        logger.debug(f"Binding cef.JavascriptCallback '{name}' to PyScopeManager instance...")
+        setattr(self, name, callback)
+
+    def get_async_loop(self) -> AsyncLoopThread:
+        if self.async_loop is None:
+            self.async_loop = AsyncLoopThread("PyScopeAsyncLoop")
+            self._owns_async_loop = True
+        return self.async_loop
+
+    def get_process_pool(self) -> ProcessPool:
+        if self.process_pool is None:
+            self.process_pool = ProcessPool()
+            self._owns_process_pool = True
+        return self.process_pool
+
+    def shutdown(self, wait: bool = False):
+        self.worker_pool.shutdown(wait)
+        self.close_streams()
+        if self._owns_async_loop:
+            self.async_loop.stop(wait)
+        if self._owns_process_pool:
+            self.process_pool.shutdown(wait)
+        self.unwatch_vars()
+        BrowserNamespaceWrapper.evict_owner(self.page_owner)
+
+    def register_op(
+        self,
+        name: str,
+        fn: Callable[[dict], Any],
+        lane: str = CEF_LANE,
+        uses_namespace_lane: bool = False,
     ):
-        retVal = {"result": None, "error": None}
-        try:
-
-            if not kwargs["allow_new"]:
-                # Making sure the namespace exists, and triggers an error if not:
-                scope = BrowserNamespaceWrapper.namespaces[kwargs["id"]]
-                retVal["result"] = {"name": scope.name, "is_new": False}
-
-            elif "id" in kwargs and kwargs["id"] is not None:
-                will_create = BrowserNamespaceWrapper.namespace_exists(kwargs["id"])
-
-                retVal["result"] = {
-                    "name": BrowserNamespaceWrapper.create_namespace_if_dne(
-                        kwargs["id"]
-                    ),
-                    "is_new": will_create,
-                }
-            else:
-                retVal["result"] = {
-                    "name": BrowserNamespaceWrapper.create_new_namespace(),
-                    "is_new": True,
-                }
-
-        except Exception as e:
-            retVal["error"] = {
-                "message": str(e),
-                "name": type(e).__name__,
-                "stack": traceback.format_exc(),
-            }
-
-        complete_callback.Call(call_id, retVal)
-
-    def destroy(
-        self, call_id: str, complete_callback: cef.JavascriptCallback, kwargs: dict
+        # Makes 'fn' callable from the page, as `py.op(name, kwargs)` or inside `py.batch()`.
+        # It's given the op's kwargs (with the calling scope's "id"), and its return value
+        # goes back to the page. It runs on 'lane', unless 'uses_namespace_lane' is set and
+        # the calling scope's namespace (or the function named by "name") has a lane of its own.
+        self.ops[name] = PyScopeOp(fn, lane, uses_namespace_lane)
+
+    def unregister_op(self, name: str):
+        del self.ops[name]
+
+    def dispatch(
+        self,
+        call_id: str,
+        complete_callback: cef.JavascriptCallback,
+        op: str,
+        kwargs: dict,
     ):
+        # The one entry point the page calls into, for every op.
+        call = PyCall(call_id, op, kwargs.pop("__deadline__", None))
+        if call.expired:
+            # It's too late. The page has already given up on it:
+            self.release_w_args(op, kwargs)
+            return
+        self.calls[call_id] = call
+
+        # Cached results go straight back, without waiting on a lane. So do ones being worked out
+        # for an identical call, once it's done:
+        hit, value = self.cached_result(call, op, kwargs)
+        if hit:
+            call.lane = CEF_LANE
+            self.finish_call(call_id, call, complete_callback, {"result": value, "error": None})
+            return
+        if isinstance(value, Future):
+            call.lane = CEF_LANE
+            value.add_done_callback(lambda f: self.finish_coalesced(f, call_id, complete_callback, op, kwargs))
+            return
+
+        self.route(call_id, complete_callback, op, kwargs)
+
+    def route(self, call_id: str, complete_callback: cef.JavascriptCallback, op: str, kwargs: dict):
+        call = self.calls.get(call_id)
+        if call is None:
+            # The page it was for is gone:
+            return
+
+        call.lane = self.lane_for(op, kwargs)
+        if call.lane == WORKER_LANE:
+            self.run_in_pool(call_id, complete_callback, op, kwargs)
+        elif call.lane == TK_LANE:
+            self.run_on_tk(call_id, complete_callback, op, kwargs)
+        else:
+            self.complete_op(call_id, complete_callback, op, kwargs)
+
+    def lane_for(self, op: str, kwargs: dict) -> str:
+        if op == "batch":
+            # A batch runs on one lane: Tk's if any of its ops need it, else the pool if any might block:
+            lanes = set(self.lane_for(i, j) for i, j in kwargs["ops"])
+            for lane in (TK_LANE, WORKER_LANE):
+                if lane in lanes:
+                    return lane
+            return CEF_LANE
+
+        if op not in self.ops:
+            # run_op() reports it:
+            return CEF_LANE
+
+        scope_op = self.ops[op]
+        if scope_op.uses_namespace_lane:
+            ns = BrowserNamespaceWrapper.namespaces.get(kwargs.get("id"))
+            lane = None if ns is None else ns.lane_for(kwargs.get("name"))
+            if lane is not None:
+                return lane
+        return scope_op.lane
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "lanes": {lane: i.stats() for lane, i in self.lanes.items()},
+            "worker_pool": self.worker_pool.stats(),
+            "in_flight": len(self.calls),
+        }
+
+    def run_op(self, op: str, kwargs: dict) -> dict:
         retVal = {"result": None, "error": None}
         try:
-
-            retVal["result"] = BrowserNamespaceWrapper.remove_namespace(kwargs["id"])
+            if op not in self.ops:
+                raise UnknownOpException(op)
+            retVal["result"] = self.ops[op].fn(kwargs)
 
         except Exception as e:
-            retVal["error"] = {
-                "message": str(e),
-                "name": type(e).__name__,
-                "stack": traceback.format_exc(),
-            }
+            retVal["error"] = self.make_error(e)
 
-        complete_callback.Call(call_id, retVal)
+        return retVal
 
-    def exec(
-        self, call_id: str, complete_callback: cef.JavascriptCallback, kwargs: dict
+    def complete_op(
+        self,
+        call_id: str,
+        complete_callback: cef.JavascriptCallback,
+        op: str,
+        kwargs: dict,
     ):
-        retVal = {"result": None, "error": None}
+        call = self.calls.get(call_id)
+        if call is not None and call.cancelled:
+            # Cancelled (or past its deadline) while it was queued, so it's dropped without running:
+            self.forget_call(call_id, call)
+            self.release_w_args(op, kwargs)
+            return
+
+        started = time.monotonic()
+        token = _current_call.set(call)
         try:
-            ns = BrowserNamespaceWrapper.namespaces[kwargs["id"]]
-            retVal["result"] = ns.exec(
-                kwargs["code"],
-                kwargs["ret_name"],
-                kwargs["params"],
-            )
-        except Exception as e:
-            retVal["error"] = {
-                "message": str(e),
-                "name": type(e).__name__,
-                "stack": traceback.format_exc(),
-            }
-
-        complete_callback.Call(call_id, retVal)
+            outcome = self.run_op(op, kwargs)
+        finally:
+            _current_call.reset(token)
+        if call is not None:
+            self.record_lane_time(call, op, started)
+        outcomes = outcome["result"] if op == "batch" and outcome["error"] is None else [outcome]
+
+        # Generators are handed to the page as streams, to be read a chunk at a time:
+        for i in outcomes:
+            i["result"] = self.wrap_result(i["result"])
+
+        # Coroutine results are awaited on the async loop, and the page hears back once they're done:
+        pending = [i for i in outcomes if inspect.isawaitable(i["result"])]
+        if len(pending) == 0:
+            self.finish_call(call_id, call, complete_callback, outcome)
+            return
 
-    def w_exec_runner(self, *args, **kwargs):
-        thread = threading.Thread(None, self.w_exec, args=args, kwargs=kwargs)
-        thread.start()
-
-    def w_exec(
-        self, call_id: str, complete_callback: cef.JavascriptCallback, kwargs: dict
-    ):
-        retVal = {"result": None, "error": None}
         try:
-            ns = BrowserNamespaceWrapper.namespaces[kwargs["id"]]
-            retVal["result"] = ns.exec(
-                kwargs["code"],
-                kwargs["ret_name"],
-                self.make_w_kwargs(kwargs["do_auto_convert"], kwargs["params"]),
+            future = self.get_async_loop().submit(self.await_outcomes(pending, call))
+        except RuntimeError as e:
+            for i in pending:
+                self.close_awaitable(i["result"])
+                i["result"], i["error"] = None, self.make_error(e)
+            self.finish_call(call_id, call, complete_callback, outcome)
+            return
+
+        if call is not None:
+            call.set_future(future)
+        future.add_done_callback(lambda _: self.finish_call(call_id, call, complete_callback, outcome))
+
+    def record_lane_time(self, call: PyCall, op: str, started: float):
+        busy = time.monotonic() - started
+        on_cef = call.lane == CEF_LANE
+        self.lanes[call.lane].record(started - call.dispatched, busy, self.cef_lane_budget if on_cef else None)
+
+        if on_cef and busy > self.cef_lane_budget:
+            logger.warning(
+                f"'{op}' held up the CEF thread for {busy * 1e3:.0f}ms. Slow functions belong on the"
+                f" worker lane (see tkcef.run_on())."
             )
-        except Exception as e:
-            retVal["error"] = {
-                "message": str(e),
-                "name": type(e).__name__,
-                "stack": traceback.format_exc(),
-            }
-
-        complete_callback.Call(call_id, retVal)
 
-    def do_func(
-        self, call_id: str, complete_callback: cef.JavascriptCallback, kwargs: dict
+    def finish_call(
+        self,
+        call_id: str,
+        call: Union[PyCall, None],
+        complete_callback: cef.JavascriptCallback,
+        outcome: dict,
     ):
-        retVal = {"result": None, "error": None}
+        self.forget_call(call_id, call)
+        complete_callback.Call(call_id, outcome)
+
+    def forget_call(self, call_id: str, call: PyCall):
+        if call is not None and call.memo_claim is not None:
+            # If it never got as far as working its result out, the calls waiting on it run on their own:
+            cache, key, future = call.memo_claim
+            call.memo_claim = None
+            cache.finish(key, future, error=CallCancelledException(call))
+
+        # Only if it's still the same call. Ids get reused by the next page:
+        if self.calls.get(call_id) is call:
+            self.calls.pop(call_id, None)
+
+    def cancel(self, call_id: str) -> bool:
+        # The page gave up on the call (I.E, its AbortSignal fired, or it timed out):
+        call = self.calls.get(call_id)
+        if call is None:
+            return False
+
+        call.cancel()
+        return True
+
+    async def await_outcomes(self, outcomes: list[dict], call: PyCall = None):
+        await asyncio.gather(*(self.await_outcome(i, call) for i in outcomes))
+
+    async def await_outcome(self, outcome: dict, call: PyCall = None):
+        # Each of these runs as its own task, so this only applies to this outcome's coroutine:
+        _current_call.set(call)
         try:
-            ns = BrowserNamespaceWrapper.namespaces[kwargs["id"]]
-            retVal["result"] = ns.do_func(
-                kwargs["code"],
-                kwargs["params"],
-            )
-        except Exception as e:
-            retVal["error"] = {
-                "message": str(e),
-                "name": type(e).__name__,
-                "stack": traceback.format_exc(),
-            }
-
-        complete_callback.Call(call_id, retVal)
-
-    def w_do_func_runner(self, *args, **kwargs):
-        thread = threading.Thread(None, self.w_do_func, args=args, kwargs=kwargs)
-        thread.start()
-
-    def w_do_func(
-        self, call_id: str, complete_callback: cef.JavascriptCallback, kwargs: dict
+            outcome["result"] = self.wrap_result(await outcome["result"])
+        except BaseException as e:
+            outcome["result"] = None
+            outcome["error"] = self.make_error(e)
+            if not isinstance(e, Exception):
+                raise
+
+    def wrap_result(self, result: Any) -> Any:
+        if not PyStream.is_stream_source(result):
+            return result
+
+        with self._streams_lock:
+            stream = PyStream(f"pystream{next(self._stream_counter)}", result)
+            self.streams[stream.stream_id] = stream
+
+            # Streams the page never finished or closed are dropped, oldest first:
+            while len(self.streams) > self.max_streams:
+                _, oldest = self.streams.popitem(last=False)
+                self.close_stream(oldest)
+
+        return stream.handle(self.stream_chunk_size)
+
+    def close_stream(self, stream: PyStream):
+        closing = stream.close()
+        if closing is not None:
+            try:
+                self.get_async_loop().submit(closing)
+            except RuntimeError:
+                pass
+
+    def cancel_calls(self):
+        # The page these calls were for is gone (and the next one reuses call ids):
+        calls = list(self.calls.values())
+        self.calls.clear()
+        for i in calls:
+            i.cancel()
+
+    def close_streams(self):
+        with self._streams_lock:
+            streams = list(self.streams.values())
+            self.streams.clear()
+
+        for i in streams:
+            self.close_stream(i)
+
+    def close_awaitable(self, awaitable: Any):
+        # Keeps coroutines that will never run from warning that they were never awaited:
+        if inspect.iscoroutine(awaitable):
+            awaitable.close()
+
+    def make_error(self, e: BaseException) -> dict:
+        return {
+            "message": str(e),
+            "name": type(e).__name__,
+            "stack": traceback.format_exc(),
+        }
+
+    def run_in_pool(
+        self,
+        call_id: str,
+        complete_callback: cef.JavascriptCallback,
+        op: str,
+        kwargs: dict,
     ):
-        retVal = {"result": None, "error": None}
+        call = self.calls.get(call_id)
         try:
-            ns = BrowserNamespaceWrapper.namespaces[kwargs["id"]]
-            retVal["result"] = ns.do_func(
-                kwargs["code"],
-                self.make_w_kwargs(kwargs["do_auto_convert"], kwargs["params"]),
+            future = self.worker_pool.submit(
+                self.complete_op, call_id, complete_callback, op, kwargs, namespace=self.serial_key(op, kwargs)
             )
-        except Exception as e:
-            retVal["error"] = {
-                "message": str(e),
-                "name": type(e).__name__,
-                "stack": traceback.format_exc(),
-            }
+        except (WorkerPoolFullException, RuntimeError) as e:
+            # Rejected calls fail right away on the JS side, rather than piling up:
+            self.release_w_args(op, kwargs)
+            self.finish_call(call_id, call, complete_callback, {"result": None, "error": self.make_error(e)})
+            return
+
+        self.watch_future(call_id, call, future, op, kwargs)
+
+    def serial_key(self, op: str, kwargs: dict) -> Union[str, None]:
+        # With 'serialize_namespaces', pool calls into the same namespace run in order, one at a time,
+        # like they would on the CEF thread. Unless the namespace, or the function called, opts out
+        # (see tkcef.run_concurrently). A batch counts as one call, in its namespace if all of its ops that
+        # have one share it:
+        if op == "batch":
+            keys = set(self.serial_key(i, j) for i, j in kwargs["ops"]) - {None}
+            return keys.pop() if len(keys) == 1 else None
+
+        if op not in self.ops or not self.ops[op].uses_namespace_lane:
+            return None
+        ns = BrowserNamespaceWrapper.namespaces.get(kwargs.get("id"))
+        if ns is None or ns.concurrent_for(kwargs.get("name")):
+            return None
+        return ns.name
+
+    def run_on_tk(
+        self,
+        call_id: str,
+        complete_callback: cef.JavascriptCallback,
+        op: str,
+        kwargs: dict,
+    ):
+        if self.tk_queue is None:
+            self.complete_op(call_id, complete_callback, op, kwargs)
+            return
+
+        future = Future()
+        self.tk_queue(self.run_queued, future, call_id, complete_callback, op, kwargs)
+        self.watch_future(call_id, self.calls.get(call_id), future, op, kwargs)
+
+    def run_queued(self, future: Future, *args):
+        # Calls cancelled while they waited for Tk's main thread are skipped:
+        if future.set_running_or_notify_cancel():
+            self.complete_op(*args)
+            future.set_result(None)
+
+    def watch_future(self, call_id: str, call: Union[PyCall, None], future: Future, op: str, kwargs: dict):
+        # Cancelling the call before its lane picks it up drops it from the queue:
+        if call is not None:
+            call.set_future(future)
+        future.add_done_callback(lambda f: self.drop_queued(call_id, call, op, kwargs) if f.cancelled() else None)
+
+    def drop_queued(self, call_id: str, call: Union[PyCall, None], op: str, kwargs: dict):
+        if call is not None:
+            self.forget_call(call_id, call)
+        self.release_w_args(op, kwargs)
+
+    def release_w_args(self, op: str, kwargs: dict):
+        # The page stores the objects behind a w_* op's arguments before it sends the op. If the op is
+        # dropped without running, nothing ever wraps them in JsObjects, so they're released here:
+        if self.js_object_manager is None:
+            return
+
+        if op == "batch":
+            for i, j in kwargs.get("ops", ()):
+                self.release_w_args(i, j)
+            return
+        if op == "w_call":
+            tagged = list(kwargs.get("args", ())) + list(kwargs.get("kwargs", {}).values())
+        elif op in ("w_exec", "w_do_func"):
+            tagged = list(kwargs.get("params", {}).values())
+        else:
+            return
+
+        for i in tagged:
+            if isinstance(i, (list, tuple)) and len(i) > 1 and i[1] is not None:
+                self.js_object_manager.release(i[1])
+
+    def make_w_arg(self, do_auto_convert: bool, arg: list) -> Any:
+        # The page sends [typeof, id] for stored objects, and [typeof, None, value] for primitives
+        # it's already auto-converted. Either way, the type comes along, so it never has to be asked for.
+        js_type, object_id = arg[0], arg[1]
+        if object_id is None:
+            return arg[2]
+
+        new_obj = self.js_object_manager.from_id(object_id, js_type=js_type)
+        if do_auto_convert and js_type in self.auto_convert_types:
+            return new_obj.py()
+        return new_obj
 
-        complete_callback.Call(call_id, retVal)
+    def make_w_args(self, do_auto_convert: bool, args: list) -> list:
+        return [self.make_w_arg(do_auto_convert, i) for i in args]
 
-    def make_func(
-        self, call_id: str, complete_callback: cef.JavascriptCallback, kwargs: dict
-    ):
-        retVal = {"result": None, "error": None}
-        try:
-            ns = BrowserNamespaceWrapper.namespaces[kwargs["id"]]
-            retVal["result"] = ns.make_func(
-                kwargs["name"],
-                kwargs["code"],
-                kwargs["params"],
-            )
-        except Exception as e:
-            retVal["error"] = {
-                "message": str(e),
-                "name": type(e).__name__,
-                "stack": traceback.format_exc(),
+    def make_w_kwargs(self, do_auto_convert: bool, kwargs: dict) -> dict:
+        return {key: self.make_w_arg(do_auto_convert, value) for key, value in kwargs.items()}
+
+    # Ops:
+    def create(self, kwargs: dict):
+        if not kwargs["allow_new"]:
+            # Making sure the namespace exists, and triggers an error if not:
+            scope = BrowserNamespaceWrapper.get_namespace(kwargs["id"])
+            return {"name": scope.name, "is_new": False}
+
+        elif "id" in kwargs and kwargs["id"] is not None:
+            will_create = not BrowserNamespaceWrapper.namespace_exists(kwargs["id"])
+
+            # Namespaces the page names itself aren't owned by it, so they outlive a reload,
+            # for the next page to pick up again. Only the anonymous ones below are evicted with it:
+            return {
+                "name": BrowserNamespaceWrapper.create_namespace_if_dne(kwargs["id"]),
+                "is_new": will_create,
             }
 
-        complete_callback.Call(call_id, retVal)
+        return {
+            "name": BrowserNamespaceWrapper.create_new_namespace(owner=self.page_owner),
+            "is_new": True,
+        }
 
-    def get_var(
-        self, call_id: str, complete_callback: cef.JavascriptCallback, kwargs: dict
-    ):
-        retVal = {"result": None, "error": None}
-        try:
-            ns = BrowserNamespaceWrapper.namespaces[kwargs["id"]]
-            retVal["result"] = ns.get_var(
-                kwargs["name"],
-            )
-        except Exception as e:
-            retVal["error"] = {
-                "message": str(e),
-                "name": type(e).__name__,
-                "stack": traceback.format_exc(),
-            }
+    def destroy(self, kwargs: dict):
+        return BrowserNamespaceWrapper.remove_namespace(kwargs["id"])
 
-        complete_callback.Call(call_id, retVal)
+    def exec(self, kwargs: dict):
+        ns = BrowserNamespaceWrapper.get_namespace(kwargs["id"])
+        return ns.exec(
+            kwargs["code"],
+            kwargs["ret_name"],
+            kwargs["params"],
+        )
 
-    def has_var(
-        self, call_id: str, complete_callback: cef.JavascriptCallback, kwargs: dict
-    ):
-        retVal = {"result": None, "error": None}
-        try:
-            ns = BrowserNamespaceWrapper.namespaces[kwargs["id"]]
-            retVal["result"] = ns.has_var(
-                kwargs["name"],
-            )
-        except Exception as e:
-            retVal["error"] = {
-                "message": str(e),
-                "name": type(e).__name__,
-                "stack": traceback.format_exc(),
-            }
+    def w_exec(self, kwargs: dict):
+        # Wrapped first, so the page's stored arguments are released even if the namespace is gone:
+        params = self.make_w_kwargs(kwargs["do_auto_convert"], kwargs["params"])
+        ns = BrowserNamespaceWrapper.get_namespace(kwargs["id"])
+        return ns.exec(
+            kwargs["code"],
+            kwargs["ret_name"],
+            params,
+        )
 
-        complete_callback.Call(call_id, retVal)
+    def do_func(self, kwargs: dict):
+        ns = BrowserNamespaceWrapper.get_namespace(kwargs["id"])
+        return ns.do_func(
+            kwargs["code"],
+            kwargs["params"],
+        )
 
-    def del_var(
-        self, call_id: str, complete_callback: cef.JavascriptCallback, kwargs: dict
-    ):
-        retVal = {"result": None, "error": None}
-        try:
-            ns = BrowserNamespaceWrapper.namespaces[kwargs["id"]]
-            retVal["result"] = ns.del_var(
-                kwargs["name"],
-                kwargs["value"],
-            )
-        except Exception as e:
-            retVal["error"] = {
-                "message": str(e),
-                "name": type(e).__name__,
-                "stack": traceback.format_exc(),
-            }
+    def w_do_func(self, kwargs: dict):
+        params = self.make_w_kwargs(kwargs["do_auto_convert"], kwargs["params"])
+        ns = BrowserNamespaceWrapper.get_namespace(kwargs["id"])
+        return ns.do_func(
+            kwargs["code"],
+            params,
+        )
 
-        complete_callback.Call(call_id, retVal)
+    def make_func(self, kwargs: dict):
+        ns = BrowserNamespaceWrapper.get_namespace(kwargs["id"])
+        return ns.make_func(
+            kwargs["name"],
+            kwargs["code"],
+            kwargs["params"],
+        )
 
-    def set_var(
-        self, call_id: str, complete_callback: cef.JavascriptCallback, kwargs: dict
-    ):
-        retVal = {"result": None, "error": None}
-        try:
-            ns = BrowserNamespaceWrapper.namespaces[kwargs["id"]]
-            retVal["result"] = ns.set_var(
-                kwargs["name"],
-                kwargs["value"],
-            )
-        except Exception as e:
-            retVal["error"] = {
-                "message": str(e),
-                "name": type(e).__name__,
-                "stack": traceback.format_exc(),
-            }
+    def get_var(self, kwargs: dict):
+        return BrowserNamespaceWrapper.get_namespace(kwargs["id"]).get_var(kwargs["name"])
 
-        complete_callback.Call(call_id, retVal)
+    def has_var(self, kwargs: dict):
+        return BrowserNamespaceWrapper.get_namespace(kwargs["id"]).has_var(kwargs["name"])
 
-    def raw_call_runner(self, *args, **kwargs):
-        thread = threading.Thread(None, self.raw_call, args=args, kwargs=kwargs)
-        thread.start()
+    def del_var(self, kwargs: dict):
+        return BrowserNamespaceWrapper.get_namespace(kwargs["id"]).del_var(kwargs["name"])
 
-    def raw_call(
-        self, call_id: str, complete_callback: cef.JavascriptCallback, params: dict
-    ):
-        retVal = {"result": None, "error": None}
-        try:
-            ns = BrowserNamespaceWrapper.namespaces[params["id"]]
-            retVal["result"] = ns.call(
-                params["name"],
-                params["args"],
-                params["kwargs"],
-            )
-        except Exception as e:
-            retVal["error"] = {
-                "message": str(e),
-                "name": type(e).__name__,
-                "stack": traceback.format_exc(),
+    def set_var(self, kwargs: dict):
+        return BrowserNamespaceWrapper.get_namespace(kwargs["id"]).set_var(
+            kwargs["name"],
+            kwargs["value"],
+        )
+
+    def watch_var(self, kwargs: dict) -> dict:
+        # The variable's current value, for the page to cache. It's sent again whenever it changes:
+        ns = BrowserNamespaceWrapper.get_namespace(kwargs["id"])
+        with self._watch_lock:
+            if ns.name not in self.watched:
+                self.watched[ns.name] = set()
+                ns.watch(self.on_var_changed)
+            self.watched[ns.name].add(kwargs["name"])
+
+            exists = ns.has_var(kwargs["name"])
+            value = ns.get_var(kwargs["name"]) if exists else None
+            cacheable = self.is_cacheable_var(value)
+            return {
+                "exists": exists,
+                "value": value if cacheable else None,
+                "cacheable": cacheable,
+                "version": self.var_version,
             }
 
-        complete_callback.Call(call_id, retVal)
+    def unwatch_var(self, kwargs: dict) -> bool:
+        with self._watch_lock:
+            names = self.watched.get(kwargs["id"])
+            if names is None or kwargs["name"] not in names:
+                return False
+
+            names.discard(kwargs["name"])
+            if len(names) == 0:
+                del self.watched[kwargs["id"]]
+                ns = BrowserNamespaceWrapper.namespaces.get(kwargs["id"])
+                if ns is not None:
+                    ns.unwatch(self.on_var_changed)
+            return True
+
+    def unwatch_vars(self):
+        with self._watch_lock:
+            names = list(self.watched)
+            self.watched.clear()
+            self.var_changed_fn = None
+
+        for name in names:
+            ns = BrowserNamespaceWrapper.namespaces.get(name)
+            if ns is not None:
+                ns.unwatch(self.on_var_changed)
+
+    def is_cacheable_var(self, value: Any) -> bool:
+        # Only values the page gets its own copy of. Anything else (functions, objects) would
+        # come back as a reference, which can't go stale, but can't be replayed either:
+        return make_key([value]) is not None
+
+    def on_var_changed(self, ns: BrowserNamespaceWrapper, attr: Union[str, None]):
+        # A BrowserNamespaceWrapper watcher. 'attr' is None when the whole namespace is gone:
+        with self._watch_lock:
+            names = self.watched.get(ns.name)
+            if names is None or (attr is not None and attr not in names):
+                return
+            if attr is None:
+                del self.watched[ns.name]
+                ns.unwatch(self.on_var_changed)
+
+            self.var_version += 1
+            if self.var_changed_fn is None:
+                return
+
+            message = None
+            if attr is not None:
+                if not ns.has_var(attr):
+                    message = {"exists": False, "value": None}
+                else:
+                    value = ns.get_var(attr)
+                    if self.is_cacheable_var(value):
+                        message = {"exists": True, "value": value}
+            # Sent while holding the lock, so the page gets changes in the order they were made:
+            self.var_changed_fn.Call(ns.name, attr, message, self.var_version)
+
+    def raw_call(self, params: dict):
+        ns = BrowserNamespaceWrapper.get_namespace(params["id"])
+        return self.call_function(
+            ns,
+            params["name"],
+            params["args"],
+            params["kwargs"],
+        )
 
-    def w_call_runner(self, *args, **kwargs):
-        thread = threading.Thread(None, self.w_call, args=args, kwargs=kwargs)
-        thread.start()
+    def w_call(self, params: dict):
+        args = self.make_w_args(params["auto_convert"], params["args"])
+        kwargs = self.make_w_kwargs(params["auto_convert"], params["kwargs"])
 
-    def w_call(
-        self, call_id: str, complete_callback: cef.JavascriptCallback, params: dict
+        ns = BrowserNamespaceWrapper.get_namespace(params["id"])
+        return self.call_function(
+            ns,
+            params["name"],
+            args,
+            kwargs,
+        )
+
+    def call_function(self, ns: BrowserNamespaceWrapper, name: str, args: list, kwargs: dict):
+        fn = ns.get_var(name)
+        memoized = fn if isinstance(fn, MemoizedFunction) else None
+
+        # @cpu_bound functions go to the process pool. The page hears back once they're done,
+        # like it does for coroutines:
+        if is_cpu_bound(fn):
+            if memoized is None:
+                run = lambda *a, **k: self.get_process_pool().run(fn, a, k)
+            else:
+                run = lambda *a, **k: self.get_process_pool().run(call_unmemoized, (memoized, a, k))
+        else:
+            run = fn if memoized is None else memoized.__wrapped__
+
+        if memoized is None:
+            return run(*args, **kwargs)
+        return memoized.call_keyed(make_key(args, kwargs), run, args, kwargs)
+
+    def finish_coalesced(
+        self,
+        future: Future,
+        call_id: str,
+        complete_callback: cef.JavascriptCallback,
+        op: str,
+        kwargs: dict,
     ):
-        retVal = {"result": None, "error": None}
-        try:
-            args = self.make_w_args(params["auto_convert"], params["args"])
-            kwargs = self.make_w_kwargs(params["auto_convert"], params["kwargs"])
-
-            ns = BrowserNamespaceWrapper.namespaces[params["id"]]
-            retVal["result"] = ns.call(
-                params["name"],
-                args,
-                kwargs,
-            )
-        except Exception as e:
-            retVal["error"] = {
-                "message": str(e),
-                "name": type(e).__name__,
-                "stack": traceback.format_exc(),
-            }
+        # If the identical call failed, this one's run on its own, like it would have been:
+        if future.exception() is not None:
+            self.route(call_id, complete_callback, op, kwargs)
+            return
+
+        self.finish_call(
+            call_id, self.calls.get(call_id), complete_callback, {"result": future.result(), "error": None}
+        )
 
-        complete_callback.Call(call_id, retVal)
+    def cached_result(self, call: PyCall, op: str, kwargs: dict) -> tuple[bool, Any]:
+        # Whether a call to a @memoize'd function already has its result cached, without running anything.
+        # If not, but an identical call is being worked out, this returns (False, <its Future>). Otherwise,
+        # 'call' is the one working it out. w_call arguments can only be keyed on if the page sent them all inline:
+        if op not in ("call", "w_call"):
+            return False, None
+
+        ns = BrowserNamespaceWrapper.namespaces.get(kwargs.get("id"))
+        fn = ns.get_var(kwargs["name"]) if ns is not None and ns.has_var(kwargs["name"]) else None
+        if not isinstance(fn, MemoizedFunction):
+            return False, None
+
+        args, fn_kwargs = kwargs["args"], kwargs["kwargs"]
+        if op == "w_call":
+            if any(i[1] is not None for i in args) or any(i[1] is not None for i in fn_kwargs.values()):
+                return False, None
+            args = [i[2] for i in args]
+            fn_kwargs = {key: i[2] for key, i in fn_kwargs.items()}
+
+        key = make_key(args, fn_kwargs)
+        # Only the in-memory cache. Persisted results are looked up on the call's lane, if it runs:
+        hit, value = fn.lookup(key, args, fn_kwargs, count_miss=False, use_persistent=False)
+        if hit or key is None:
+            return hit, value
+
+        future, is_new = fn.cache.claim(key)
+        if not is_new:
+            return False, future
+        call.memo_claim = (fn.cache, key, future)
+        return False, None
+
+    def batch(self, kwargs: dict) -> list[dict]:
+        # Runs a list of [op, kwargs] pairs in order, and returns each one's outcome,
+        # so the page gets every result from one crossing and one callback.
+        return [self.run_op(op, op_kwargs) for op, op_kwargs in kwargs["ops"]]
+
+    def get_stream(self, stream_id: str) -> PyStream:
+        with self._streams_lock:
+            if stream_id not in self.streams:
+                raise PyStreamClosedException(stream_id)
+            return self.streams[stream_id]
+
+    def stream_next(self, kwargs: dict):
+        stream = self.get_stream(kwargs["stream"])
+        count = kwargs.get("count", self.stream_chunk_size)
+
+        if stream.is_async:
+            return self.anext_chunk(stream, count)
+
+        chunk = stream.next_chunk(count)
+        if chunk["done"]:
+            self.forget_stream(stream)
+        return chunk
+
+    async def anext_chunk(self, stream: PyStream, count: int) -> dict:
+        chunk = await stream.anext_chunk(count)
+        if chunk["done"]:
+            self.forget_stream(stream)
+        return chunk
+
+    def forget_stream(self, stream: PyStream):
+        with self._streams_lock:
+            self.streams.pop(stream.stream_id, None)
+
+    def stream_close(self, kwargs: dict):
+        # The page stopped reading early (I.E, a `break` out of `for await`):
+        with self._streams_lock:
+            stream = self.streams.pop(kwargs["stream"], None)
+
+        if stream is None:
+            return None
+        return stream.close()
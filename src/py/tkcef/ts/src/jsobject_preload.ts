@@ -2,17 +2,40 @@ interface ObjectStorage {
     [key: string]: any;
 }
 
+interface BatchOp {
+    op: string;
+    // Where to store the operation's result. null if the result is sent back to Python instead.
+    result_id: string|null;
+    [key: string]: any;
+}
+
 class JsObjectManager {
     storage: ObjectStorage;
+    // Python assigns ids for the results it asks for. Ids made here start with 'js' instead:
+    next_id: number;
+
+    // Functions built from the code strings Python sends, keyed by their parameter names and code.
+    // A Map iterates in insertion order, and hits are moved to the end, so the first key is always
+    // the least recently used one.
+    compiled_cache: Map<string, Function>;
+    compiled_cache_max_size: number;
+    compiled_cache_hits: number;
+    compiled_cache_misses: number;
     
     callback_errors: boolean;
 
     constructor() {
         this.storage = {};
+        this.next_id = 1;
+        this.compiled_cache = new Map();
+        this.compiled_cache_max_size = 512;
+        this.compiled_cache_hits = 0;
+        this.compiled_cache_misses = 0;
         this.callback_errors = true;
         window._py_jsobjectman.append_callback("fadd_fn", this._fadd_fn.bind(this));
         window._py_jsobjectman.append_callback("add_fn", this._add_fn.bind(this));
         window._py_jsobjectman.append_callback("remove_fn", this._remove_fn.bind(this));
+        window._py_jsobjectman.append_callback("remove_many_fn", this._remove_many_fn.bind(this));
         window._py_jsobjectman.append_callback("access_fn", this._access_fn.bind(this));
         window._py_jsobjectman.append_callback("py_fn", this._py_fn.bind(this));
         window._py_jsobjectman.append_callback("get_type_fn", this._get_type_fn.bind(this));
@@ -22,21 +45,34 @@ class JsObjectManager {
         window._py_jsobjectman.append_callback("del_attr_fn", this._del_attr_fn.bind(this));
         window._py_jsobjectman.append_callback("call_fn", this._call_fn.bind(this));
         window._py_jsobjectman.append_callback("call_method_fn", this._call_method_fn.bind(this));
+        window._py_jsobjectman.append_callback("batch_fn", this._batch_fn.bind(this));
+    }
+
+    new_id(): string {
+        return `js${this.next_id++}`;
     }
 
     _make_js_object(item: any): Promise<string> {
-        return new Promise((resolve: any, reject: any) => {
-            window.with_uuid4((uuid: string)=>{
-                this.add(uuid, item);
-                resolve(uuid);
-            });
-        });
+        let item_id = this.new_id();
+        this.add(item_id, item);
+        return Promise.resolve(item_id);
     }
 
     add(item_id: string, item: any) {
         this.storage[item_id] = item;
     }
 
+    // Stores several items in one synchronous step, and returns their new ids in order.
+    add_many(items: any[]): string[] {
+        let item_ids: string[] = [];
+        for (let i = 0; i < items.length; i++) {
+            let item_id = this.new_id();
+            this.storage[item_id] = items[i];
+            item_ids.push(item_id);
+        }
+        return item_ids;
+    }
+
     remove(item_id: string) {
         delete this.storage[item_id];
     }
@@ -106,6 +142,36 @@ class JsObjectManager {
         );
     }
 
+    // Rebuilds a structure marshalled by JsObjectManager.marshal() in Python.
+    unmarshal(node: any[]): any {
+        switch (node[0]) {
+            case "v":
+                return node[1];
+            case "r":
+                return this.get(node[1]);
+            case "l":
+                return node[1].map((item: any[]) => this.unmarshal(item));
+            case "d":
+                let retVal: any = {};
+                for (let i = 0; i < node[1].length; i++) {
+                    retVal[this.unmarshal(node[1][i])] = this.unmarshal(node[2][i]);
+                }
+                return retVal;
+            case "u":
+                return undefined;
+        }
+        throw new Error(`Unknown marshalled node '${node[0]}'.`);
+    }
+
+    // 'items' can be a list or an object. 'marshalled' lists the indexes/keys to unmarshal.
+    unmarshal_items_in_place(items: any, marshalled: any[]): any {
+        for (let i = 0; i < marshalled.length; i++) {
+            items[marshalled[i]] = this.unmarshal(items[marshalled[i]]);
+        }
+
+        return items;
+    }
+
     get_pairs(item_ids: any): any {
         let retVal: ObjectStorage = {};
 
@@ -117,6 +183,42 @@ class JsObjectManager {
         return retVal;
     }
 
+    compiled(arg_keys: string[], code: string): Function {
+        let key = `${arg_keys.join(",")}\0${code}`;
+        let fn = this.compiled_cache.get(key);
+
+        if (fn !== undefined) {
+            this.compiled_cache_hits++;
+            this.compiled_cache.delete(key);
+            this.compiled_cache.set(key, fn);
+            return fn;
+        }
+
+        this.compiled_cache_misses++;
+        fn = Function(...arg_keys, code);
+        this.compiled_cache.set(key, fn);
+
+        while (this.compiled_cache.size > this.compiled_cache_max_size) {
+            this.compiled_cache.delete(this.compiled_cache.keys().next().value);
+        }
+        return fn;
+    }
+
+    // A function taking 'params' positionally, for Python to store and call repeatedly.
+    // Like access code, it gets 'id' and 'this'.
+    compile(code: string, params: string[] = []): Function {
+        return this.compiled(["id", ...params], code).bind(this, this.get.bind(this));
+    }
+
+    compile_cache_stats(): any {
+        return {
+            size: this.compiled_cache.size,
+            max_size: this.compiled_cache_max_size,
+            hits: this.compiled_cache_hits,
+            misses: this.compiled_cache_misses,
+        };
+    }
+
     access(item_id: string, access_code: string, args: any = {}, obj_param: string = "self") {
         if ((typeof args) === "string") {
             // Assume Python gave us a JsObject instead of a dict.
@@ -132,17 +234,35 @@ class JsObjectManager {
             arg_keys.push(key);
             arg_values.push(value);
         }
-        arg_keys.push(access_code);
 
-        return Function(...arg_keys).bind(this)(...arg_values);
+        return this.compiled(arg_keys, access_code).apply(this, arg_values);
+    }
+
+    collect(collect_code: string, args: any = {}): any {
+        if ((typeof args) === "string") {
+            // Assume Python gave us a JsObject instead of a dict.
+            // In which case, look of the JsObject
+            args = this.get(args);
+        }
+
+        let arg_keys = ["id"];
+        let arg_values = [this.get.bind(this)];
+
+        for (const [key, value] of Object.entries(args)) {
+            // console.log(`${key}: ${value}`);
+            arg_keys.push(key);
+            arg_values.push(<any>value);
+        }
+
+        return this.compiled(arg_keys, collect_code).apply(this, arg_values);
     }
 
     get_attr (item_id: string, attr_name: string): any {
         return this.storage[item_id][attr_name];
     }
 
-    set_attr (item_id: string, attr_name: string, value: any): any {
-        this.storage[item_id][attr_name] = this.get(value);
+    set_attr (item_id: string, attr_name: string, value: any, is_marshalled: boolean = false): any {
+        this.storage[item_id][attr_name] = is_marshalled ? this.unmarshal(value) : value;
     }
 
     has_attr (item_id: string, attr_name: string) {
@@ -153,16 +273,43 @@ class JsObjectManager {
         delete this.storage[item_id][attr_name];
     }
 
-    call(item_id: string, args: string) {
-        return this.storage[item_id](...this.get(args));
+    call(item_id: string, args: any[], marshalled: number[]) {
+        return this.storage[item_id](...this.unmarshal_items_in_place(args, marshalled));
     }
 
-    call_method(item_id: string, method_name: string, args: string) {
-        return this.storage[item_id][method_name].bind(this.storage[item_id])(...this.get(args));
+    call_method(item_id: string, method_name: string, args: any[], marshalled: number[]) {
+        return this.storage[item_id][method_name].bind(this.storage[item_id])(...this.unmarshal_items_in_place(args, marshalled));
         // console.log();
         // return this.access(item_id, `return self.${method_name}(..._args)`, {_args: args});
     }
 
+    run_batch_op(op: BatchOp): any {
+        // Marshalled arguments have their keys/indexes listed in 'marshalled':
+        switch (op.op) {
+            case "fadd":
+                return this.collect(op.code, this.unmarshal_items_in_place(op.args, op.marshalled));
+            case "access":
+                return this.access(op.target, op.code, this.unmarshal_items_in_place(op.args, op.marshalled), op.obj_param);
+            case "get_attr":
+                return this.get_attr(op.target, op.name);
+            case "set_attr":
+                return this.set_attr(op.target, op.name, op.value, op.is_marshalled);
+            case "has_attr":
+                return this.has_attr(op.target, op.name);
+            case "del_attr":
+                return this.del_attr(op.target, op.name);
+            case "call":
+                return this.call(op.target, op.args, op.marshalled);
+            case "call_method":
+                return this.call_method(op.target, op.name, op.args, op.marshalled);
+            case "py":
+                return this.get(op.target);
+            case "get_type":
+                return this.get_type(op.target);
+        }
+        throw new Error(`Unknown batch operation '${op.op}'.`);
+    }
+
     _JsCall_error(callback: Function, error: any, code: string = "") {
         if (this.callback_errors) {
             callback(null, {
@@ -180,24 +327,8 @@ class JsObjectManager {
     }
 
     // Callbacks to pass to Python:
-    _fadd_fn(item_id: string, collect_code: string, args: any, callback: Function) {
-        if ((typeof args) === "string") {
-            // Assume Python gave us a JsObject instead of a dict.
-            // In which case, look of the JsObject
-            args = this.get(args);
-        }
-
-        let arg_keys = ["id"];
-        let arg_values = [this.get.bind(this)];
-
-        for (const [key, value] of Object.entries(args)) {
-            // console.log(`${key}: ${value}`);
-            arg_keys.push(key);
-            arg_values.push(<any>value);
-        }
-        arg_keys.push(collect_code);
-
-        let item = Function(...arg_keys).bind(this)(...arg_values);
+    _fadd_fn(item_id: string, collect_code: string, args: any, marshalled: any[], callback: Function) {
+        let item = this.collect(collect_code, this.unmarshal_items_in_place(args, marshalled));
         this._add_fn(item_id, item, callback);
     }
 
@@ -210,14 +341,22 @@ class JsObjectManager {
         this.remove(item_id);
         callback();
     }
+
+    _remove_many_fn(item_ids: string[], callback: Function|null) {
+        for (let i = 0; i < item_ids.length; i++) {
+            this.remove(item_ids[i]);
+        }
+        // Python only passes a callback when it wants to log the removal:
+        if (callback) {
+            callback();
+        }
+    }
     
-    _access_fn(item_id: any, access_code: string, args: any, obj_param: string, callback: Function) {
+    _access_fn(item_id: any, result_id: string, access_code: string, args: any, marshalled: any[], obj_param: string, callback: Function) {
         try {
-            let result = this.access(item_id, access_code, args, obj_param);
-            window.with_uuid4((uuid: string) => {
-                this.add(uuid, result);
-                callback(uuid, null);
-            });
+            let result = this.access(item_id, access_code, this.unmarshal_items_in_place(args, marshalled), obj_param);
+            this.add(result_id, result);
+            callback(result_id, null);
         } catch (error: any) {
             this._JsCall_error(callback, error, access_code);
         }
@@ -241,22 +380,20 @@ class JsObjectManager {
        
     }
 
-    _get_attr_fn(item_id: any, attr_name: string, callback: Function) {
+    _get_attr_fn(item_id: any, result_id: string, attr_name: string, callback: Function) {
         try {
             let result = this.get_attr(item_id, attr_name);
-            window.with_uuid4((uuid: string) => {
-                this.add(uuid, result);
-                callback(uuid, null);
-            });
+            this.add(result_id, result);
+            callback(result_id, null);
         } catch (error: any) {
             this._JsCall_error(callback, error);
         }
         
     }
 
-    _set_attr_fn(item_id: any, attr_name: string, value: any, callback: Function) {
+    _set_attr_fn(item_id: any, attr_name: string, value: any, is_marshalled: boolean, callback: Function) {
         try {
-            this.set_attr(item_id, attr_name, value);
+            this.set_attr(item_id, attr_name, value, is_marshalled);
             callback(null, null);
 
         } catch (error: any) {
@@ -283,32 +420,56 @@ class JsObjectManager {
         }    
     }
 
-    _call_fn(item_id: any, args: string, callback: Function) {
+    _call_fn(item_id: any, result_id: string, args: any[], marshalled: number[], callback: Function) {
         try {
             // console.log(args);
-            let result = this.call(item_id, args);
-            window.with_uuid4((uuid: string) => {
-                this.add(uuid, result);
-                callback(uuid, null);
-            });
+            let result = this.call(item_id, args, marshalled);
+            this.add(result_id, result);
+            callback(result_id, null);
         } catch (error: any) {
             this._JsCall_error(callback, error);
         }
         
     }
-    _call_method_fn(item_id: any, method_name: string, args: string, callback: Function) {
+    _call_method_fn(item_id: any, result_id: string, method_name: string, args: any[], marshalled: number[], callback: Function) {
         try {
-            let result = this.call_method(item_id, method_name, args);
-            window.with_uuid4((uuid: string) => {
-                this.add(uuid, result);
-                callback(uuid, null);
-            });
+            let result = this.call_method(item_id, method_name, args, marshalled);
+            this.add(result_id, result);
+            callback(result_id, null);
 
         } catch (error: any) {
             this._JsCall_error(callback, error);
         }
         
     }
+
+    _batch_fn(ops: BatchOp[], callback: Function) {
+        let results: any[] = [];
+        let stored: string[] = [];
+        let i = 0;
+
+        try {
+            for (; i < ops.length; i++) {
+                let op = ops[i];
+                let result = this.run_batch_op(op);
+
+                if (op.result_id !== null) {
+                    this.add(op.result_id, result);
+                    stored.push(op.result_id);
+                    results.push(null);
+                } else {
+                    results.push(result);
+                }
+            }
+        } catch (error: any) {
+            // Python only takes ownership of stored results if the whole batch succeeds:
+            stored.forEach((item_id) => this.remove(item_id));
+            this._JsCall_error(callback, error, `(batch operation ${i}: '${ops[i].op}')\n${ops[i].code || ""}`);
+            return;
+        }
+
+        callback(results, null);
+    }
 }
 
 window._jsobjectman = new JsObjectManager();
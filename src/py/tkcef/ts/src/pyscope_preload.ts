@@ -1,63 +1,292 @@
-interface ReturnValues {
+interface PendingCalls {
     [key: string]: _PyCall;
 }
 
+// A variable the page has cached (see PyScope.get_var()). Python pushes its new value whenever
+// it changes. 'valid' is false once it's changed to something that can't be cached.
+interface CachedVar {
+    exists: boolean;
+    value: any;
+    version: number;
+    valid: boolean;
+}
+
 interface NewPyScopeInfo {
     name: string;
     is_new: boolean;
 }
 
+// Options for a call (see PyScope.with_options()). 'timeout' is in milliseconds from when the call is
+// made, 'deadline' is a Date.now() timestamp. Python sees the deadline too, and drops the call if
+// it's passed before the call starts.
+interface PyCallOptions {
+    signal?: AbortSignal;
+    timeout?: number;
+    deadline?: number;
+}
+
 class _PyCall {
-    completed: boolean;
-    outcome: any;
+    resolve: Function;
+    reject: Function;
+    timer: any;
+    signal: AbortSignal|null;
+    on_abort: any;
+
+    constructor(resolve: Function, reject: Function) {
+        this.resolve = resolve;
+        this.reject = reject;
+        this.timer = null;
+        this.signal = null;
+        this.on_abort = null;
+    }
 
-    constructor() {
-        this.completed = false;
-        this.outcome = null;
+    cleanup() {
+        if (this.timer !== null) {
+            clearTimeout(this.timer);
+        }
+        if (this.signal !== null) {
+            this.signal.removeEventListener("abort", this.on_abort);
+        }
+    }
+}
+
+// A Python generator returned from a call. Read it with `for await (const item of stream)`;
+// breaking out early closes the generator in Python.
+class PyStream {
+    id: string;
+    chunk_size: number;
+    buffer: any[];
+    buffer_index: number;
+    done: boolean;
+    // The next chunk, requested while the current one is being read. Never more than one:
+    ahead: Promise<any>|null;
+
+    constructor(id: string, chunk_size: number) {
+        this.id = id;
+        this.chunk_size = chunk_size;
+        this.buffer = [];
+        this.buffer_index = 0;
+        this.done = false;
+        this.ahead = null;
+    }
+
+    _fetch(): Promise<any> {
+        return window._scopeman.scope_call("stream_next", {"stream": this.id, "count": this.chunk_size});
+    }
+
+    async next(): Promise<any> {
+        while (this.buffer_index >= this.buffer.length) {
+            if (this.done && this.ahead === null) {
+                return {value: undefined, done: true};
+            }
+            if (this.ahead === null) {
+                this.ahead = this._fetch();
+            }
+
+            let chunk: any;
+            try {
+                chunk = await this.ahead;
+            } finally {
+                this.ahead = null;
+            }
+            this.buffer = chunk.items;
+            this.buffer_index = 0;
+            this.done = chunk.done;
+
+            if (!this.done) {
+                this.ahead = this._fetch();
+            }
+        }
+
+        return {value: this.buffer[this.buffer_index++], done: false};
+    }
+
+    async return(value: any = undefined): Promise<any> {
+        let was_done = this.done && this.ahead === null;
+        this.done = true;
+        this.buffer = [];
+        this.buffer_index = 0;
+
+        if (this.ahead !== null) {
+            // Python can't close a generator while it's still producing the next chunk:
+            await this.ahead.catch(() => null);
+            this.ahead = null;
+        }
+        if (!was_done) {
+            await window._scopeman.scope_call("stream_close", {"stream": this.id});
+        }
+        return {value: value, done: true};
+    }
+
+    // Reads everything that's left into an array.
+    async to_array(): Promise<any[]> {
+        let items: any[] = [];
+        for (let result = await this.next(); !result.done; result = await this.next()) {
+            items.push(result.value);
+        }
+        return items;
+    }
+
+    [Symbol.asyncIterator]() {
+        return this;
     }
 }
 
 class _PyScopeManager {
-    retVals: ReturnValues
+    pending_calls: PendingCalls;
+    next_call_id: number;
+    // Cached variables by scope id, then name, and the watch_var calls still being made for them:
+    var_cache: {[scope: string]: {[name: string]: CachedVar}};
+    watching: {[scope: string]: {[name: string]: Promise<CachedVar|null>}};
 
     constructor() {
-        this.retVals = {};
-    }
+        this.pending_calls = {};
+        this.next_call_id = 1;
+        this.var_cache = {};
+        this.watching = {};
 
-    scope_call(scope_fn: Function, kwargs = {}) {
-        let call_id: string = Math.random().toString();
+        window._py_scopeman.append_callback("var_changed_fn", this._var_changed_fn.bind(this));
+    }
 
-        this.retVals[call_id] = new _PyCall();
-        scope_fn(call_id, this._complete_callback.bind(this), kwargs);
-        
+    // Every op goes through the same entry point, picked out by name:
+    scope_call(op: string, kwargs: any = {}, options: PyCallOptions|null = null) {
         return new Promise((resolve: any, reject: any) => {
-            this._checkValue(call_id, resolve, reject); 
+            let call_id: string = (this.next_call_id++).toString();
+            let call = new _PyCall(resolve, reject);
+
+            if (options !== null) {
+                if (options.signal && options.signal.aborted) {
+                    reject(this.make_cancel_error("AbortError", `'${op}' was aborted before it started.`));
+                    return;
+                }
+
+                let deadline: number|null = options.deadline ?? (options.timeout != null ? Date.now() + options.timeout : null);
+                if (deadline !== null) {
+                    kwargs = {...kwargs, "__deadline__": deadline / 1000};
+                    call.timer = setTimeout(() => {
+                        this.cancel(call_id, this.make_cancel_error("TimeoutError", `'${op}' passed its deadline.`));
+                    }, Math.max(0, deadline - Date.now()));
+                }
+                if (options.signal) {
+                    call.signal = options.signal;
+                    call.on_abort = () => this.cancel(call_id, this.make_cancel_error("AbortError", `'${op}' was aborted.`));
+                    call.signal.addEventListener("abort", call.on_abort);
+                }
+            }
+
+            this.pending_calls[call_id] = call;
+            window._py_scopeman.dispatch(call_id, this._complete_callback.bind(this), op, kwargs);
         });
     }
 
-    _checkValue (call_id: string, resolve: any, reject: any) {
-        let return_interval_id = setInterval(() => {
-           let call = this.retVals[call_id];
-           if (call.completed) {
-               let outcome = call.outcome;
-               delete this.retVals[call_id];
-               clearInterval(return_interval_id);
+    // Rejects the call right away, and tells Python. Python drops it if it hasn't started yet;
+    // otherwise, the code running it can check `tkcef.current_call().cancelled`.
+    cancel(call_id: string, error: Error) {
+        let call = this.pending_calls[call_id];
+        if (call === undefined) {
+            return;
+        }
+        delete this.pending_calls[call_id];
+        call.cleanup();
+
+        window._py_scopeman.cancel(call_id);
+        call.reject(error);
+    }
 
-                if (outcome['error'] !== null){
-                    let error = new Error(outcome['error'].message);
-                    error.name = outcome['error'].name;
-                    error.stack = outcome['error'].stack;
-                    reject(error);
+    // The cached entry for a variable, asking Python for it (and to keep it current) on the first read.
+    // Resolves to null if it can't be cached.
+    async cached_var(scope: string, name: string): Promise<CachedVar|null> {
+        let cached = this.var_cache[scope]?.[name];
+        if (cached !== undefined) {
+            return cached.valid ? cached : null;
+        }
 
+        let scope_watching = this.watching[scope] ??= {};
+        let watch = scope_watching[name];
+        if (watch === undefined) {
+            watch = scope_watching[name] = (async () => {
+                try {
+                    let info: any = await this.scope_call("watch_var", {"id": scope, "name": name});
+                    this.store_var(scope, name, info["exists"], info["value"], info["version"], info["cacheable"]);
+                } finally {
+                    if (this.watching[scope]?.[name] === watch) {
+                        delete this.watching[scope][name];
+                    }
                 }
-                resolve(outcome['result']);
-            }
-        }, 100);
+                let stored = this.var_cache[scope]?.[name];
+                return stored !== undefined && stored.valid ? stored : null;
+            })();
+        }
+        return await watch;
     }
 
-    _complete_callback(call_id: string, result: any) {
-        this.retVals[call_id].outcome = result;
-        this.retVals[call_id].completed = true;
+    // Keeps whichever is newer, so a value read before a change never replaces the change:
+    store_var(scope: string, name: string, exists: boolean, value: any, version: number, valid: boolean) {
+        let scope_cache = this.var_cache[scope] ??= {};
+        let cached = scope_cache[name];
+        if (cached !== undefined && cached.version > version) {
+            return;
+        }
+        scope_cache[name] = {exists: exists, value: value, version: version, valid: valid};
+    }
+
+    async uncache_var(scope: string, name: string) {
+        if (this.var_cache[scope] !== undefined) {
+            delete this.var_cache[scope][name];
+        }
+        await this.scope_call("unwatch_var", {"id": scope, "name": name});
+    }
+
+    // Python calls this when a cached variable changes. 'change' is null if the new value can't be
+    // cached, and 'name' is null if the whole scope is gone.
+    _var_changed_fn(scope: string, name: string|null, change: any, version: number) {
+        if (name === null) {
+            delete this.var_cache[scope];
+            delete this.watching[scope];
+            return;
+        }
+        if (change === null) {
+            this.store_var(scope, name, false, null, version, false);
+            return;
+        }
+        this.store_var(scope, name, change["exists"], change["value"], version, true);
+    }
+
+    make_cancel_error(name: string, message: string): Error {
+        let error = new Error(message);
+        error.name = name;
+        return error;
+    }
+
+    // Turns stream handles in a result into PyStreams:
+    from_result(result: any): any {
+        if (result !== null && typeof result === "object" && typeof result["__py_stream__"] === "string") {
+            return new PyStream(result["__py_stream__"], result["chunk_size"]);
+        }
+        return result;
+    }
+
+    make_error(info: any): Error {
+        let error = new Error(info.message);
+        error.name = info.name;
+        error.stack = info.stack;
+        return error;
+    }
+
+    // Python calls this once the call is done, which settles its promise right away.
+    _complete_callback(call_id: string, outcome: any) {
+        let call = this.pending_calls[call_id];
+        if (call === undefined) {
+            return;
+        }
+        delete this.pending_calls[call_id];
+        call.cleanup();
+
+        if (outcome['error'] !== null) {
+            call.reject(this.make_error(outcome['error']));
+            return;
+        }
+        call.resolve(this.from_result(outcome['result']));
     }
 }
 
@@ -68,6 +297,7 @@ class PyScope {
     id: string|null;
     allow_new: boolean;
     is_new: boolean|null;
+    call_options: PyCallOptions|null = null;
 
     constructor(p_id: string|null = null, p_allow_new: boolean = false, responsible_to_destroy_if_new: boolean = true, p_auto_create: boolean = true) {
         this.id = p_id;
@@ -78,8 +308,20 @@ class PyScope {
         }
     }
 
+    // Returns this scope, with every call made through it using 'options'. For example:
+    // `await py.with_options({signal: controller.signal, timeout: 500}).call("search", text)`
+    with_options(options: PyCallOptions): PyScope {
+        let scope: PyScope = Object.create(this);
+        scope.call_options = options;
+        return scope;
+    }
+
+    _scope_call(op: string, kwargs: any): Promise<any> {
+        return window._scopeman.scope_call(op, kwargs, this.call_options);
+    }
+
     async create(responsible_to_destroy_if_new: boolean = true) {
-        let info: NewPyScopeInfo = <NewPyScopeInfo>(await window._scopeman.scope_call(window._py_scopeman.create, {id: this.id, allow_new: this.allow_new}));
+        let info: NewPyScopeInfo = <NewPyScopeInfo>(await this._scope_call("create", {id: this.id, allow_new: this.allow_new}));
         this.is_new = info.is_new;
 
         if (info.is_new) {
@@ -101,30 +343,58 @@ class PyScope {
     }
 
     async destroy() {
-        this.id = <string>(await window._scopeman.scope_call(window._py_scopeman.destroy, {id: this.id}));
+        this.id = <string>(await this._scope_call("destroy", {id: this.id}));
 
     }
 
-    async make_w_args(args: any[]) {
-        let arg_ids: any[] = [];
-        for (let i = 0; i < args.length; i++) {
-            arg_ids.push(await JsObject(args[i]));
+    // Wrapped arguments are sent tagged with their type, so Python never has to ask for it:
+    // [typeof, id] for stored objects, or [typeof, null, value] for primitives that
+    // auto-convert would only turn straight back into Python values (see PyScopeManager.auto_convert_types).
+    static inline_types: string[] = ["boolean", "number", "string"];
+
+    // Builds the payload for all the arguments at once. Anything that needs storing is
+    // registered with the JsObjectManager in one synchronous step, so the call itself can be
+    // sent right away, however many arguments there are.
+    make_w_arg_list(items: any[], auto_convert: boolean = false): any[][] {
+        let retVal: any[][] = [];
+        let stored: any[] = [];
+        let stored_at: number[] = [];
+
+        for (let i = 0; i < items.length; i++) {
+            let js_type: string = typeof items[i];
+            if (auto_convert && PyScope.inline_types.indexOf(js_type) !== -1) {
+                retVal.push([js_type, null, items[i]]);
+            } else {
+                retVal.push([js_type]);
+                stored.push(items[i]);
+                stored_at.push(i);
+            }
+        }
+
+        let ids: string[] = window._jsobjectman.add_many(stored);
+        for (let i = 0; i < ids.length; i++) {
+            retVal[stored_at[i]].push(ids[i]);
         }
+        return retVal;
+    }
 
-        return arg_ids;
+    make_w_args(args: any[], auto_convert: boolean = false): any[][] {
+        return this.make_w_arg_list(args, auto_convert);
     }
-    async make_w_kwargs(kwargs: any){
+
+    make_w_kwargs(kwargs: any, auto_convert: boolean = false): any {
+        let keys: string[] = Object.keys(kwargs);
+        let values: any[][] = this.make_w_arg_list(keys.map((key) => kwargs[key]), auto_convert);
+
         let kwarg_ids: any = {};
-        for (const [key, value] of Object.entries(kwargs)) {
-            // Looking up both keys AND values from stored objects:
-            kwarg_ids[key] = await JsObject(value);
+        for (let i = 0; i < keys.length; i++) {
+            kwarg_ids[keys[i]] = values[i];
         }
-
         return kwarg_ids;
     }
 
     async exec(code: string, params: any = {}, ret_name: string|null = null): Promise<any> {
-        return await window._scopeman.scope_call(window._py_scopeman.exec, {
+        return await this._scope_call("exec", {
             "id": this.id,
             "code": code,
             "ret_name": ret_name,
@@ -137,17 +407,17 @@ class PyScope {
     }
 
     async w_exec(code: string, params: any = {}, ret_name: string|null = null, do_auto_convert: boolean = false): Promise<any> {
-        return await window._scopeman.scope_call(window._py_scopeman.w_exec_runner, {
+        return await this._scope_call("w_exec", {
             "id": this.id,
             "code": code,
             "ret_name": ret_name,
-            "params": await this.make_w_kwargs(params),
+            "params": this.make_w_kwargs(params, do_auto_convert),
             "do_auto_convert": do_auto_convert
         });
     }
 
     async do_func(code: string, params: any = {}): Promise<any> {
-        return await window._scopeman.scope_call(window._py_scopeman.do_func, {
+        return await this._scope_call("do_func", {
             "id": this.id,
             "code": code,
             "params": params
@@ -159,16 +429,16 @@ class PyScope {
     }
 
     async w_do_func(code: string, params: any = {}, do_auto_convert: boolean = false): Promise<any> {
-        return await window._scopeman.scope_call(window._py_scopeman.w_do_func_runner, {
+        return await this._scope_call("w_do_func", {
             "id": this.id,
             "code": code,
-            "params": await this.make_w_kwargs(params),
+            "params": this.make_w_kwargs(params, do_auto_convert),
             "do_auto_convert": do_auto_convert
         });
     }
 
     async make_func(name: string, code: string, params: any = []): Promise<any> {
-        let fn = await window._scopeman.scope_call(window._py_scopeman.make_func, {
+        let fn = await this._scope_call("make_func", {
             "id": this.id,
             "name": name,
             "code": code,
@@ -178,29 +448,59 @@ class PyScope {
         return fn;
     }
 
-    async get_var(name: string): Promise<any> {
-        return await window._scopeman.scope_call(window._py_scopeman.get_var, {
+    // With 'cached', the value is kept on the page, and later reads don't cross to Python at all.
+    // Python sends the new value whenever set_var() or del_var() change it. Code that changes it
+    // another way (like exec()) has to call the namespace's notify(), or the page won't know.
+    // Only values the page gets a copy of (JSON-like ones) are cached. Anything else is read as usual.
+    async get_var(name: string, cached: boolean = false): Promise<any> {
+        if (cached) {
+            let entry = await window._scopeman.cached_var(<string>this.id, name);
+            if (entry !== null) {
+                if (!entry.exists) {
+                    throw window._scopeman.make_error({
+                        "name": "AttributeError",
+                        "message": `'${this.id}' has no variable '${name}'.`,
+                        "stack": ""
+                    });
+                }
+                return entry.value;
+            }
+        }
+
+        return await this._scope_call("get_var", {
             "id": this.id,
             "name": name
         });
     }
 
-    async has_var(name: string): Promise<any> {
-        return await window._scopeman.scope_call(window._py_scopeman.has_var, {
+    async has_var(name: string, cached: boolean = false): Promise<any> {
+        if (cached) {
+            let entry = await window._scopeman.cached_var(<string>this.id, name);
+            if (entry !== null) {
+                return entry.exists;
+            }
+        }
+
+        return await this._scope_call("has_var", {
             "id": this.id,
             "name": name
         });
     }
 
+    // Stops caching the variable (see get_var()):
+    async uncache_var(name: string): Promise<any> {
+        return await window._scopeman.uncache_var(<string>this.id, name);
+    }
+
     async del_var(name: string): Promise<any> {
-        return await window._scopeman.scope_call(window._py_scopeman.del_var, {
+        return await this._scope_call("del_var", {
             "id": this.id,
             "name": name
         });
     }
 
     async set_var(name: string, value: any): Promise<any> {
-        return await window._scopeman.scope_call(window._py_scopeman.set_var, {
+        return await this._scope_call("set_var", {
             "id": this.id,
             "name": name,
             "value": value
@@ -212,7 +512,7 @@ class PyScope {
     }
 
     async call_kw(name: string, args: any[] = [], kwargs: any = {}): Promise<any> {
-        return await window._scopeman.scope_call(window._py_scopeman.raw_call_runner, {
+        return await this._scope_call("call", {
             "id": this.id,
             "name": name,
             "args": args,
@@ -235,16 +535,60 @@ class PyScope {
 
 
     async w_call_kw(name: string, args: any[] = [], kwargs: any = {}, auto_convert: boolean = false): Promise<any> {
-        // return await window._scopeman.scope_call(window._py_scopeman.w_call_runner, {
-        return await window._scopeman.scope_call(window._py_scopeman.w_call_runner, {
+        return await this._scope_call("w_call", {
             "id": this.id,
             "name": name,
-            "args": await this.make_w_args(args),
-            "kwargs": await this.make_w_kwargs(kwargs),
+            "args": this.make_w_args(args, auto_convert),
+            "kwargs": this.make_w_kwargs(kwargs, auto_convert),
             "auto_convert": auto_convert
         });
     }
 
+    // Runs an op registered with PyScopeManager.register_op() in this scope.
+    async op(name: string, kwargs: any = {}): Promise<any> {
+        return await this._scope_call(name, {"id": this.id, ...kwargs});
+    }
+
+    static batch_defaults: {[op: string]: any} = {
+        "exec": {"params": {}, "ret_name": null},
+        "w_exec": {"params": {}, "ret_name": null, "do_auto_convert": false},
+        "do_func": {"params": {}},
+        "w_do_func": {"params": {}, "do_auto_convert": false},
+        "make_func": {"params": []},
+        "call": {"args": [], "kwargs": {}},
+        "w_call": {"args": [], "kwargs": {}, "auto_convert": false},
+    };
+
+    // Runs a list of [op, kwargs] pairs in this scope, in order, with one call into Python.
+    // Resolves with every op's result, or rejects with the first error (its 'batch_index' says which op failed).
+    // For example: `await py.batch([["get_var", {name: "a"}], ["call", {name: "f", args: [1], kwargs: {}}]])`
+    async batch(ops: [string, any][]): Promise<any[]> {
+        let batch_ops: [string, any][] = [];
+        for (const [op, kwargs] of ops) {
+            // Anything left out gets the same default as the op's own method (like w_exec()) gives it:
+            let op_kwargs: any = {"id": this.id, ...(PyScope.batch_defaults[op] ?? {}), ...kwargs};
+            if (op === "w_exec" || op === "w_do_func") {
+                op_kwargs["params"] = this.make_w_kwargs(op_kwargs["params"], op_kwargs["do_auto_convert"]);
+            } else if (op === "w_call") {
+                op_kwargs["args"] = this.make_w_args(op_kwargs["args"], op_kwargs["auto_convert"]);
+                op_kwargs["kwargs"] = this.make_w_kwargs(op_kwargs["kwargs"], op_kwargs["auto_convert"]);
+            }
+            batch_ops.push([op, op_kwargs]);
+        }
+
+        let outcomes: any[] = <any[]>(await this._scope_call("batch", {"ops": batch_ops}));
+
+        let results: any[] = [];
+        for (let i = 0; i < outcomes.length; i++) {
+            if (outcomes[i]['error'] !== null) {
+                let error: any = window._scopeman.make_error(outcomes[i]['error']);
+                error.batch_index = i;
+                throw error;
+            }
+            results.push(window._scopeman.from_result(outcomes[i]['result']));
+        }
+        return results;
+    }
 }
 
 const py = new PyScope(window.app_scope_key);
\ No newline at end of file
@@ -94,6 +94,12 @@ class WebApp(App):
     ):
         super().setup(key, app_manager, False)
 
+        # Coroutines the page calls run on the AppManager's event loop, and @cpu_bound functions in its processes:
+        self.pyscopemanager.async_loop = app_manager.async_loop
+        self.pyscopemanager.process_pool = app_manager.process_pool
+        # Tk-lane calls are run with the rest of the queued actions, in _run_step():
+        self.pyscopemanager.tk_queue = self.queue_update_action
+
         self.tk_root = tk.Tk()
         self.tk_frame = self.tk_frame_class(self.tk_root, self, title, geometry)
 
@@ -119,12 +125,21 @@ class WebApp(App):
         # Update as normal:
         self.update()
 
+        # Remove this step's collected JsObjects from the browser in one go:
+        self.js_object_manager.flush_releases()
+
+        # Drop namespaces pages have stopped using (if BrowserNamespaceWrapper.idle_timeout is set):
+        BrowserNamespaceWrapper.evict_idle()
+
     def destroy(self):
         super().destroy()
 
         # All references must be cleared for CEF to shutdown cleanly.
         self.browser = None
 
+        # Calls still queued for the page are dropped. Running ones are left to finish:
+        self.pyscopemanager.shutdown()
+
         # Destroy the app scope once the app is closed:
         if BrowserNamespaceWrapper.namespace_exists(self.app_scope_key):
             BrowserNamespaceWrapper.remove_namespace(self.app_scope_key)
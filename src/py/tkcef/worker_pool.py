@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+import traceback
+from typing import Any, Callable, Union
+
+from . import logger
+
+
+class WorkerPoolFullException(Exception):
+    pool: WorkerPool
+    label: str
+
+    def __init__(self, pool: WorkerPool, label: str = None):
+        self.pool = pool
+        self.label = label
+
+    def __str__(self):
+        return (
+            f"The worker pool is busy ({self.pool.pending} calls pending, max_queue_depth is"
+            f" {self.pool.max_queue_depth}). '{self.label}' was rejected. Try again later."
+        )
+
+
+class WorkerPool:
+    # Runs calls on a fixed set of worker threads, rather than a new thread per call.
+    #
+    # At most 'max_queue_depth' calls can be pending (queued or running) at once. Past that,
+    # submit() raises a WorkerPoolFullException instead of queueing more work, so callers
+    # can report the rejection back to JS. With 'serialize_namespaces', calls submitted
+    # for the same namespace run one at a time, in the order they were submitted, while
+    # calls for different namespaces still run side by side.
+    max_workers: int
+    max_queue_depth: Union[int, None]
+    serialize_namespaces: bool
+
+    executor: ThreadPoolExecutor
+
+    pending: int
+    completed_count: int
+    rejected_count: int
+
+    # Calls waiting for an earlier call in the same namespace to finish:
+    _namespace_queues: dict[str, deque[tuple[Future, Callable, tuple, dict]]]
+    # Calls handed to the executor that haven't started yet, with their namespace, so
+    # shutdown() can cancel them:
+    _queued: dict[Future, Union[str, None]]
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        max_queue_depth: Union[int, None] = 256,
+        *,
+        serialize_namespaces: bool = False,
+        thread_name_prefix: str = "WorkerPool",
+    ):
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self.serialize_namespaces = serialize_namespaces
+
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix)
+
+        self.pending = 0
+        self.completed_count = 0
+        self.rejected_count = 0
+
+        self._namespace_queues = {}
+        self._queued = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args, namespace: str = None, **kwargs) -> Future:
+        future = Future()
+
+        with self._lock:
+            if self.max_queue_depth is not None and self.pending >= self.max_queue_depth:
+                self.rejected_count += 1
+                raise WorkerPoolFullException(self, getattr(fn, "__name__", repr(fn)))
+            self.pending += 1
+
+            if self.serialize_namespaces and namespace is not None:
+                if namespace in self._namespace_queues:
+                    # Something's already running for this namespace. Wait for it:
+                    self._namespace_queues[namespace].append((future, fn, args, kwargs))
+                    return future
+                self._namespace_queues[namespace] = deque()
+            self._queued[future] = namespace
+
+        try:
+            self.executor.submit(self._run, future, namespace, fn, args, kwargs)
+        except RuntimeError:
+            # The pool has been shut down:
+            with self._lock:
+                self.pending -= 1
+                self._queued.pop(future, None)
+                self._namespace_queues.pop(namespace, None)
+            raise
+
+        return future
+
+    def _run(self, future: Future, namespace: Union[str, None], fn: Callable, args: tuple, kwargs: dict):
+        with self._lock:
+            if future not in self._queued:
+                # shutdown() already cancelled it:
+                return
+            del self._queued[future]
+
+        while True:
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    logger.error(
+                        f"Unhandled error in worker call '{getattr(fn, '__name__', fn)}':\n{traceback.format_exc()}"
+                    )
+                    future.set_exception(e)
+
+            with self._lock:
+                self.pending -= 1
+                self.completed_count += 1
+
+                if not (self.serialize_namespaces and namespace in self._namespace_queues):
+                    return
+
+                queue = self._namespace_queues[namespace]
+                if len(queue) == 0:
+                    del self._namespace_queues[namespace]
+                    return
+
+                # Staying on this worker for the next call in the namespace keeps them in order:
+                future, fn, args, kwargs = queue.popleft()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue_depth": self.max_queue_depth,
+                "pending": self.pending,
+                "completed": self.completed_count,
+                "rejected": self.rejected_count,
+                "serialized_namespaces": len(self._namespace_queues),
+            }
+
+    def shutdown(self, wait: bool = True):
+        # Everything that hasn't started yet is cancelled, so nothing waiting on it hangs:
+        with self._lock:
+            waiting = list(self._queued)
+            never_started = set(self._queued.values())
+            self._queued.clear()
+
+            for namespace, queue in list(self._namespace_queues.items()):
+                waiting.extend(entry[0] for entry in queue)
+                queue.clear()
+                if namespace in never_started:
+                    del self._namespace_queues[namespace]
+
+            self.pending -= len(waiting)
+
+        for future in waiting:
+            future.cancel()
+
+        self.executor.shutdown(wait=wait, cancel_futures=True)
@@ -4,28 +4,115 @@ Created by LT_Schmiddy (Alex Schmid) on 9/25/2020
 """
 
 import inspect
+import sys
 import textwrap
-from types import CodeType, FunctionType
+import threading
+from collections import ChainMap, OrderedDict
+from functools import lru_cache
+from types import CodeType, FrameType, FunctionType
 
 # code_class = type(compile("", "<string>", 'exec'))
-from typing import Any, Union
+from typing import Any, Callable, Hashable, Union
 
 
-def _get_exec_name(
-    frame_info: inspect.FrameInfo, prefix: str = "anon_func.rexec"
-) -> str:
+class CodeCache:
+    """
+    An LRU cache of compiled code objects, so that running the same source repeatedly
+    only compiles it once. Entries are keyed by the source, the filename given to `compile()`
+    (or a cheaper key standing in for it) and the mode. The filename holds the prefix, which
+    `BrowserNamespaceWrapper` uses to name the namespace, so the same source compiled for
+    two namespaces has two entries. `func()` compiles a whole function definition, so its
+    argument names are part of the source too.
+
+    One instance, `code_cache`, is shared by `rexec()`, `func()` and `BrowserNamespaceWrapper`.
+    Set `max_size` to 0 to turn caching off.
+    """
+
+    max_size: int
+    hits: int
+    misses: int
+
+    def __init__(self, max_size: int = 512):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple, CodeType] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compile(
+        self,
+        source: str,
+        filename: Union[str, Callable[[], str]],
+        mode: str,
+        dedent: bool = False,
+        filename_key: Hashable = None,
+    ) -> CodeType:
+        """
+        Works like the `compile()` builtin, but returns the cached code object when there is one.
+
+        :param source: The source code to compile.
+        :param filename: The filename to compile with. May be a callable returning it, which is only called on a miss.
+        :param mode: 'exec', 'eval' or 'single'.
+        :param dedent: Should the source be de-indented before compiling? Skipped on cache hits.
+        :param filename_key: Identifies the filename in the cache key, if `filename` is a callable.
+        :return: The compiled code object.
+        """
+        if filename_key is None:
+            filename_key = filename
+        key = (source, filename_key, mode, dedent)
+
+        with self._lock:
+            code = self._entries.get(key)
+            if code is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return code
+            self.misses += 1
+
+        if callable(filename):
+            filename = filename()
+        code = compile(textwrap.dedent(source) if dedent else source, filename, mode)
+
+        with self._lock:
+            self._entries[key] = code
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return code
+
+    def clear(self):
+        """Empties the cache and resets its hit/miss counts."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups > 0 else 0.0,
+            }
+
+
+code_cache = CodeCache()
+
+
+def _get_exec_name(frame: FrameType, prefix: str = "anon_func.rexec") -> str:
     return (
-        f"<{prefix} (execution) @ function `{frame_info.function}`,"
-        f" file '{frame_info.filename}', line {frame_info.lineno}>"
+        f"<{prefix} (execution) @ function `{frame.f_code.co_name}`,"
+        f" file '{frame.f_code.co_filename}', line {frame.f_lineno}>"
     )
 
 
-def _get_r_eval_name(
-    frame_info: inspect.FrameInfo, prefix: str = "anon_func.rexec"
-) -> str:
+def _get_r_eval_name(frame: FrameType, prefix: str = "anon_func.rexec") -> str:
     return (
-        f"<{prefix} (return evaluation) @ function `{frame_info.function}`,"
-        f" file '{frame_info.filename}', line {frame_info.lineno}>"
+        f"<{prefix} (return evaluation) @ function `{frame.f_code.co_name}`,"
+        f" file '{frame.f_code.co_filename}', line {frame.f_lineno}>"
     )
 
 
@@ -64,14 +151,18 @@ def rexec(
     :param __dedent: If p_code is a string, should it be de-indented before execution?
     :return: The returned value from `p_return`.
     """
-    # Gets the frame for the function call.
-    # Since this code is inside a function, `frames` will always have at least 2 members.
-    frame_info = inspect.stack()[1]
+    # Gets the frame for the function call. Only the caller's frame is needed, so
+    # there's no reason to build (and read source context for) the entire stack.
+    frame = sys._getframe(1)
 
     if __globals is None:
-        __globals = frame_info.frame.f_globals
+        __globals = frame.f_globals
     if __locals is None:
-        __locals = frame_info.frame.f_locals
+        __locals = frame.f_locals
+
+    # The debug filenames are only built when the code isn't already cached.
+    # The caller's code object and line identify them well enough until then:
+    filename_key = (frame.f_code, frame.f_lineno, __prefix)
 
     # print(f"{use_locals}")
     # Handle function execution:
@@ -82,11 +173,14 @@ def rexec(
             exec(p_code, __globals, __locals)
         # Did we get a source code string?
         elif isinstance(p_code, str) and p_code.strip() != "":
-            if __dedent:
-                p_code = textwrap.dedent(p_code)
-
             exec(
-                compile(p_code, _get_exec_name(frame_info, __prefix), "exec"),
+                code_cache.compile(
+                    p_code,
+                    lambda: _get_exec_name(frame, __prefix),
+                    "exec",
+                    __dedent,
+                    filename_key,
+                ),
                 __globals,
                 __locals,
             )
@@ -99,11 +193,16 @@ def rexec(
 
     # Did the return code come pre-compiled?
     if isinstance(p_return, CodeType):
-        return eval(p_return, frame_info.frame.f_globals, frame_info.frame.f_locals)
+        return eval(p_return, frame.f_globals, frame.f_locals)
     # Did we get a source code string?
     elif isinstance(p_return, str) and p_return.strip() != "":
         return eval(
-            compile(p_return, _get_r_eval_name(frame_info, __prefix), "eval"),
+            code_cache.compile(
+                p_return,
+                lambda: _get_r_eval_name(frame, __prefix),
+                "eval",
+                filename_key=filename_key,
+            ),
             __globals,
             __locals,
         )
@@ -157,7 +256,7 @@ def func(
 
     :param f_args:
     :param f_code:
-    :param collect_locals:
+    :param collect_locals: Should the caller's local variables be readable inside the function? Only the ones the code uses are bound, and they're read again on each call.
     :param name:
     :param __prefix:
     :param __reindent_size:
@@ -191,28 +290,28 @@ def func(
         f_code = "pass"
 
     # Gets the frame for the function call.
-    # Since this code is inside a function, `frames` will always have at least 2 members.
-    frame_info = inspect.stack()[1]
-    # __locals_frame = frame_info.frame
+    frame = sys._getframe(1)
 
     if __globals is None:
-        __globals = frame_info.frame.f_globals
+        __globals = frame.f_globals
     if __locals is None:
-        __locals = frame_info.frame.f_locals
+        __locals = frame.f_locals
 
-    func_text = f"def {name}({f_args}):\n"
+    body = _adjust_func_string_indentation(f_code, __reindent_size)
+    func_text = f"def {name}({f_args}):\n{body}"
     secret_frame = None
     if collect_locals:
-        secret_frame = inspect.stack()[1].frame
-        func_text += f"{(' ' * __reindent_size)}if __update_locals is not None:\n"
-        # func_text += f"{(' ' * __reindent_size * 2)}__secret_locals.update(__update_locals)\n"
-        func_text += f"{(' ' * __reindent_size * 2)}__secret_frame.f_locals.update(__update_locals)\n"
-        for i in secret_frame.f_locals.keys():
-            func_text += (
-                f"{(' ' * __reindent_size)}{i} = __secret_frame.f_locals['{i}']\n"
-            )
+        secret_frame = frame
+        # Only the caller's locals that the function actually uses are bound, so the
+        # function's source (and so its cache entry) depends on the code, not on
+        # everything else that happens to be in the caller's namespace:
+        used = _used_names(
+            code_cache.compile(func_text, f"<{name} from {__prefix}>", "exec"), name
+        )
+        caller_locals = secret_frame.f_locals
+        bound = [i for i in sorted(used) if i in caller_locals]
+        func_text = _collect_locals_func_text(name, f_args, body, tuple(bound), __reindent_size)
 
-    func_text += _adjust_func_string_indentation(f_code, __reindent_size)
     if __print_func_code:
         print(str() + func_text)
     if __return_func_code:
@@ -223,9 +322,10 @@ def func(
         name,
         __prefix=f"{name} from {__prefix}",
         __globals=__globals,
-        # We don't ACTUALLY want this function added to the local namespace, so we'll make a duplicate.
-        # As long as we feed rexec the original global dict, this shouldn't cause any problems.
-        __locals=__locals.copy(),
+        # We don't ACTUALLY want this function added to the local namespace, so it's defined in
+        # a layer on top of it. Reads (like default argument values) still fall through to the
+        # original, and as long as we feed rexec the original global dict, this shouldn't cause any problems.
+        __locals=ChainMap({}, __locals),
     )
 
     if collect_locals:
@@ -243,6 +343,67 @@ def func(
     return out_func
 
 
+@lru_cache(maxsize=512)
+def _used_names(module_code: CodeType, name: str) -> frozenset[str]:
+    """
+    Finds every name the function `name` (defined in `module_code`) or any function nested
+    inside it might read, which are the names `func()` may need to bind from the caller's locals.
+    :param module_code: The compiled function definition.
+    :param name: The name of the defined function.
+    :return: The names used, not counting the function's arguments.
+    """
+    func_code = next(
+        i for i in module_code.co_consts if isinstance(i, CodeType) and i.co_name == name
+    )
+
+    # The arguments come first in co_varnames, *args and **kwargs included:
+    arg_count = (
+        func_code.co_argcount
+        + func_code.co_kwonlyargcount
+        + bool(func_code.co_flags & inspect.CO_VARARGS)
+        + bool(func_code.co_flags & inspect.CO_VARKEYWORDS)
+    )
+    args = func_code.co_varnames[:arg_count]
+
+    used = set(func_code.co_varnames[arg_count:])
+    used.update(func_code.co_cellvars)
+    pending = [func_code]
+    while len(pending) > 0:
+        code = pending.pop()
+        used.update(code.co_names)
+        used.update(code.co_freevars)
+        pending.extend(i for i in code.co_consts if isinstance(i, CodeType))
+
+    return frozenset(used.difference(args))
+
+
+@lru_cache(maxsize=512)
+def _collect_locals_func_text(
+    name: str, f_args: str, body: str, bound: tuple[str, ...], reindent_size: int = 4
+) -> str:
+    """
+    Builds the source of a `func()` function with `collect_locals`, which copies the caller's
+    locals named in `bound` into the function's own at the start of each call.
+    :param name: The function name.
+    :param f_args: The argument list, ending with `__update_locals` and `__secret_frame`.
+    :param body: The already indented function body.
+    :param bound: The caller's locals to copy.
+    :param reindent_size: Number of spaces to indent each nested block.
+    :return: The function source.
+    """
+    indent = " " * reindent_size
+    func_text = f"def {name}({f_args}):\n"
+    func_text += f"{indent}if __update_locals is not None:\n"
+    func_text += f"{indent * 2}__secret_frame.f_locals.update(__update_locals)\n"
+    if len(bound) > 0:
+        func_text += f"{indent}__secret_locals = __secret_frame.f_locals\n"
+        for i in bound:
+            func_text += f"{indent}{i} = __secret_locals['{i}']\n"
+
+    return func_text + body
+
+
+@lru_cache(maxsize=512)
 def _adjust_func_string_indentation(code_str: str, reindent_size: int = 4) -> str:
     """
     This function handles the actual re-indenting of the function codde from `func()`
@@ -258,4 +419,4 @@ def _adjust_func_string_indentation(code_str: str, reindent_size: int = 4) -> st
     )
 
 
-__all__ = ("rexec", "tget", "func")
+__all__ = ("rexec", "tget", "func", "CodeCache", "code_cache")